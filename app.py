@@ -6,12 +6,41 @@ This file is part of the Grabador de Audio project.
 Licensed under the MIT License. See LICENSE file for details.
 """
 
-from flask import Flask, render_template, request, jsonify, session, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, session, send_file, send_from_directory, stream_with_context
 from flask_wtf.csrf import CSRFProtect
+from werkzeug.utils import safe_join
 import os
 from datetime import datetime
 import json
+import logging
+import mimetypes
+import re
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from dotenv import load_dotenv
+from audio_chunks import plan_wav_chunks, read_wav_segment, merge_transcripts
+from jobs import JobQueue, QueueFullError, FINISHED_STATES
+from transcript_cache import TranscriptCache, hash_file
+from transcript_index import TranscriptIndex
+from transcript_timing import TimingStore, GRANULARITIES, timing_from_response, shift_timing, merge_timings
+from recordings_store import RecordingsStore
+from clients import ClientRegistry
+from streaming import FileSink, HashSink, stream_to_sinks
+from storage_upload import S3MultipartUpload, GCSComposeUpload, ProgressSink, UploadProgress, s3_object_exists
+from blob_store import BlobStore
+from waveform import WaveformStore
+from resumable import ResumableUploads, UploadError, UploadTooLarge
+from live import LiveTranscriber
+from audio_processing import preprocess_file, needs_preprocessing
+from batch import select_files, run_batch, transcript_name, AUDIO_EXTENSIONS
+from maintenance import MaintenanceWorker
+from scheduler import CallScheduler
+from locks import FileLock
+from backends import OpenAIBackend, LocalWhisperBackend, StubBackend
+import metrics
 
 # Cargar variables de entorno
 load_dotenv()
@@ -21,12 +50,274 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-i
 csrf = CSRFProtect(app)
 
 # Configuración de la aplicación
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER', 'uploads')
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 512)) * 1024 * 1024
+
+# Subidas a S3 y Google Cloud por partes en paralelo
+app.config['S3_PART_SIZE_MB'] = int(os.environ.get('S3_PART_SIZE_MB', 8))
+app.config['GCS_PART_SIZE_MB'] = int(os.environ.get('GCS_PART_SIZE_MB', 16))
+app.config['CLOUD_UPLOAD_CONCURRENCY'] = int(os.environ.get('CLOUD_UPLOAD_CONCURRENCY', 4))  # partes en vuelo por archivo
+app.config['CLOUD_UPLOAD_MAX_RETRIES'] = int(os.environ.get('CLOUD_UPLOAD_MAX_RETRIES', 3))  # reintentos por parte
+
+# Transcripción por segmentos en paralelo
+app.config['TRANSCRIBE_WORKERS'] = int(os.environ.get('TRANSCRIBE_WORKERS', 4))
+app.config['TRANSCRIBE_CHUNK_SECONDS'] = float(os.environ.get('TRANSCRIBE_CHUNK_SECONDS', 120))
+app.config['TRANSCRIBE_CHUNK_OVERLAP'] = float(os.environ.get('TRANSCRIBE_CHUNK_OVERLAP', 2))
+if app.config['TRANSCRIBE_CHUNK_SECONDS'] <= 0:
+    raise ValueError('TRANSCRIBE_CHUNK_SECONDS debe ser mayor que 0')
+if not 0 <= app.config['TRANSCRIBE_CHUNK_OVERLAP'] < app.config['TRANSCRIBE_CHUNK_SECONDS'] / 2:
+    raise ValueError('TRANSCRIBE_CHUNK_OVERLAP debe estar entre 0 y la mitad de TRANSCRIBE_CHUNK_SECONDS')
+
+# Marcas de tiempo de las transcripciones (verbose_json): segment, word o none
+app.config['TRANSCRIPT_TIMESTAMPS'] = os.environ.get('TRANSCRIPT_TIMESTAMPS', 'segment')
+app.config['TIMING_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'timings')
+app.config['TIMING_MAX_WINDOW'] = 600  # segundos máximos alrededor de un instante
+
+# Audio guardado por contenido (SHA-256) en subdirectorios, con índice nombre → hash
+app.config['BLOB_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'blobs')
+
+# Resúmenes de forma de onda (picos) y duración de cada audio, por hash de contenido
+app.config['WAVEFORM_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'waveforms')
+app.config['WAVEFORM_MAX_POINTS'] = 4096
+
+# Entrega de audio: caché del navegador y entrega delegada en el proxy inverso
+app.config['MEDIA_CACHE_MAX_AGE'] = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 30 * 24 * 3600))  # segundos
+app.config['MEDIA_ACCEL_REDIRECT'] = os.environ.get('MEDIA_ACCEL_REDIRECT')  # ubicación interna de nginx para BLOB_FOLDER
+app.config['USE_X_SENDFILE'] = os.environ.get('MEDIA_X_SENDFILE', 'false').lower() == 'true'  # Apache / lighttpd
+
+# Cola de trabajos en segundo plano
+app.config['JOBS_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_QUEUE_SIZE'] = int(os.environ.get('JOB_QUEUE_SIZE', 20))
+app.config['JOB_MAX_WAIT'] = 30  # segundos máximos de long-poll
+app.config['JOB_RETRY_AFTER'] = 5  # segundos sugeridos al responder 429
+
+# Caché de transcripciones
+app.config['TRANSCRIPT_CACHE_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'cache')
+app.config['TRANSCRIPT_CACHE_MEMORY_ENTRIES'] = int(os.environ.get('TRANSCRIPT_CACHE_MEMORY_ENTRIES', 256))
+app.config['TRANSCRIPT_CACHE_MAX_MB'] = int(os.environ.get('TRANSCRIPT_CACHE_MAX_MB', 200))
+app.config['TRANSCRIPT_CACHE_MAX_AGE_DAYS'] = int(os.environ.get('TRANSCRIPT_CACHE_MAX_AGE_DAYS', 30))
+
+# Retención y mantenimiento en segundo plano
+app.config['MAINTENANCE_INTERVAL_MINUTES'] = float(os.environ.get('MAINTENANCE_INTERVAL_MINUTES', 60))  # 0 = desactivado
+app.config['AUDIO_RETENTION_DAYS'] = int(os.environ.get('AUDIO_RETENTION_DAYS', 0))  # 0 = conservar siempre
+app.config['AUDIO_RETENTION_ACTION'] = os.environ.get('AUDIO_RETENTION_ACTION', 'offload')  # offload o delete
+app.config['OFFLOAD_PROVIDER'] = os.environ.get('OFFLOAD_PROVIDER')  # aws-s3 o google-cloud
+app.config['OFFLOAD_CREDENTIALS_FILE'] = os.environ.get('OFFLOAD_CREDENTIALS_FILE')
+app.config['TRANSCRIPT_COMPRESS_DAYS'] = int(os.environ.get('TRANSCRIPT_COMPRESS_DAYS', 30))  # 0 = no comprimir
+app.config['TEMP_MAX_AGE_HOURS'] = float(os.environ.get('TEMP_MAX_AGE_HOURS', 24))
+app.config['JOB_RETENTION_DAYS'] = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+
+# Clientes reutilizables de S3, Google Cloud y OpenAI
+app.config['CLIENT_TTL_SECONDS'] = int(os.environ.get('CLIENT_TTL_SECONDS', 900))
+app.config['CLIENT_POOL_SIZE'] = int(os.environ.get('CLIENT_POOL_SIZE', 20))
+
+# Límite de peticiones, reintentos y peticiones duplicadas hacia Whisper
+app.config['OPENAI_TIMEOUT_SECONDS'] = float(os.environ.get('OPENAI_TIMEOUT_SECONDS', 300))
+app.config['WHISPER_RATE_LIMIT'] = float(os.environ.get('WHISPER_RATE_LIMIT', 50))  # peticiones por minuto y API key
+app.config['WHISPER_BURST'] = int(os.environ.get('WHISPER_BURST', 10))
+app.config['WHISPER_MAX_RETRIES'] = int(os.environ.get('WHISPER_MAX_RETRIES', 5))
+app.config['WHISPER_RETRY_BASE_DELAY'] = float(os.environ.get('WHISPER_RETRY_BASE_DELAY', 1))
+app.config['WHISPER_RETRY_MAX_DELAY'] = float(os.environ.get('WHISPER_RETRY_MAX_DELAY', 60))
+app.config['WHISPER_HEDGE_AFTER'] = float(os.environ.get('WHISPER_HEDGE_AFTER', 0))  # segundos, 0 = desactivado
+
+# Subidas reanudables por partes
+app.config['RESUMABLE_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'incoming')
+app.config['RESUMABLE_MAX_CHUNK_MB'] = int(os.environ.get('RESUMABLE_MAX_CHUNK_MB', 16))
+
+# Transcripción en vivo por segmentos
+app.config['LIVE_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'live')
+app.config['LIVE_WORKERS'] = int(os.environ.get('LIVE_WORKERS', 2))
+app.config['LIVE_FINISH_TIMEOUT'] = 120  # segundos máximos esperando el último segmento
+
+# Transcripción por lotes
+app.config['BATCH_CONCURRENCY'] = int(os.environ.get('BATCH_CONCURRENCY', 4))
+app.config['BATCH_MAX_CONCURRENCY'] = int(os.environ.get('BATCH_MAX_CONCURRENCY', 16))
+app.config['BATCH_RATE_LIMIT'] = float(os.environ.get('BATCH_RATE_LIMIT', 50))  # archivos por minuto, 0 = sin límite
+
+# Backend de transcripción por defecto: openai, local (faster-whisper) o stub
+app.config['TRANSCRIPTION_BACKEND'] = os.environ.get('TRANSCRIPTION_BACKEND', 'openai')
+app.config['LOCAL_WHISPER_MODEL'] = os.environ.get('LOCAL_WHISPER_MODEL', 'small')
+app.config['LOCAL_WHISPER_DEVICE'] = os.environ.get('LOCAL_WHISPER_DEVICE', 'cpu')
+app.config['LOCAL_WHISPER_COMPUTE_TYPE'] = os.environ.get('LOCAL_WHISPER_COMPUTE_TYPE', 'int8')
+app.config['LOCAL_WHISPER_WORKERS'] = int(os.environ.get('LOCAL_WHISPER_WORKERS', 2))
+app.config['LOCAL_WHISPER_CPU_THREADS'] = int(os.environ.get('LOCAL_WHISPER_CPU_THREADS', 0))
+app.config['LOCAL_WHISPER_BATCH_SIZE'] = int(os.environ.get('LOCAL_WHISPER_BATCH_SIZE', 8))
+app.config['LOCAL_WHISPER_BATCH_WAIT_MS'] = float(os.environ.get('LOCAL_WHISPER_BATCH_WAIT_MS', 50))
+app.config['LOCAL_WHISPER_LANGUAGE'] = os.environ.get('LOCAL_WHISPER_LANGUAGE')
+app.config['STUB_BACKEND_LATENCY'] = float(os.environ.get('STUB_BACKEND_LATENCY', 0))
+
+# Trazas por petición (una línea JSON por petición o trabajo)
+app.config['TRACE_LOG_FILE'] = os.environ.get('TRACE_LOG_FILE')  # por defecto, stderr
+app.config['TRACE_LOG_MIN_MS'] = float(os.environ.get('TRACE_LOG_MIN_MS', 0))  # solo las más lentas
+
+# Normalización de audio (mono, 16 kHz, sin silencios en los extremos)
+app.config['AUDIO_PREPROCESS_ON_SAVE'] = os.environ.get('AUDIO_PREPROCESS_ON_SAVE', 'true').lower() == 'true'
+app.config['AUDIO_PREPROCESS_ON_TRANSCRIBE'] = os.environ.get('AUDIO_PREPROCESS_ON_TRANSCRIBE', 'true').lower() == 'true'
+app.config['AUDIO_PREPROCESS_FORMAT'] = os.environ.get('AUDIO_PREPROCESS_FORMAT', 'wav')
+app.config['AUDIO_PREPROCESS_MIN_KEPT'] = 0.25  # fracción mínima de la duración que debe conservar el recorte
+
+# Servidor de producción (gunicorn.conf.py): sync (hilos) o async (gevent, E/S de red cooperativa)
+app.config['SERVER_MODE'] = os.environ.get('SERVER_MODE', 'sync')
+app.config['NETWORK_CONCURRENCY'] = int(os.environ.get(
+    'NETWORK_CONCURRENCY', 256 if app.config['SERVER_MODE'] == 'async' else 0))  # por proceso, 0 = sin límite
+app.config['NETWORK_QUEUE_TIMEOUT'] = float(os.environ.get('NETWORK_QUEUE_TIMEOUT', 5))  # segundos antes de responder 503
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))  # proxies inversos delante (X-Forwarded-*)
 
 # Crear directorio de uploads si no existe
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+clients = ClientRegistry(ttl_seconds=app.config['CLIENT_TTL_SECONDS'])
+
+whisper_scheduler = CallScheduler(
+    rate_per_minute=app.config['WHISPER_RATE_LIMIT'],
+    burst=app.config['WHISPER_BURST'],
+    max_retries=app.config['WHISPER_MAX_RETRIES'],
+    base_delay=app.config['WHISPER_RETRY_BASE_DELAY'],
+    max_delay=app.config['WHISPER_RETRY_MAX_DELAY'],
+    hedge_after=app.config['WHISPER_HEDGE_AFTER']
+)
+
+# Grabaciones deduplicadas; los audios sueltos del formato anterior se importan en run_migrations()
+blob_store = BlobStore(app.config['BLOB_FOLDER'])
+
+waveforms = WaveformStore(app.config['WAVEFORM_FOLDER'])
+
+# Progreso de las subidas a la nube, consultado por la página /upload
+upload_progress = UploadProgress()
+
+resumable_uploads = ResumableUploads(
+    app.config['RESUMABLE_FOLDER'],
+    max_chunk_bytes=app.config['RESUMABLE_MAX_CHUNK_MB'] * 1024 * 1024,
+    max_upload_bytes=app.config['MAX_CONTENT_LENGTH']
+)
+
+# Metadatos de grabaciones (el antiguo recordings.json se migra en run_migrations())
+recordings_store = RecordingsStore(os.path.join(app.config['UPLOAD_FOLDER'], 'recordings.db'))
+
+def resolve_transcript_recording(stem):
+    """Grabación del almacén (nombre e id) de la que sale ``<stem>_transcript.txt``"""
+    import glob
+    
+    for name in blob_store.names(f"{glob.escape(stem)}.*"):
+        if name.lower().endswith(AUDIO_EXTENSIONS) and os.path.splitext(name)[0] == stem:
+            recording = recordings_store.get_by_filename(name)
+            return name, recording['id'] if recording else None
+    return None, None
+
+# Búsqueda de texto completo en las transcripciones (las ya existentes se indexan en run_migrations())
+transcript_index = TranscriptIndex(os.path.join(app.config['UPLOAD_FOLDER'], 'transcripts.db'))
+
+def run_migrations():
+    """Importar una sola vez los datos del formato anterior: audios sueltos, recordings.json y transcripciones.
+
+    Se llama al arrancar (``create_app()``, el servidor de desarrollo y los
+    scripts), no al importar el módulo. Un bloqueo de archivo hace que con
+    varios procesos solo uno importe; los demás esperan y encuentran la
+    migración ya registrada.
+    """
+    folder = app.config['UPLOAD_FOLDER']
+    with FileLock(os.path.join(folder, '.migrations.lock')):
+        blob_store.import_folder(folder, AUDIO_EXTENSIONS)
+        recordings_store.migrate_json(os.path.join(folder, 'recordings.json'))
+        transcript_index.import_folder(folder, resolve_transcript_recording)
+
+# Segmentos y palabras con su instante, en un sidecar por transcripción
+transcript_timings = TimingStore(app.config['TIMING_FOLDER'])
+
+transcript_cache = TranscriptCache(
+    app.config['TRANSCRIPT_CACHE_FOLDER'],
+    max_memory_entries=app.config['TRANSCRIPT_CACHE_MEMORY_ENTRIES'],
+    max_disk_bytes=app.config['TRANSCRIPT_CACHE_MAX_MB'] * 1024 * 1024,
+    max_age_seconds=app.config['TRANSCRIPT_CACHE_MAX_AGE_DAYS'] * 24 * 3600
+)
+
+jobs = JobQueue(
+    app.config['JOBS_FOLDER'],
+    max_workers=app.config['JOB_WORKERS'],
+    max_pending=app.config['JOB_QUEUE_SIZE']
+)
+
+@app.before_request
+def recover_jobs():
+    """Reanudar trabajos pendientes al atender la primera petición"""
+    jobs.recover()
+
+# Identificadores de petición aceptados desde la cabecera X-Request-ID
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+if not metrics.trace_logger.handlers:
+    trace_handler = (logging.FileHandler(app.config['TRACE_LOG_FILE'], encoding='utf-8')
+                     if app.config['TRACE_LOG_FILE'] else logging.StreamHandler())
+    metrics.trace_logger.addHandler(trace_handler)
+    metrics.trace_logger.setLevel(logging.INFO)
+    metrics.trace_logger.propagate = False
+
+def is_traced_request():
+    return request.path.startswith('/api/')
+
+@app.before_request
+def start_request_trace():
+    """Abrir la traza de la petición con su identificador"""
+    if not is_traced_request():
+        return
+    request_id = request.headers.get('X-Request-ID', '')
+    if not REQUEST_ID_PATTERN.match(request_id):
+        request_id = metrics.new_trace_id()
+    request.trace_started = time.perf_counter()
+    request.trace, request.trace_token = metrics.start_trace(request_id, request.endpoint or 'unmatched')
+    metrics.requests_in_flight.inc()
+    metrics.record_bytes('http', 'in', request.content_length or 0)
+
+@app.after_request
+def record_request_metrics(response):
+    """Contar la petición, su duración y devolver el identificador en X-Request-ID"""
+    trace = getattr(request, 'trace', None)
+    if trace is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    metrics.requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.request_seconds.observe(time.perf_counter() - request.trace_started, endpoint=endpoint)
+    trace.fields.update(method=request.method, path=request.path, status=response.status_code)
+    response.headers['X-Request-ID'] = trace.id
+    return response
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    """Escribir la traza de la petición en el log"""
+    token = getattr(request, 'trace_token', None)
+    if token is None:
+        return
+    metrics.requests_in_flight.dec()
+    fields = {'error': type(error).__name__} if error else {}
+    metrics.end_trace(token, app.config['TRACE_LOG_MIN_MS'], **fields)
+
+# Huecos para los endpoints que esperan a la red (S3, Google Cloud, subida del audio)
+network_slots = (threading.BoundedSemaphore(app.config['NETWORK_CONCURRENCY'])
+                 if app.config['NETWORK_CONCURRENCY'] > 0 else None)
+
+def network_bound(view):
+    """Limitar las peticiones simultáneas de un endpoint ligado a la red.
+
+    En modo async cada petición es una greenlet y no ocupa un hilo, así que
+    el límite lo pone NETWORK_CONCURRENCY: si no queda hueco en
+    NETWORK_QUEUE_TIMEOUT segundos se responde 503 con Retry-After.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if network_slots is None:
+            return view(*args, **kwargs)
+        if not network_slots.acquire(timeout=app.config['NETWORK_QUEUE_TIMEOUT']):
+            metrics.record_error('network.slots', 'saturated')
+            response = jsonify({'success': False, 'error': 'Servidor ocupado, inténtalo de nuevo en unos segundos'})
+            response.headers['Retry-After'] = str(app.config['JOB_RETRY_AFTER'])
+            return response, 503
+        try:
+            return view(*args, **kwargs)
+        finally:
+            network_slots.release()
+    return wrapper
+
 @app.route('/')
 def index():
     """Página principal con el temporizador y grabación de audio"""
@@ -40,8 +331,11 @@ def config():
 @app.route('/recordings')
 def recordings():
     """Página para ver grabaciones guardadas"""
-    recordings = get_recordings()
-    return render_template('recordings.html', recordings=recordings)
+    filters = recording_filters()
+    page = get_recordings(**filters)
+    return render_template('recordings.html', recordings=page['recordings'], total=page['total'],
+                           next_cursor=page['next_cursor'], prev_cursor=page['prev_cursor'],
+                           filters=filters)
 
 @app.route('/upload')
 def upload():
@@ -55,8 +349,202 @@ def test_icons():
 
 @app.route('/uploads/<filename>')
 def uploaded_file(filename):
-    """Servir archivos de audio desde el directorio uploads"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Servir un audio del almacén por su nombre, o un archivo del directorio uploads.
+
+    Los audios archivados por la política de retención responden 410 con la
+    URL de su copia en la nube, y las transcripciones comprimidas se sirven
+    desde su ``.gz``.
+    """
+    path = blob_store.path(filename)
+    if path is None:
+        entry = blob_store.get(filename)
+        if entry and entry['expired_at']:
+            return jsonify({
+                'success': False,
+                'error': 'La grabación ya no está en el servidor',
+                'remote_url': entry['remote_url']
+            }), 410
+        compressed_path = safe_join(app.config['UPLOAD_FOLDER'], f"{filename}.gz")
+        if (filename.endswith('.txt') and compressed_path and os.path.isfile(compressed_path)
+                and not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename))):
+            return compressed_transcript(compressed_path, filename)
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return send_media(path, filename, blob_store.get(filename)['sha256'])
+
+def send_media(path, filename, sha256):
+    """Entregar un audio del almacén con rangos de bytes, ETag fuerte y caché de larga duración.
+
+    El contenido de un nombre no cambia nunca, así que su SHA-256 es un ETag
+    fuerte válido (también para ``If-Range``) y el navegador puede guardar la
+    respuesta ``MEDIA_CACHE_MAX_AGE`` segundos. Con ``MEDIA_ACCEL_REDIRECT``
+    Flask solo resuelve el nombre y las cabeceras condicionales, y el proxy
+    inverso envía el archivo (rangos incluidos) con ``X-Accel-Redirect``.
+    """
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    max_age = app.config['MEDIA_CACHE_MAX_AGE']
+    
+    if not app.config['MEDIA_ACCEL_REDIRECT']:
+        return send_file(path, mimetype=mimetype, download_name=filename, conditional=True,
+                         etag=sha256, max_age=max_age)
+    
+    relative_path = os.path.relpath(path, app.config['BLOB_FOLDER']).replace(os.sep, '/')
+    response = Response(mimetype=mimetype)
+    response.set_etag(sha256)
+    response.last_modified = os.path.getmtime(path)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response = response.make_conditional(request)
+    if response.status_code != 304:
+        response.headers['X-Accel-Redirect'] = f"{app.config['MEDIA_ACCEL_REDIRECT'].rstrip('/')}/{relative_path}"
+    return response
+
+def compressed_transcript(path, filename):
+    """Servir una transcripción comprimida por el mantenimiento, descomprimida si el cliente no acepta gzip"""
+    import gzip
+    
+    if 'gzip' not in request.accept_encodings:
+        with gzip.open(path, 'rb') as f:
+            return Response(f.read(), mimetype='text/plain')
+    response = send_file(path, mimetype='text/plain', download_name=filename, conditional=True)
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.route('/api/recordings')
+def list_recordings():
+    """API para consultar grabaciones con filtros y paginación"""
+    filters = recording_filters()
+    return jsonify({
+        'success': True,
+        **get_recordings(**filters),
+        'per_page': filters['per_page']
+    })
+
+@app.route('/api/recordings/<filename>/waveform')
+def recording_waveform(filename):
+    """API con la duración, la frecuencia de muestreo y ``points`` picos (mín, máx) de una grabación"""
+    points = waveform_points()
+    if points is None:
+        return jsonify({'success': False, 'error': 'Parámetro points inválido'}), 400
+    waveform = get_waveform(filename, points)
+    if waveform is None:
+        return jsonify({'success': False, 'error': 'Forma de onda no disponible'}), 404
+    return jsonify({'success': True, 'filename': filename, **waveform})
+
+@app.route('/api/waveforms')
+def list_waveforms():
+    """API con las formas de onda de varias grabaciones (``files`` repetido) en una sola petición"""
+    points = waveform_points()
+    if points is None:
+        return jsonify({'success': False, 'error': 'Parámetro points inválido'}), 400
+    filenames = list(dict.fromkeys(request.args.getlist('files')))[:200]
+    return jsonify({
+        'success': True,
+        'waveforms': {filename: get_waveform(filename, points) for filename in filenames}
+    })
+
+def waveform_points():
+    try:
+        points = int(request.args.get('points', 200))
+    except ValueError:
+        return None
+    return points if 1 <= points <= app.config['WAVEFORM_MAX_POINTS'] else None
+
+def get_waveform(filename, points):
+    """Resumen de una grabación del almacén; se calcula la primera vez si aún no existe"""
+    entry = blob_store.get(filename)
+    if entry is None:
+        return None
+    try:
+        with metrics.stage('waveform'):
+            return waveforms.get(entry['sha256'], points=points, audio_path=blob_store.path(filename))
+    except Exception as e:
+        print(f"Error al leer la forma de onda de {filename}: {e}")
+        return None
+
+@app.route('/api/recordings/<filename>/segments')
+def recording_segments(filename):
+    """API con los segmentos de la transcripción alrededor del instante ``t`` (segundos).
+
+    Devuelve los que se solapan con ``[t - before, t + after]`` y el índice
+    del que suena en ``t`` (``null`` si cae en un silencio), para que el
+    reproductor resalte y precargue solo una ventana de la transcripción.
+    """
+    timing = get_timing(filename)
+    if timing is None:
+        return jsonify({'success': False, 'error': 'La transcripción no tiene marcas de tiempo'}), 404
+    try:
+        time_point = float(request.args.get('t', 0))
+        before = float(request.args.get('before', 30))
+        after = float(request.args.get('after', 60))
+    except ValueError:
+        return jsonify({'success': False, 'error': 't, before y after deben ser números'}), 400
+    max_window = app.config['TIMING_MAX_WINDOW']
+    before, after = min(max(0.0, before), max_window), min(max(0.0, after), max_window)
+    
+    current = timing.segment_at(time_point)
+    return jsonify({
+        'success': True,
+        'filename': filename,
+        'granularity': timing.granularity,
+        'total_segments': len(timing),
+        'from': max(0.0, time_point - before),
+        'to': time_point + after,
+        'current': current,
+        'segments': timing.around(time_point, before, after)
+    })
+
+@app.route('/api/recordings/<filename>/segments/search')
+def search_recording_segments(filename):
+    """API con los instantes en que aparece la frase ``q`` en la transcripción de una grabación"""
+    timing = get_timing(filename)
+    if timing is None:
+        return jsonify({'success': False, 'error': 'La transcripción no tiene marcas de tiempo'}), 404
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Parámetro q vacío'}), 400
+    try:
+        limit = min(max(1, int(request.args.get('limit', 20))), 200)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit debe ser un número'}), 400
+    
+    matches, total = timing.find(query, limit=limit)
+    return jsonify({'success': True, 'filename': filename, 'query': query, 'total': total, 'matches': matches})
+
+def get_timing(filename):
+    """Marcas de tiempo de la transcripción de una grabación del almacén, o ``None``"""
+    if blob_store.get(filename) is None:
+        return None
+    with metrics.stage('transcript.timing'):
+        return transcript_timings.load(transcript_name(filename))
+
+def recording_filters():
+    """Leer filtros de proyecto, fecha y cursores de página desde la query string"""
+    try:
+        per_page = min(max(1, int(request.args.get('per_page', 50))), 200)
+    except ValueError:
+        per_page = 50
+    
+    return {
+        'project_name': request.args.get('project', '').strip() or None,
+        'date_from': request.args.get('from', '').strip() or None,
+        'date_to': request.args.get('to', '').strip() or None,
+        'after': parse_cursor(request.args.get('after')),
+        'before': parse_cursor(request.args.get('before')),
+        'per_page': per_page
+    }
+
+def encode_cursor(recording):
+    """Cursor de página de una grabación: ``<created_at>~<id>``"""
+    return f"{recording['created_at']}~{recording['id']}"
+
+def parse_cursor(value):
+    """``(created_at, id)`` de un cursor de página, o ``None`` si falta o no es válido"""
+    created_at, _, recording_id = (value or '').rpartition('~')
+    try:
+        return (created_at, int(recording_id)) if created_at else None
+    except ValueError:
+        return None
 
 @app.route('/api/start-recording', methods=['POST'])
 def start_recording():
@@ -127,8 +615,15 @@ def stop_recording():
 
 @app.route('/api/save-audio', methods=['POST'])
 def save_audio():
-    """API para guardar el archivo de audio"""
+    """API para guardar el archivo de audio.
+
+    Acepta un formulario multipart con el campo ``audio`` o el audio como
+    cuerpo crudo de la petición, que se escribe a disco en streaming.
+    """
     try:
+        if is_streaming_request():
+            return save_audio_stream()
+        
         if 'audio' not in request.files:
             return jsonify({'success': False, 'error': 'No se recibió archivo de audio'}), 400
         
@@ -139,27 +634,251 @@ def save_audio():
             return jsonify({'success': False, 'error': 'No hay información de grabación'}), 400
         
         # Guardar archivo de audio
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], recording_info['filename'])
-        audio_file.save(filepath)
+        temp_path = blob_store.temp_path()
+        with metrics.stage('disk.write'):
+            audio_file.save(temp_path)
+        metrics.record_bytes('disk', 'out', os.path.getsize(temp_path))
         
         return jsonify({
             'success': True,
             'message': 'Audio guardado correctamente',
-            'filepath': filepath
+            **store_recording(temp_path, recording_info['filename'])
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def save_audio_stream():
+    """Guardar el cuerpo crudo de la petición como audio de la grabación activa"""
+    recording_info = session.get('recording_info')
+    if not recording_info:
+        return jsonify({'success': False, 'error': 'No hay información de grabación'}), 400
+    
+    temp_path = blob_store.temp_path()
+    with metrics.stage('disk.stream'):
+        size, results = stream_to_sinks(request.stream, [FileSink(temp_path), HashSink()])
+    metrics.record_bytes('disk', 'out', size)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Audio guardado correctamente',
+        'bytes': size,
+        **store_recording(temp_path, recording_info['filename'], sha256=results['sha256'])
+    })
+
+def store_recording(temp_path, filename, sha256=None):
+    """Guardar una grabación recibida en el almacén por contenido y encolar su normalización.
+
+    Si el nombre ya estaba ocupado por otro audio se guarda con sufijo y se
+    actualiza la grabación activa de la sesión para que la registre así.
+    """
+    with metrics.stage('blob.store'):
+        stored = blob_store.add_file(temp_path, filename, sha256=sha256)
+    
+    filepath = blob_store.blob_path(stored['sha256'], stored['name'])
+    with metrics.stage('waveform'):
+        waveform = compute_waveform(filepath, stored['sha256'])
+    
+    recording_info = session.get('recording_info')
+    if recording_info and recording_info['filename'] == filename and stored['name'] != filename:
+        recording_info['filename'] = stored['name']
+        session['recording_info'] = recording_info
+        # La transcripción en vivo se guardará junto al nombre definitivo
+        if recording_info.get('live_session'):
+            live_transcriber.rename(recording_info['live_session'], stored['name'])
+    
+    return {
+        'filename': stored['name'],
+        'filepath': filepath,
+        'sha256': stored['sha256'],
+        'deduplicated': stored['deduplicated'],
+        'preprocessing': queue_preprocessing(stored['name'], filepath, stored['sha256']),
+        'waveform': waveform
+    }
+
+def compute_waveform(filepath, sha256):
+    """Calcular los picos y la duración de una grabación recién guardada (sin fallar el guardado)"""
+    try:
+        return waveforms.compute(filepath, sha256)
+    except Exception as e:
+        print(f"Error al calcular la forma de onda de {filepath}: {e}")
+        return None
+
+def queue_preprocessing(filename, filepath, sha256):
+    """Encolar la normalización de una grabación recién guardada si está habilitado.
+
+    El guardado responde sin esperarla; el trabajo sustituye el contenido
+    de la grabación en el almacén cuando termina.
+    """
+    if not app.config['AUDIO_PREPROCESS_ON_SAVE']:
+        return None
+    if not needs_preprocessing(filepath):
+        return {'skipped': True, 'reason': 'No es un WAV PCM o ya está normalizado'}
+    
+    try:
+        job = jobs.submit('preprocess', {
+            'filename': filename,
+            'sha256': sha256,
+            'request_id': metrics.current_trace_id()
+        })
+    except QueueFullError:
+        return {'skipped': True, 'reason': 'La cola de trabajos está llena'}
+    return {'queued': True, 'job_id': job['id'], 'status_url': f"/api/jobs/{job['id']}"}
+
+def run_preprocess_job(job_id, payload, secrets):
+    """Normalizar una grabación del almacén y sustituir su contenido por la versión normalizada"""
+    filename = payload['filename']
+    entry = blob_store.get(filename)
+    filepath = blob_store.path(filename)
+    if entry is None or filepath is None or entry['sha256'] != payload['sha256']:
+        return {'success': True, 'skipped': True, 'reason': 'La grabación cambió o ya no está en el almacén'}
+    
+    jobs.update(job_id, progress='Normalizando audio')
+    temp_path = blob_store.temp_path(os.path.splitext(filename)[1])
+    try:
+        with metrics.stage('preprocess'):
+            stats = preprocess_file(filepath, temp_path, audio_format='wav')
+        problem = preprocessing_problem(stats)
+        if problem:
+            print(f"Normalización descartada para {filename}: {problem}")
+            return {'success': True, 'filename': filename, 'preprocessing': {**stats, 'skipped': True, 'reason': problem}}
+        
+        with metrics.stage('blob.store'):
+            stored = blob_store.replace(filename, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    
+    with metrics.stage('waveform'):
+        compute_waveform(blob_store.blob_path(stored['sha256'], filename), stored['sha256'])
+    return {'success': True, 'filename': filename, 'sha256': stored['sha256'], 'preprocessing': stats}
+
+def preprocessing_problem(stats):
+    """Motivo para no usar un audio normalizado que perdió casi toda la duración, o ``None``"""
+    if stats['skipped']:
+        return stats.get('reason', 'No se pudo normalizar')
+    if stats['duration_after'] <= 0:
+        return 'El audio normalizado está vacío'
+    if stats['duration_after'] < stats['duration_before'] * app.config['AUDIO_PREPROCESS_MIN_KEPT']:
+        return (f"El audio normalizado dura {stats['duration_after']} s de "
+                f"{stats['duration_before']} s originales")
+    return None
+
+@app.route('/api/uploads', methods=['POST'])
+def initiate_upload():
+    """API para iniciar una subida reanudable del audio de la grabación activa"""
+    try:
+        recording_info = session.get('recording_info')
+        if not recording_info:
+            return jsonify({'success': False, 'error': 'No hay información de grabación'}), 400
+        
+        data = request.get_json(silent=True) or {}
+        expected_size = data.get('expected_size')
+        if expected_size is not None and (not isinstance(expected_size, int) or expected_size < 0):
+            return jsonify({'success': False, 'error': 'expected_size debe ser un entero positivo'}), 400
+        
+        upload = resumable_uploads.initiate(
+            recording_info['filename'],
+            expected_size=expected_size,
+            content_type=data.get('content_type')
+        )
+        
+        return jsonify({
+            'success': True,
+            'upload_id': upload['id'],
+            'chunk_url': f"/api/uploads/{upload['id']}/chunks/"
+        }), 201
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except Exception as e:
+        print(f"Error en initiate_upload: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    """API para recibir una parte numerada; su offset va en la cabecera ``X-Chunk-Offset``"""
+    try:
+        try:
+            offset = int(request.headers.get('X-Chunk-Offset', ''))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Cabecera X-Chunk-Offset requerida'}), 400
+        
+        upload = resumable_uploads.write_chunk(upload_id, index, offset, request.stream)
+        return jsonify({'success': True, 'ranges': upload['ranges']})
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error en upload_chunk: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>')
+def upload_status(upload_id):
+    """API para consultar los rangos ya recibidos de una subida"""
+    upload = resumable_uploads.get(upload_id)
+    if not upload:
+        return jsonify({'success': False, 'error': 'Subida no encontrada'}), 404
+    
+    return jsonify({
+        'success': True,
+        'ranges': upload['ranges'],
+        'chunks': upload['chunks'],
+        'bytes_received': sum(end - start for start, end in upload['ranges'])
+    })
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """API para cerrar una subida verificando tamaño y SHA-256"""
+    try:
+        data = request.get_json(silent=True) or {}
+        size = data.get('size')
+        if not isinstance(size, int) or size <= 0:
+            return jsonify({'success': False, 'error': 'Tamaño total no válido'}), 400
+        
+        upload = resumable_uploads.get(upload_id)
+        if not upload:
+            return jsonify({'success': False, 'error': 'Subida no encontrada'}), 404
+        
+        temp_path = blob_store.temp_path()
+        with metrics.stage('upload.finalize'):
+            result = resumable_uploads.finalize(upload_id, size, data.get('sha256'), temp_path)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Audio guardado correctamente',
+            'bytes': result['bytes'],
+            **store_recording(temp_path, upload['filename'], sha256=result['sha256'])
+        })
+    except UploadError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
+    except Exception as e:
+        print(f"Error en finalize_upload: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def is_streaming_request():
+    """Indica si el audio llega como cuerpo crudo en lugar de formulario multipart"""
+    return request.mimetype.startswith('audio/') or request.mimetype == 'application/octet-stream'
+
 @app.route('/api/upload-to-cloud', methods=['POST'])
+@network_bound
 def upload_to_cloud():
-    """API para subir archivos a servicios en la nube"""
+    """API para subir archivos a servicios en la nube.
+
+    Además del formulario multipart, acepta el archivo como cuerpo crudo con
+    ``provider`` y ``filename`` en la query string y las credenciales en la
+    cabecera ``X-Cloud-Credentials``; en ese caso se sube por partes según llega.
+    """
     try:
+        if is_streaming_request():
+            return upload_stream_to_cloud()
+        
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': 'No se recibió archivo'}), 400
         
         file = request.files['file']
         provider = request.form.get('provider')
         credentials_json = request.form.get('credentials')
+        upload_id = progress_upload_id(request.form.get('upload_id'))
         
         if not file or file.filename == '':
             return jsonify({'success': False, 'error': 'Archivo no válido'}), 400
@@ -186,9 +905,9 @@ def upload_to_cloud():
         result = None
         
         if provider == 'aws-s3':
-            result = upload_to_aws_s3(file, filename, credentials)
+            result = upload_to_aws_s3(file, filename, credentials, upload_id=upload_id)
         elif provider == 'google-cloud':
-            result = upload_to_google_cloud(file, filename, credentials)
+            result = upload_to_google_cloud(file, filename, credentials, upload_id=upload_id)
         else:
             return jsonify({'success': False, 'error': 'Proveedor no soportado'}), 400
         
@@ -197,7 +916,9 @@ def upload_to_cloud():
                 'success': True,
                 'message': 'Archivo subido correctamente',
                 'url': result.get('url'),
-                'filename': filename
+                'filename': filename,
+                'upload_id': upload_id,
+                'sha256': result.get('sha256')
             })
         else:
             return jsonify({
@@ -209,7 +930,80 @@ def upload_to_cloud():
         print(f"Error en upload_to_cloud: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def upload_stream_to_cloud():
+    """Subir el cuerpo crudo de la petición a S3 o Google Cloud en streaming"""
+    provider = request.args.get('provider')
+    original_filename = request.args.get('filename', '')
+    credentials_json = request.headers.get('X-Cloud-Credentials')
+    content_type = request.mimetype
+    upload_id = progress_upload_id(request.args.get('upload_id'))
+    
+    if not original_filename:
+        return jsonify({'success': False, 'error': 'Archivo no válido'}), 400
+    
+    if not provider:
+        return jsonify({'success': False, 'error': 'Proveedor no especificado'}), 400
+    
+    if not credentials_json:
+        return jsonify({'success': False, 'error': 'Credenciales no proporcionadas'}), 400
+    
+    try:
+        credentials = json.loads(credentials_json)
+    except json.JSONDecodeError:
+        return jsonify({'success': False, 'error': 'Credenciales en formato JSON inválido'}), 400
+    
+    if not content_type.startswith('audio/'):
+        return jsonify({'success': False, 'error': 'El archivo debe ser de audio'}), 400
+    
+    # Generar nombre único para el archivo
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{timestamp}_{original_filename}"
+    key = f"audio/{filename}"
+    
+    if provider not in ('aws-s3', 'google-cloud'):
+        return jsonify({'success': False, 'error': 'Proveedor no soportado'}), 400
+    
+    upload_progress.start(upload_id, filename, provider, request.content_length)
+    try:
+        sink, url = cloud_upload_sink(provider, credentials, key, content_type, upload_id)
+        with metrics.stage(f"{provider}.stream"):
+            size, results = stream_to_sinks(
+                request.stream,
+                [sink, HashSink(), ProgressSink(lambda amount: upload_progress.received(upload_id, amount))]
+            )
+    except Exception as e:
+        upload_progress.finish(upload_id, error=e)
+        raise
+    upload_progress.finish(upload_id)
+    metrics.record_bytes(provider, 'out', size)
+    
+    return jsonify({
+        'success': True,
+        'message': 'Archivo subido correctamente',
+        'url': url,
+        'filename': filename,
+        'upload_id': upload_id,
+        'bytes': size,
+        'parts': results['parts'],
+        'sha256': results['sha256']
+    })
+
+@app.route('/api/cloud-uploads/<upload_id>')
+def cloud_upload_progress(upload_id):
+    """API con el progreso de una subida a la nube (bytes recibidos y confirmados por el proveedor)"""
+    progress = upload_progress.get(upload_id)
+    if progress is None:
+        return jsonify({'success': False, 'error': 'Subida no encontrada'}), 404
+    return jsonify({'success': True, 'upload': progress})
+
+def progress_upload_id(value):
+    """Identificador de progreso enviado por el cliente, o uno nuevo si no es válido"""
+    if value and re.fullmatch(r'[A-Za-z0-9_-]{8,64}', value):
+        return value
+    return metrics.new_trace_id()
+
 @app.route('/api/transcribe', methods=['POST'])
+@network_bound
 def transcribe_audio():
     """API para transcribir audio usando OpenAI"""
     try:
@@ -217,6 +1011,7 @@ def transcribe_audio():
         filename = data.get('filename')
         aws_credentials = data.get('aws_credentials')
         openai_api_key = data.get('openai_api_key')
+        backend_name = data.get('backend') or app.config['TRANSCRIPTION_BACKEND']
         
         if not filename:
             return jsonify({'success': False, 'error': 'Nombre de archivo no proporcionado'}), 400
@@ -224,162 +1019,851 @@ def transcribe_audio():
         if not aws_credentials:
             return jsonify({'success': False, 'error': 'Credenciales de AWS no proporcionadas'}), 400
         
-        if not openai_api_key:
+        backend_error = validate_backend(backend_name)
+        if backend_error:
+            return backend_error
+        
+        if transcription_backends[backend_name].needs_api_key and not openai_api_key:
             return jsonify({'success': False, 'error': 'API key de OpenAI no proporcionada'}), 400
         
-        # Buscar el archivo en el directorio de uploads
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if not os.path.exists(filepath):
+        # Buscar el archivo en el almacén de grabaciones
+        if blob_store.path(filename) is None:
             return jsonify({'success': False, 'error': 'Archivo no encontrado'}), 404
         
-        # Subir archivo a S3
-        with open(filepath, 'rb') as file:
-            from werkzeug.datastructures import FileStorage
-            file_storage = FileStorage(
-                stream=file,
-                filename=filename,
-                content_type='audio/wav'
-            )
-            
-            upload_result = upload_to_aws_s3(file_storage, filename, aws_credentials)
-            
-            if not upload_result['success']:
-                return jsonify({
-                    'success': False,
-                    'error': f"Error al subir a S3: {upload_result['error']}"
-                }), 500
+        # Encolar el trabajo; las credenciales no se guardan en disco
+        job = jobs.submit(
+            'transcribe',
+            {'filename': filename, 'backend': backend_name, 'request_id': metrics.current_trace_id()},
+            secrets={'aws_credentials': aws_credentials, 'openai_api_key': openai_api_key}
+        )
+        return job_accepted_response(job)
+        
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except Exception as e:
+        print(f"Error en transcribe_audio: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/transcribe-batch', methods=['POST'])
+def transcribe_batch():
+    """API para transcribir por lotes archivos ya guardados en uploads.
+
+    Recibe ``files`` (lista de nombres) o ``pattern`` (glob) y opcionalmente
+    ``concurrency`` y ``rate_limit`` (archivos por minuto). Se usa la API key
+    de OpenAI del servidor y se omiten los archivos que ya tienen transcripción.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        files = data.get('files')
+        pattern = data.get('pattern')
         
-        # Transcribir con OpenAI
-        audio_url = upload_result['url']
-        transcript_result = transcribe_with_openai(audio_url, openai_api_key)
+        if files is not None and (not isinstance(files, list) or not all(isinstance(f, str) for f in files)):
+            return jsonify({'success': False, 'error': 'files debe ser una lista de nombres de archivo'}), 400
         
-        if not transcript_result['success']:
-            return jsonify({
-                'success': False,
-                'error': f"Error en transcripción: {transcript_result['error']}"
-            }), 500
+        if files is None and not pattern:
+            return jsonify({'success': False, 'error': 'Indica files o pattern'}), 400
         
-        # Guardar transcripción
-        transcript_filename = filename.replace('.wav', '_transcript.txt')
-        transcript_filepath = os.path.join(app.config['UPLOAD_FOLDER'], transcript_filename)
+        backend_name = data.get('backend') or app.config['TRANSCRIPTION_BACKEND']
+        backend_error = validate_backend(backend_name)
+        if backend_error:
+            return backend_error
         
-        with open(transcript_filepath, 'w', encoding='utf-8') as f:
-            f.write(transcript_result['transcript'])
+        if transcription_backends[backend_name].needs_api_key and not get_server_openai_key():
+            return openai_key_missing_response()
         
-        return jsonify({
-            'success': True,
-            'message': 'Transcripción completada',
-            'transcript': transcript_result['transcript'],
-            'transcript_file': transcript_filename,
-            'audio_url': audio_url
+        try:
+            concurrency = int(data.get('concurrency', app.config['BATCH_CONCURRENCY']))
+            rate_limit = float(data.get('rate_limit', app.config['BATCH_RATE_LIMIT']))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'concurrency y rate_limit deben ser números'}), 400
+        concurrency = max(1, min(concurrency, app.config['BATCH_MAX_CONCURRENCY']))
+        
+        selection = select_files(app.config['UPLOAD_FOLDER'], blob_store, names=files, pattern=pattern)
+        if not selection['pending']:
+            return jsonify({
+                'success': True,
+                'message': 'No hay archivos pendientes de transcribir',
+                'skipped': selection['skipped'],
+                'invalid': selection['invalid']
+            })
+        
+        job = jobs.submit('transcribe-batch', {
+            'files': selection['pending'],
+            'concurrency': concurrency,
+            'rate_limit': max(0.0, rate_limit),
+            'backend': backend_name,
+            'request_id': metrics.current_trace_id()
         })
+        return job_accepted_response(job, files=len(selection['pending']),
+                                     skipped=selection['skipped'], invalid=selection['invalid'])
         
+    except QueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
-        print(f"Error en transcribe_audio: {str(e)}")
+        print(f"Error en transcribe_batch: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/transcribe-direct', methods=['POST'])
+@network_bound
 def transcribe_direct():
-    """API para transcribir audio directamente usando OpenAI Whisper"""
+    """API para transcribir audio directamente usando OpenAI Whisper.
+
+    El audio puede llegar como formulario multipart (campo ``audio``) o como
+    cuerpo crudo con ``filename`` en la query string. Para una grabación que
+    ya está en el servidor basta un JSON con ``filename`` o ``recording_id``:
+    se transcribe en el sitio, sin que el navegador la descargue y la suba.
+    """
     try:
-        # Verificar que se recibió un archivo
-        if 'audio' not in request.files:
-            return jsonify({'success': False, 'error': 'No se recibió archivo de audio'}), 400
+        if request.is_json:
+            return transcribe_direct_reference(request.get_json(silent=True) or {})
         
-        audio_file = request.files['audio']
-        if not audio_file or audio_file.filename == '':
-            return jsonify({'success': False, 'error': 'Archivo no válido'}), 400
+        streaming = is_streaming_request()
+        if streaming:
+            original_filename = request.args.get('filename', 'audio')
+            content_type = request.mimetype
+        else:
+            # Verificar que se recibió un archivo
+            if 'audio' not in request.files:
+                return jsonify({'success': False, 'error': 'No se recibió archivo de audio'}), 400
+            
+            audio_file = request.files['audio']
+            if not audio_file or audio_file.filename == '':
+                return jsonify({'success': False, 'error': 'Archivo no válido'}), 400
+            
+            original_filename = audio_file.filename
+            content_type = audio_file.content_type
         
         # Verificar que es un archivo de audio
-        if not audio_file.content_type.startswith('audio/'):
+        if not content_type.startswith('audio/'):
             return jsonify({'success': False, 'error': 'El archivo debe ser de audio'}), 400
         
+        backend_name = request.args.get('backend') or request.form.get('backend') or app.config['TRANSCRIPTION_BACKEND']
+        backend_error = validate_backend(backend_name)
+        if backend_error:
+            return backend_error
+        
         # Obtener API key de OpenAI desde variables de entorno
-        openai_api_key = os.getenv('OPENAI_API_KEY')
-        if not openai_api_key or openai_api_key == 'your-openai-api-key-here':
-            return jsonify({
-                'success': False, 
-                'error': 'OPENAI_API_KEY no configurada. Por favor, edita el archivo .env y añade tu API key de OpenAI.'
-            }), 500
+        if transcription_backends[backend_name].needs_api_key and not get_server_openai_key():
+            return openai_key_missing_response()
         
-        # Transcribir directamente
-        transcript_result = transcribe_file_with_openai(audio_file, openai_api_key)
+        if jobs.is_full():
+            raise QueueFullError('La cola de trabajos está llena')
         
-        if transcript_result['success']:
-            # Generar nombre para el archivo de transcripción
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            transcript_filename = f"transcript_{timestamp}.txt"
-            transcript_filepath = os.path.join(app.config['UPLOAD_FOLDER'], transcript_filename)
-            
-            # Guardar transcripción
-            with open(transcript_filepath, 'w', encoding='utf-8') as f:
-                f.write(transcript_result['transcript'])
-            
-            return jsonify({
-                'success': True,
-                'message': 'Transcripción completada',
-                'transcript': transcript_result['transcript'],
-                'transcript_file': transcript_filename
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': transcript_result['error']
-            }), 500
-            
+        # Guardar el audio junto al estado del trabajo para poder reanudarlo
+        job_id = jobs.new_id()
+        input_path = os.path.join(app.config['JOBS_FOLDER'], f"{job_id}.input")
+        audio_hash = None
+        with metrics.stage('disk.write'):
+            if streaming:
+                # Guardar y calcular el hash en la misma pasada
+                _, results = stream_to_sinks(request.stream, [FileSink(input_path), HashSink()])
+                audio_hash = results['sha256']
+            else:
+                audio_file.save(input_path)
+        metrics.record_bytes('disk', 'out', os.path.getsize(input_path))
+        
+        try:
+            job = jobs.submit(
+                'transcribe-direct',
+                {
+                    'input_path': input_path,
+                    'filename': original_filename,
+                    'content_type': content_type,
+                    'audio_hash': audio_hash,
+                    'backend': backend_name,
+                    'request_id': metrics.current_trace_id()
+                },
+                job_id=job_id
+            )
+        except QueueFullError:
+            os.unlink(input_path)
+            raise
+        
+        return job_accepted_response(job)
+        
+    except QueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
         print(f"Error en transcribe_direct: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def get_recordings():
-    """Obtener lista de grabaciones guardadas"""
-    recordings = []
-    recordings_file = os.path.join(app.config['UPLOAD_FOLDER'], 'recordings.json')
+def transcribe_direct_reference(data):
+    """Encolar la transcripción de una grabación del almacén indicada por nombre o id"""
+    filename, error = resolve_recording_reference(data.get('filename'), data.get('recording_id'))
+    if error:
+        return error
     
-    if os.path.exists(recordings_file):
+    backend_name = data.get('backend') or app.config['TRANSCRIPTION_BACKEND']
+    backend_error = validate_backend(backend_name)
+    if backend_error:
+        return backend_error
+    
+    if transcription_backends[backend_name].needs_api_key and not get_server_openai_key():
+        return openai_key_missing_response()
+    
+    job = jobs.submit('transcribe-direct', {
+        'filename': filename,
+        'backend': backend_name,
+        'request_id': metrics.current_trace_id()
+    })
+    return job_accepted_response(job, filename=filename)
+
+def resolve_recording_reference(filename=None, recording_id=None):
+    """Validar una grabación del almacén dada por su nombre o por su id de grabación.
+
+    Devuelve ``(nombre, None)`` o ``(None, respuesta de error)``.
+    """
+    if recording_id is not None:
         try:
-            with open(recordings_file, 'r') as f:
-                recordings = json.load(f)
-        except:
-            recordings = []
+            recording = recordings_store.get(int(recording_id))
+        except (TypeError, ValueError):
+            return None, (jsonify({'success': False, 'error': 'recording_id inválido'}), 400)
+        if not recording:
+            return None, (jsonify({'success': False, 'error': 'Grabación no encontrada'}), 404)
+        filename = recording['filename']
+    
+    if not filename or not isinstance(filename, str):
+        return None, (jsonify({'success': False, 'error': 'Se requiere filename o recording_id'}), 400)
+    
+    # Mismas reglas que los lotes: solo nombres de audio del almacén, sin rutas
+    selection = select_files(app.config['UPLOAD_FOLDER'], blob_store, names=[filename])
+    if selection['invalid']:
+        return None, (jsonify({'success': False, 'error': 'Archivo no encontrado'}), 404)
+    return filename, None
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """API para consultar el estado y resultado de un trabajo.
+
+    Con ``?wait=<segundos>`` la petición espera (long-poll) hasta que el
+    trabajo termine o se agote el tiempo; con ``&since=<versión>`` también
+    responde en cuanto el trabajo cambia respecto a esa versión.
+    """
+    try:
+        wait = min(float(request.args.get('wait', 0)), app.config['JOB_MAX_WAIT'])
+        since = request.args.get('since', type=int)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetro wait inválido'}), 400
+    
+    job = jobs.wait(job_id, wait, since_version=since) if wait > 0 else jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream SSE con cada cambio de estado de un trabajo"""
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Trabajo no encontrado'}), 404
+    
+    def generate(job):
+        yield f"data: {json.dumps(job)}\n\n"
+        while job['status'] not in FINISHED_STATES:
+            version = job['version']
+            job = jobs.wait(job_id, app.config['JOB_MAX_WAIT'], since_version=version)
+            if not job:
+                break
+            if job['version'] == version and job['status'] not in FINISHED_STATES:
+                # Sin cambios en el intervalo: comentario para mantener viva la conexión
+                yield ": keepalive\n\n"
+            else:
+                yield f"data: {json.dumps(job)}\n\n"
     
-    return recordings
+    return Response(stream_with_context(generate(job)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """API con los contadores de aciertos y fallos de la caché de transcripciones"""
+    return jsonify({'success': True, 'cache': transcript_cache.stats()})
+
+@app.route('/api/storage/stats')
+def storage_stats():
+    """API con nombres, blobs y bytes ahorrados por la deduplicación del almacén de audio"""
+    return jsonify({'success': True, 'storage': blob_store.stats()})
+
+@app.route('/api/maintenance/report')
+def maintenance_report():
+    """API con lo que recuperaría ahora el mantenimiento (sin ejecutarlo) y su última pasada"""
+    try:
+        return jsonify({
+            'success': True,
+            'dry_run': maintenance.report(),
+            'last_run': maintenance.last_run()
+        })
+    except Exception as e:
+        print(f"Error en maintenance_report: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/search')
+def search_transcripts():
+    """API de búsqueda en las transcripciones: resultados por relevancia, paginados y con fragmentos.
+
+    ``q`` admite varias palabras (deben aparecer todas) y prefijos con ``*``.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Parámetro q requerido'}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(max(1, int(request.args.get('per_page', 20))), 100)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros de paginación inválidos'}), 400
+    
+    try:
+        with metrics.stage('search'):
+            results, total = transcript_index.search(query, limit=per_page, offset=(page - 1) * per_page)
+    except Exception as e:
+        print(f"Error en search_transcripts: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'query': query,
+        'results': results,
+        'total': total,
+        'page': page,
+        'per_page': per_page
+    })
+
+@app.route('/api/scheduler/stats')
+def scheduler_stats():
+    """API con la espera en cola, los reintentos y las peticiones duplicadas hacia Whisper"""
+    return jsonify({'success': True, 'scheduler': whisper_scheduler.stats()})
+
+@app.route('/api/backends')
+def list_backends():
+    """API con los backends de transcripción, su disponibilidad y sus estadísticas"""
+    return jsonify({
+        'success': True,
+        'default': app.config['TRANSCRIPTION_BACKEND'],
+        'backends': [
+            {
+                'name': name,
+                'model': backend.model_id,
+                'available': backend.available(),
+                'needs_api_key': backend.needs_api_key,
+                'stats': backend.stats()
+            }
+            for name, backend in transcription_backends.items()
+        ]
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas en el formato de texto de Prometheus"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@metrics.registry.collector
+def collect_component_stats():
+    """Publicar en /metrics las estadísticas del planificador, la caché y la cola"""
+    scheduler = whisper_scheduler.stats()
+    cache = transcript_cache.stats()
+    blobs = blob_store.stats()
+    waits = scheduler['queue_wait_seconds']
+    return [
+        ('grabador_whisper_calls_total', 'counter', 'Llamadas a Whisper por resultado',
+         {(('result', name),): scheduler[name] for name in ('succeeded', 'failed')}),
+        ('grabador_whisper_retries_total', 'counter', 'Reintentos de llamadas a Whisper por motivo',
+         {(('reason', reason),): count for reason, count in scheduler['retry_reasons'].items()}),
+        ('grabador_whisper_hedges_total', 'counter', 'Peticiones duplicadas a Whisper',
+         {(('outcome', 'sent'),): scheduler['hedges'], (('outcome', 'won'),): scheduler['hedge_wins']}),
+        ('grabador_whisper_queue_wait_seconds', 'gauge', 'Espera en la cubeta de tokens (muestras recientes)',
+         {(('quantile', q),): waits[q] for q in ('p50', 'p95', 'p99', 'max')}),
+        ('grabador_transcript_cache_lookups_total', 'counter', 'Consultas a la caché de transcripciones',
+         {(('result', 'hit'),): cache['hits'], (('result', 'miss'),): cache['misses']}),
+        ('grabador_transcript_cache_disk_bytes', 'gauge', 'Bytes ocupados por la caché en disco',
+         {(): cache['disk_bytes']}),
+        ('grabador_jobs_active', 'gauge', 'Trabajos en curso o en cola',
+         {(): jobs.active_count()}),
+        ('grabador_cloud_uploads_active', 'gauge', 'Subidas a la nube en curso',
+         {(): upload_progress.active_count()}),
+        ('grabador_http_requests_in_flight_max', 'gauge', 'Máximo de peticiones de API simultáneas en este proceso',
+         {(): metrics.requests_in_flight.peak()}),
+        ('grabador_blob_store_bytes', 'gauge', 'Bytes de audio en el almacén por contenido',
+         {(('kind', kind),): blobs[f"{kind}_bytes"] for kind in ('logical', 'stored', 'saved')})
+    ]
+
+@app.route('/api/live/start', methods=['POST'])
+def start_live_transcription():
+    """API para iniciar la transcripción en vivo de la grabación activa"""
+    try:
+        recording_info = session.get('recording_info')
+        if not recording_info:
+            return jsonify({'success': False, 'error': 'No hay grabación activa'}), 400
+        
+        data = request.get_json(silent=True) or {}
+        backend_name = data.get('backend') or app.config['TRANSCRIPTION_BACKEND']
+        backend_error = validate_backend(backend_name)
+        if backend_error:
+            return backend_error
+        
+        if transcription_backends[backend_name].needs_api_key and not get_server_openai_key():
+            return openai_key_missing_response()
+        
+        live_id = live_transcriber.start(recording_info['filename'], backend=backend_name)
+        recording_info['live_session'] = live_id
+        session['recording_info'] = recording_info
+        
+        return jsonify({
+            'success': True,
+            'live_id': live_id,
+            'backend': backend_name,
+            'segment_url': f"/api/live/{live_id}/segments/",
+            'events_url': f"/api/live/{live_id}/events"
+        }), 201
+    except Exception as e:
+        print(f"Error en start_live_transcription: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/live/<live_id>/segments/<int:index>', methods=['PUT'])
+def upload_live_segment(live_id, index):
+    """API para recibir un segmento de audio autocontenido y transcribirlo en segundo plano"""
+    try:
+        if not request.mimetype.startswith('audio/'):
+            return jsonify({'success': False, 'error': 'El archivo debe ser de audio'}), 400
+        
+        extension = LIVE_SEGMENT_EXTENSIONS.get(request.mimetype, 'webm')
+        live_transcriber.add_segment(live_id, index, request.stream, extension=extension)
+        return jsonify({'success': True, 'index': index}), 202
+    except KeyError:
+        return jsonify({'success': False, 'error': 'Sesión en vivo no encontrada'}), 404
+    except Exception as e:
+        print(f"Error en upload_live_segment: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/live/<live_id>')
+def live_transcript(live_id):
+    """API con la transcripción parcial; ``?since=<versión>&wait=<segundos>`` para long-poll"""
+    try:
+        since = request.args.get('since', type=int)
+        wait = min(float(request.args.get('wait', 0)), app.config['JOB_MAX_WAIT'])
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetro wait inválido'}), 400
+    
+    if since is not None and wait > 0:
+        snapshot = live_transcriber.wait(live_id, since, wait)
+    else:
+        snapshot = live_transcriber.snapshot(live_id)
+    
+    if not snapshot:
+        return jsonify({'success': False, 'error': 'Sesión en vivo no encontrada'}), 404
+    return jsonify({'success': True, 'live': snapshot})
+
+@app.route('/api/live/<live_id>/events')
+def live_events(live_id):
+    """Stream SSE con la transcripción parcial cada vez que termina un segmento"""
+    snapshot = live_transcriber.snapshot(live_id)
+    if not snapshot:
+        return jsonify({'success': False, 'error': 'Sesión en vivo no encontrada'}), 404
+    
+    def generate(snapshot):
+        while snapshot:
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            snapshot = live_transcriber.wait(live_id, snapshot['version'], app.config['JOB_MAX_WAIT'])
+    
+    return Response(stream_with_context(generate(snapshot)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/api/live/<live_id>/finish', methods=['POST'])
+def finish_live_transcription(live_id):
+    """API para cerrar la sesión en vivo y guardar la transcripción completa"""
+    try:
+        snapshot = live_transcriber.finish(live_id, app.config['LIVE_FINISH_TIMEOUT'])
+        if not snapshot:
+            return jsonify({'success': False, 'error': 'Sesión en vivo no encontrada'}), 404
+        
+        if snapshot['pending']:
+            return jsonify({
+                'success': False,
+                'error': 'Quedan segmentos pendientes de transcribir',
+                'live': snapshot
+            }), 504
+        
+        # Guardar transcripción junto a la grabación, con el nombre con que quedó guardada
+        filename = snapshot['filename']
+        recording_info = session.get('recording_info')
+        if recording_info and recording_info.get('live_session') == live_id:
+            filename = recording_info['filename']
+        transcript_filename = transcript_name(filename)
+        save_transcript(transcript_filename, snapshot['text'], filename, source='live')
+        
+        failed = [segment['index'] for segment in snapshot['segments'] if segment['status'] == 'failed']
+        return jsonify({
+            'success': True,
+            'message': 'Transcripción completada',
+            'transcript': snapshot['text'],
+            'transcript_file': transcript_filename,
+            'failed_segments': failed
+        })
+    except Exception as e:
+        print(f"Error en finish_live_transcription: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def get_server_openai_key():
+    """API key de OpenAI configurada en el servidor, o ``None`` si falta"""
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    if not openai_api_key or openai_api_key == 'your-openai-api-key-here':
+        return None
+    return openai_api_key
+
+def validate_backend(name):
+    """Respuesta 400 si el backend pedido no existe o no está disponible; ``None`` si es válido"""
+    backend = transcription_backends.get(name)
+    if backend is None:
+        return jsonify({
+            'success': False,
+            'error': f"Backend de transcripción no soportado: {name}"
+        }), 400
+    if not backend.available():
+        return jsonify({
+            'success': False,
+            'error': f"El backend {name} no está disponible en este servidor"
+        }), 400
+    return None
+
+def get_backend(name=None):
+    """Backend de transcripción por nombre, o el configurado por defecto"""
+    return transcription_backends[name or app.config['TRANSCRIPTION_BACKEND']]
+
+def openai_key_missing_response():
+    return jsonify({
+        'success': False, 
+        'error': 'OPENAI_API_KEY no configurada. Por favor, edita el archivo .env y añade tu API key de OpenAI.'
+    }), 500
+
+def job_accepted_response(job, **extra):
+    """Respuesta 202 con el identificador del trabajo encolado"""
+    return jsonify({
+        'success': True,
+        'message': 'Trabajo encolado',
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': f"/api/jobs/{job['id']}",
+        **extra
+    }), 202
+
+def queue_full_response(error):
+    """Respuesta 429 cuando la cola de trabajos no admite más trabajo"""
+    response = jsonify({'success': False, 'error': str(error)})
+    response.headers['Retry-After'] = str(app.config['JOB_RETRY_AFTER'])
+    return response, 429
+
+def run_transcribe_job(job_id, payload, secrets):
+    """Trabajo: transcribir un archivo de uploads y archivarlo en S3"""
+    filename = payload['filename']
+    aws_credentials = secrets.get('aws_credentials')
+    openai_api_key = secrets.get('openai_api_key')
+    stored = blob_store.get(filename)
+    filepath = blob_store.path(filename)
+    if stored is None or filepath is None:
+        return {'success': False, 'error': 'Archivo no encontrado'}
+    
+    # Archivar en S3 en paralelo mientras se transcribe el archivo local
+    jobs.update(job_id, progress='Transcribiendo y archivando en S3')
+    with ThreadPoolExecutor(max_workers=1) as archive_executor:
+        upload_future = archive_executor.submit(
+            metrics.copy_context().run, archive_to_aws_s3, filepath, filename, stored['sha256'], aws_credentials
+        )
+        transcript_result = transcribe_local_file(filepath, openai_api_key,
+                                                  backend=get_backend(payload.get('backend')),
+                                                  audio_hash=stored['sha256'])
+        upload_result = upload_future.result()
+    
+    if not transcript_result['success']:
+        return {
+            'success': False,
+            'error': f"Error en transcripción: {transcript_result['error']}"
+        }
+    
+    # Guardar transcripción
+    transcript_filename = transcript_name(filename)
+    save_transcript(transcript_filename, transcript_result['transcript'], filename, source='recording',
+                    timing=transcript_result.get('timing'))
+    
+    result = {
+        'success': True,
+        'message': 'Transcripción completada',
+        'transcript': transcript_result['transcript'],
+        'transcript_file': transcript_filename,
+        'audio_url': upload_result.get('url'),
+        'archive_skipped': upload_result.get('skipped', False),
+        'cached': transcript_result.get('cached', False),
+        'preprocessing': transcript_result.get('preprocessing')
+    }
+    
+    # La transcripción ya está guardada aunque el archivado haya fallado
+    if not upload_result['success']:
+        result['archive_error'] = f"Error al subir a S3: {upload_result['error']}"
+    
+    return result
+
+def run_transcribe_batch_job(job_id, payload, secrets):
+    """Trabajo: transcribir una lista de archivos de uploads con concurrencia limitada"""
+    openai_api_key = get_server_openai_key()
+    backend = get_backend(payload.get('backend'))
+    if backend.needs_api_key and not openai_api_key:
+        return {'success': False, 'error': 'OPENAI_API_KEY no configurada'}
+    
+    # Recalcular los pendientes: tras un reinicio se omiten los ya transcritos
+    selection = select_files(app.config['UPLOAD_FOLDER'], blob_store, names=payload['files'])
+    
+    def on_progress(summary):
+        done = summary['completed'] + summary['failed']
+        jobs.update(job_id, progress=f"{done}/{summary['total']} archivos", batch=summary)
+    
+    # Cada hilo del lote ejecuta en una copia del contexto del trabajo para conservar su traza
+    context = metrics.copy_context()
+    summary = run_batch(
+        selection['pending'],
+        lambda filename: context.copy().run(transcribe_upload, filename, openai_api_key, backend),
+        concurrency=payload['concurrency'],
+        per_minute=payload['rate_limit'],
+        on_progress=on_progress
+    )
+    
+    return {
+        'success': True,
+        'message': f"{summary['completed']} transcritos, {summary['failed']} con error",
+        'skipped': selection['skipped'],
+        **summary
+    }
+
+def transcribe_upload(filename, api_key, backend=None):
+    """Transcribir un archivo de uploads y guardar su ``_transcript.txt`` al lado"""
+    stored = blob_store.get(filename)
+    filepath = blob_store.path(filename)
+    if stored is None or filepath is None:
+        return {'success': False, 'error': 'Archivo no encontrado'}
+    transcript_result = transcribe_local_file(filepath, api_key, backend=backend, audio_hash=stored['sha256'])
+    if not transcript_result['success']:
+        return {'success': False, 'error': transcript_result['error']}
+    
+    save_transcript(transcript_name(filename), transcript_result['transcript'], filename, source='recording',
+                    timing=transcript_result.get('timing'))
+    
+    return {
+        'success': True,
+        'bytes': os.path.getsize(filepath),
+        'transcript': transcript_result['transcript'],
+        'transcript_file': transcript_name(filename),
+        'cached': transcript_result.get('cached', False),
+        'preprocessing': transcript_result.get('preprocessing')
+    }
+
+def save_transcript(transcript_filename, text, recording_filename=None, source=None, timing=None):
+    """Guardar una transcripción en uploads e indexarla para la búsqueda.
+
+    Se escribe de forma atómica para que un archivo a medias no cuente como
+    transcrito. Las marcas de tiempo (``timing``) van a su sidecar; si no
+    hay, se borra el de una transcripción anterior. Un fallo del índice o
+    del sidecar no impide guardar la transcripción.
+    """
+    transcript_filepath = os.path.join(app.config['UPLOAD_FOLDER'], transcript_filename)
+    with metrics.stage('transcript.write'), open(f"{transcript_filepath}.tmp", 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(f"{transcript_filepath}.tmp", transcript_filepath)
+    
+    try:
+        with metrics.stage('transcript.timing'):
+            if timing:
+                transcript_timings.save(transcript_filename, timing)
+            else:
+                transcript_timings.delete(transcript_filename)
+    except Exception as e:
+        print(f"Error al guardar las marcas de tiempo de {transcript_filename}: {e}")
+    
+    try:
+        recording = recordings_store.get_by_filename(recording_filename) if recording_filename else None
+        with metrics.stage('transcript.index'):
+            transcript_index.add(transcript_filename, text, recording_filename,
+                                 recording['id'] if recording else None, source=source)
+    except Exception as e:
+        print(f"Error al indexar {transcript_filename}: {e}")
+    return transcript_filepath
+
+def run_transcribe_direct_job(job_id, payload, secrets):
+    """Trabajo: transcribir directamente un audio recibido por la API o una grabación del almacén"""
+    openai_api_key = get_server_openai_key()
+    if 'input_path' not in payload:
+        # Por referencia: la transcripción se guarda junto a la grabación
+        jobs.update(job_id, progress='Transcribiendo audio')
+        result = transcribe_upload(payload['filename'], openai_api_key, get_backend(payload.get('backend')))
+        if not result['success']:
+            return result
+        return {
+            'success': True,
+            'message': 'Transcripción completada',
+            'filename': payload['filename'],
+            'transcript': result['transcript'],
+            'transcript_file': result['transcript_file'],
+            'cached': result['cached'],
+            'preprocessing': result['preprocessing']
+        }
+    
+    input_path = payload['input_path']
+    try:
+        jobs.update(job_id, progress='Transcribiendo audio')
+        transcript_result = transcribe_local_file(
+            input_path, openai_api_key,
+            backend=get_backend(payload.get('backend')),
+            audio_hash=payload.get('audio_hash')
+        )
+    finally:
+        if os.path.exists(input_path):
+            os.unlink(input_path)
+    
+    if not transcript_result['success']:
+        return transcript_result
+    
+    # Generar nombre para el archivo de transcripción
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    transcript_filename = f"transcript_{timestamp}.txt"
+    
+    # Guardar transcripción
+    save_transcript(transcript_filename, transcript_result['transcript'], source='direct',
+                    timing=transcript_result.get('timing'))
+    
+    return {
+        'success': True,
+        'message': 'Transcripción completada',
+        'transcript': transcript_result['transcript'],
+        'transcript_file': transcript_filename,
+        'cached': transcript_result.get('cached', False),
+        'preprocessing': transcript_result.get('preprocessing')
+    }
+
+def get_recordings(project_name=None, date_from=None, date_to=None, after=None, before=None, per_page=50):
+    """Obtener una página de grabaciones guardadas, el total que cumple los filtros y los cursores vecinos.
+
+    Se pide una grabación de más para saber si hay otra página en la
+    dirección en que se avanza.
+    """
+    recordings, total = recordings_store.query(
+        project_name=project_name,
+        date_from=date_from,
+        date_to=date_to,
+        limit=per_page + 1,
+        after=after,
+        before=None if after else before
+    )
+    if before and not after:
+        has_prev, has_next = len(recordings) > per_page, True
+        recordings = recordings[-per_page:]
+    else:
+        has_prev, has_next = after is not None, len(recordings) > per_page
+        recordings = recordings[:per_page]
+    return {
+        'recordings': recordings,
+        'total': total,
+        'next_cursor': encode_cursor(recordings[-1]) if has_next and recordings else None,
+        'prev_cursor': encode_cursor(recordings[0]) if has_prev and recordings else None
+    }
 
 def save_recording_info(recording_info):
     """Guardar información de la grabación"""
-    recordings_file = os.path.join(app.config['UPLOAD_FOLDER'], 'recordings.json')
-    recordings = get_recordings()
-    
     recording_info['created_at'] = datetime.now().isoformat()
-    recordings.append(recording_info)
+    recording_info['id'] = recordings_store.add(recording_info)
+    return recording_info
+
+def transcribe_live_segment(path, backend_name=None):
+    """Transcribir un segmento de una sesión en vivo con su backend y devolver su texto"""
+    result = transcribe_local_file(path, get_server_openai_key(), backend=get_backend(backend_name))
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return result['transcript']
+
+# Extensión con la que se guarda cada segmento según su tipo MIME
+LIVE_SEGMENT_EXTENSIONS = {
+    'audio/webm': 'webm',
+    'audio/ogg': 'ogg',
+    'audio/wav': 'wav',
+    'audio/x-wav': 'wav',
+    'audio/mp4': 'm4a',
+    'audio/mpeg': 'mp3'
+}
+
+live_transcriber = LiveTranscriber(
+    app.config['LIVE_FOLDER'],
+    transcribe_live_segment,
+    max_workers=app.config['LIVE_WORKERS']
+)
+
+def traced_job(handler, pipeline):
+    """Ejecutar un trabajo dentro de una traza con el nombre del endpoint que lo creó"""
+    def run(job_id, payload, secrets):
+        with metrics.trace(job_id, pipeline, app.config['TRACE_LOG_MIN_MS']) as trace:
+            trace.fields.update(job_id=job_id, request_id=payload.get('request_id'))
+            result = handler(job_id, payload, secrets)
+            if not result.get('success'):
+                metrics.record_error('job', 'failed')
+            return result
+    return run
+
+jobs.register('transcribe', traced_job(run_transcribe_job, 'transcribe_audio'))
+jobs.register('transcribe-direct', traced_job(run_transcribe_direct_job, 'transcribe_direct'), resumable=True)
+jobs.register('transcribe-batch', traced_job(run_transcribe_batch_job, 'transcribe_batch'), resumable=True)
+jobs.register('preprocess', traced_job(run_preprocess_job, 'save_audio'), resumable=True)
+
+def archive_to_aws_s3(filepath, filename, sha256, credentials):
+    """Archivar en S3 una grabación del almacén, con clave por contenido.
+
+    La clave deriva del SHA-256 del audio, así que si el objeto ya existe
+    (comprobado con una petición HEAD) no se vuelve a subir.
+    """
+    from werkzeug.datastructures import FileStorage
+    
+    key_name = f"sha256/{sha256}{os.path.splitext(filename)[1]}"
+    try:
+        with metrics.stage('aws-s3.head'):
+            exists = s3_object_exists(get_s3_client(credentials), credentials['bucket'], f"audio/{key_name}")
+    except Exception as e:
+        print(f"Error al comprobar el objeto en S3: {e}")
+        exists = False
+    if exists:
+        url = f"https://{credentials['bucket']}.s3.{credentials['region']}.amazonaws.com/audio/{key_name}"
+        return {'success': True, 'url': url, 's3_key': f"audio/{key_name}", 'skipped': True}
     
-    with open(recordings_file, 'w') as f:
-        json.dump(recordings, f, indent=2)
+    with open(filepath, 'rb') as file:
+        file_storage = FileStorage(
+            stream=file,
+            filename=filename,
+            content_type=mimetypes.guess_type(filename)[0] or 'audio/wav'
+        )
+        return upload_to_aws_s3(file_storage, key_name, credentials)
+
+def offload_recording(filepath, filename, sha256):
+    """Archivar en la nube configurada una grabación que caduca por la política de retención"""
+    from werkzeug.datastructures import FileStorage
+    
+    with open(app.config['OFFLOAD_CREDENTIALS_FILE'], 'r', encoding='utf-8') as f:
+        credentials = json.load(f)
+    
+    with metrics.trace(metrics.new_trace_id(), 'maintenance_offload', app.config['TRACE_LOG_MIN_MS']):
+        if app.config['OFFLOAD_PROVIDER'] == 'aws-s3':
+            return archive_to_aws_s3(filepath, filename, sha256, credentials)
+        
+        with open(filepath, 'rb') as file:
+            file_storage = FileStorage(
+                stream=file,
+                filename=filename,
+                content_type=mimetypes.guess_type(filename)[0] or 'audio/wav'
+            )
+            return upload_to_google_cloud(file_storage, f"sha256/{sha256}{os.path.splitext(filename)[1]}", credentials)
 
-def upload_to_aws_s3(file, filename, credentials):
-    """Subir archivo a AWS S3"""
+def upload_to_aws_s3(file, filename, credentials, upload_id=None):
+    """Subir archivo a AWS S3 por partes en paralelo"""
     try:
-        import boto3
         from botocore.exceptions import ClientError
         
-        # Configurar cliente S3
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=credentials['accessKey'],
-            aws_secret_access_key=credentials['secretKey'],
-            region_name=credentials['region']
-        )
-        
         # Subir archivo
         bucket_name = credentials['bucket']
         s3_key = f"audio/{filename}"
         
-        s3_client.upload_fileobj(
-            file,
-            bucket_name,
-            s3_key,
-            ExtraArgs={'ContentType': file.content_type}
-        )
+        with metrics.stage('aws-s3.upload'):
+            result = upload_file_to_cloud('aws-s3', credentials, s3_key, file, upload_id)
         
         # Generar URL del archivo
         url = f"https://{bucket_name}.s3.{credentials['region']}.amazonaws.com/{s3_key}"
@@ -387,7 +1871,8 @@ def upload_to_aws_s3(file, filename, credentials):
         return {
             'success': True,
             'url': url,
-            's3_key': s3_key
+            's3_key': s3_key,
+            'sha256': result['sha256']
         }
         
     except ClientError as e:
@@ -403,36 +1888,99 @@ def upload_to_aws_s3(file, filename, credentials):
             'error': f"Error al subir a S3: {str(e)}"
         }
 
-def upload_to_google_cloud(file, filename, credentials):
-    """Subir archivo a Google Cloud Storage"""
+def upload_file_to_cloud(provider, credentials, key, file, upload_id=None):
+    """Copiar un archivo subido (o abierto desde disco) a la nube, registrando su progreso"""
+    upload_id = upload_id or metrics.new_trace_id()
+    upload_progress.start(upload_id, key, provider, file.content_length or None)
     try:
+        sink, _ = cloud_upload_sink(provider, credentials, key, file.content_type, upload_id)
+        size, results = stream_to_sinks(file.stream, [sink, HashSink()])
+    except Exception as e:
+        upload_progress.finish(upload_id, error=e)
+        raise
+    upload_progress.finish(upload_id)
+    metrics.record_bytes(provider, 'out', size)
+    return results
+
+def cloud_upload_sink(provider, credentials, key, content_type, upload_id):
+    """Destino de streaming por partes paralelas para S3 o Google Cloud, y la URL del objeto"""
+    def on_progress(amount):
+        upload_progress.uploaded(upload_id, amount)
+    
+    if provider == 'aws-s3':
+        sink = S3MultipartUpload(
+            get_s3_client(credentials), credentials['bucket'], key, content_type,
+            part_size=app.config['S3_PART_SIZE_MB'] * 1024 * 1024,
+            concurrency=app.config['CLOUD_UPLOAD_CONCURRENCY'],
+            max_retries=app.config['CLOUD_UPLOAD_MAX_RETRIES'],
+            on_progress=on_progress
+        )
+        return sink, f"https://{credentials['bucket']}.s3.{credentials['region']}.amazonaws.com/{key}"
+    
+    bucket = get_gcs_client(credentials).bucket(credentials['bucket'])
+    sink = GCSComposeUpload(
+        bucket, key, content_type,
+        part_size=app.config['GCS_PART_SIZE_MB'] * 1024 * 1024,
+        concurrency=app.config['CLOUD_UPLOAD_CONCURRENCY'],
+        max_retries=app.config['CLOUD_UPLOAD_MAX_RETRIES'],
+        on_progress=on_progress
+    )
+    return sink, f"https://storage.googleapis.com/{credentials['bucket']}/{key}"
+
+def get_s3_client(credentials):
+    """Obtener un cliente S3 con pool de conexiones para unas credenciales"""
+    def factory(credentials):
+        import boto3
+        from botocore.config import Config
+        
+        return boto3.client(
+            's3',
+            aws_access_key_id=credentials['accessKey'],
+            aws_secret_access_key=credentials['secretKey'],
+            region_name=credentials['region'],
+            config=Config(max_pool_connections=app.config['CLIENT_POOL_SIZE'])
+        )
+    
+    return clients.get('s3', credentials, factory)
+
+def get_gcs_client(credentials):
+    """Obtener un cliente de Google Cloud Storage para una cuenta de servicio"""
+    def factory(credentials):
         from google.cloud import storage
         from google.oauth2 import service_account
-        import tempfile
-        
-        # Crear archivo temporal con las credenciales
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            f.write(credentials['credentials'])
-            credentials_file = f.name
-        
-        # Configurar cliente de Google Cloud Storage
-        storage_client = storage.Client.from_service_account_json(credentials_file)
-        bucket = storage_client.bucket(credentials['bucket'])
         
+        # Las credenciales se cargan en memoria, sin archivo temporal
+        info = json.loads(credentials['credentials'])
+        service_credentials = service_account.Credentials.from_service_account_info(info)
+        return storage.Client(project=info.get('project_id'), credentials=service_credentials)
+    
+    return clients.get('gcs', credentials, factory)
+
+def get_openai_client(api_key):
+    """Obtener un cliente de OpenAI reutilizable para una API key"""
+    def factory(api_key):
+        import openai
+        # Los reintentos los gestiona whisper_scheduler, no el SDK
+        return openai.OpenAI(api_key=api_key, max_retries=0,
+                             timeout=app.config['OPENAI_TIMEOUT_SECONDS'])
+    
+    return clients.get('openai', api_key, factory)
+
+def upload_to_google_cloud(file, filename, credentials, upload_id=None):
+    """Subir archivo a Google Cloud Storage por partes en paralelo"""
+    try:
         # Subir archivo
-        blob = bucket.blob(f"audio/{filename}")
-        blob.upload_from_file(file, content_type=file.content_type)
+        with metrics.stage('google-cloud.upload'):
+            result = upload_file_to_cloud('google-cloud', credentials, f"audio/{filename}", file, upload_id)
         
         # Generar URL del archivo
         url = f"https://storage.googleapis.com/{credentials['bucket']}/audio/{filename}"
         
-        # Limpiar archivo temporal
-        os.unlink(credentials_file)
-        
         return {
             'success': True,
             'url': url,
-            'gcs_path': f"audio/{filename}"
+            'gcs_path': f"audio/{filename}",
+            'sha256': result['sha256']
         }
         
     except Exception as e:
@@ -442,96 +1990,234 @@ def upload_to_google_cloud(file, filename, credentials):
             'error': f"Error al subir a Google Cloud: {str(e)}"
         }
 
-def transcribe_with_openai(audio_url, api_key):
-    """Transcribir audio usando OpenAI Whisper API"""
+def transcribe_local_file(filepath, api_key=None, backend=None, audio_hash=None):
+    """Transcribir un archivo que ya está en disco con un backend de transcripción.
+
+    Si el mismo audio ya se transcribió con el mismo modelo, la transcripción
+    se devuelve desde la caché sin llamar al backend. Si el hash del audio ya
+    se calculó durante la ingesta se puede pasar en ``audio_hash``.
+    """
     try:
-        import openai
-        
-        # Configurar cliente de OpenAI
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Descargar el archivo de audio
-        import requests
-        response = requests.get(audio_url)
-        response.raise_for_status()
-        
-        # Crear archivo temporal
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            temp_file.write(response.content)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Transcribir con OpenAI
-            with open(temp_file_path, 'rb') as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
-            
+        backend = backend or get_backend()
+        if not audio_hash:
+            with metrics.stage('hash'):
+                audio_hash = hash_file(filepath)
+        timestamps = timestamps_mode()
+        response_format = f"verbose_json:{timestamps}" if timestamps else 'text'
+        cache_key = TranscriptCache.make_key(audio_hash, backend.model_id, response_format)
+        with metrics.stage('cache.lookup'):
+            cached = transcript_cache.get(cache_key)
+        if cached is not None:
+            timing = json.loads(cached) if timestamps else None
             return {
                 'success': True,
-                'transcript': transcript
+                'transcript': timing['text'] if timing else cached,
+                'timing': timing,
+                'cached': True
             }
-            
-        finally:
-            # Limpiar archivo temporal
-            os.unlink(temp_file_path)
-            
-    except Exception as e:
-        print(f"Error en transcripción: {e}")
-        return {
-            'success': False,
-            'error': f"Error en transcripción: {str(e)}"
-        }
-
-def transcribe_file_with_openai(audio_file, api_key):
-    """Transcribir archivo de audio directamente usando OpenAI Whisper API"""
-    try:
-        import openai
-        
-        # Configurar cliente de OpenAI
-        client = openai.OpenAI(api_key=api_key)
         
-        # Guardar el archivo temporalmente y luego enviarlo
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-            audio_file.save(temp_file.name)
-            temp_file_path = temp_file.name
+        # Enviar una versión normalizada (más pequeña) si el audio lo necesita
+        preprocessing = None
+        source_path = filepath
+        if app.config['AUDIO_PREPROCESS_ON_TRANSCRIBE'] and needs_preprocessing(filepath):
+            import tempfile
+            extension = '.flac' if app.config['AUDIO_PREPROCESS_FORMAT'] == 'flac' else '.wav'
+            with tempfile.NamedTemporaryFile(suffix=extension, dir=blob_store.temp_folder, delete=False) as temp_file:
+                source_path = temp_file.name
         
         try:
-            # Transcribir el archivo temporal
-            with open(temp_file_path, 'rb') as file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=file,
-                    response_format="text"
-                )
-            
-            return {
-                'success': True,
-                'transcript': transcript
-            }
-            
+            if source_path != filepath:
+                with metrics.stage('preprocess'):
+                    preprocessing = preprocess_file(filepath, source_path,
+                                                    audio_format=app.config['AUDIO_PREPROCESS_FORMAT'])
+                if preprocessing_problem(preprocessing):
+                    # Enviar el original si la versión normalizada no es utilizable
+                    preprocessing = {**preprocessing, 'skipped': True, 'reason': preprocessing_problem(preprocessing)}
+                    os.unlink(source_path)
+                    source_path = filepath
+            with metrics.stage(f"backend.{backend.name}"):
+                result = backend.transcribe(source_path, api_key, timestamps=timestamps)
         finally:
-            # Limpiar archivo temporal
-            os.unlink(temp_file_path)
+            if source_path != filepath:
+                os.unlink(source_path)
+        
+        timing = None
+        if timestamps:
+            # Las marcas se refieren al audio original, no al recortado al normalizar
+            timing = shift_timing(result, (preprocessing or {}).get('trimmed_start', 0))
+            result = timing['text']
+        with metrics.stage('cache.store'):
+            transcript_cache.put(cache_key, json.dumps(timing, ensure_ascii=False) if timing else result)
+        
+        return {
+            'success': True,
+            'transcript': result,
+            'timing': timing,
+            'cached': False,
+            'backend': backend.name,
+            'preprocessing': preprocessing
+        }
         
     except Exception as e:
-        print(f"Error en transcripción directa: {e}")
+        print(f"Error en transcripción: {e}")
         return {
             'success': False,
-            'error': f"Error en transcripción directa: {str(e)}"
+            'error': f"Error en transcripción: {str(e)}"
         }
 
+def timestamps_mode():
+    """Granularidad de las marcas de tiempo configurada, o ``None`` si están desactivadas"""
+    mode = app.config['TRANSCRIPT_TIMESTAMPS']
+    return mode if mode in GRANULARITIES else None
+
+def transcribe_path_with_openai(path, api_key, model="whisper-1", timestamps=None):
+    """Transcribir un archivo local con la API de OpenAI (backend ``openai``)"""
+    # Cliente de OpenAI reutilizado entre peticiones
+    client = get_openai_client(api_key)
+    return transcribe_path(client, path, model=model, timestamps=timestamps)
+
+def transcribe_path(client, path, workers=None, model="whisper-1", timestamps=None):
+    """Transcribir un archivo local, dividiéndolo en segmentos si es un WAV largo.
+
+    Los segmentos se envían en paralelo con un máximo de ``workers`` llamadas
+    simultáneas y las transcripciones parciales se unen quitando el solape.
+    Con ``timestamps`` devuelve también segmentos y palabras con su instante
+    (ver ``create_transcription``), ya referidos al inicio del archivo.
+    ``client`` puede ser cualquier objeto con ``audio.transcriptions.create``.
+    """
+    chunks = plan_wav_chunks(
+        path,
+        chunk_seconds=app.config['TRANSCRIBE_CHUNK_SECONDS'],
+        overlap_seconds=app.config['TRANSCRIBE_CHUNK_OVERLAP']
+    )
+    metrics.record_bytes('whisper', 'out', os.path.getsize(path))
+    
+    if not chunks or len(chunks) == 1:
+        return create_transcription(client, lambda: open(path, 'rb'), model, timestamps)
+    
+    def transcribe_chunk(index, start, end):
+        return create_transcription(
+            client,
+            lambda: read_wav_segment(path, start, end, name=f"chunk_{index:04d}.wav"),
+            model,
+            timestamps
+        )
+    
+    workers = workers or app.config['TRANSCRIBE_WORKERS']
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(metrics.copy_context().run, transcribe_chunk, index, start, end)
+            for index, (start, end) in enumerate(chunks)
+        ]
+        parts = [future.result() for future in futures]
+    
+    if not timestamps:
+        return merge_transcripts(parts)
+    
+    # Cada segmento de audio aporta lo que hay entre el final del anterior y su propio final
+    with wave.open(path, 'rb') as reader:
+        rate = reader.getframerate()
+    regions = [(start / rate, (chunks[index - 1][1] if index else 0) / rate, end / rate)
+               for index, (start, end) in enumerate(chunks)]
+    return merge_timings(parts, regions, merge_transcripts([part['text'] for part in parts]))
+
+def create_transcription(client, open_file, model="whisper-1", timestamps=None):
+    """Llamar a ``audio.transcriptions.create`` a través de ``whisper_scheduler``.
+
+    ``open_file()`` se invoca en cada intento para que los reintentos y las
+    peticiones duplicadas lean el audio desde el principio. Sin ``timestamps``
+    se pide ``text`` y se devuelve el texto; con ``'segment'`` o ``'word'`` se
+    pide ``verbose_json`` con esas granularidades y se devuelve un dict con
+    ``text``, ``duration``, ``segments`` y ``words``.
+    """
+    options = {'response_format': 'text'}
+    if timestamps:
+        options = {
+            'response_format': 'verbose_json',
+            'timestamp_granularities': ['segment', 'word'] if timestamps == 'word' else ['segment']
+        }
+    
+    def attempt():
+        with open_file() as file:
+            return client.audio.transcriptions.create(model=model, file=file, **options)
+    
+    # La cubeta de tokens es por API key (los clientes de prueba comparten una)
+    with metrics.stage('whisper'):
+        response = whisper_scheduler.call(getattr(client, 'api_key', None), attempt)
+    return timing_from_response(response) if timestamps else response
+
+# Backends de transcripción seleccionables por petición (``backend``) o por configuración
+transcription_backends = {
+    'openai': OpenAIBackend(transcribe_path_with_openai),
+    'local': LocalWhisperBackend(
+        model_size=app.config['LOCAL_WHISPER_MODEL'],
+        device=app.config['LOCAL_WHISPER_DEVICE'],
+        compute_type=app.config['LOCAL_WHISPER_COMPUTE_TYPE'],
+        workers=app.config['LOCAL_WHISPER_WORKERS'],
+        cpu_threads=app.config['LOCAL_WHISPER_CPU_THREADS'],
+        batch_size=app.config['LOCAL_WHISPER_BATCH_SIZE'],
+        batch_wait_ms=app.config['LOCAL_WHISPER_BATCH_WAIT_MS'],
+        language=app.config['LOCAL_WHISPER_LANGUAGE']
+    ),
+    'stub': StubBackend(latency=app.config['STUB_BACKEND_LATENCY'])
+}
+
+# Retención de audio, compresión de transcripciones y limpieza de temporales
+maintenance = MaintenanceWorker(
+    app.config['UPLOAD_FOLDER'],
+    blob_store,
+    interval_seconds=app.config['MAINTENANCE_INTERVAL_MINUTES'] * 60,
+    audio_retention_days=app.config['AUDIO_RETENTION_DAYS'],
+    audio_action=app.config['AUDIO_RETENTION_ACTION'],
+    offload=(offload_recording
+             if app.config['OFFLOAD_PROVIDER'] and app.config['OFFLOAD_CREDENTIALS_FILE'] else None),
+    transcript_compress_days=app.config['TRANSCRIPT_COMPRESS_DAYS'],
+    temp_max_age_hours=app.config['TEMP_MAX_AGE_HOURS'],
+    job_retention_days=app.config['JOB_RETENTION_DAYS'],
+    temp_folders=[blob_store.temp_folder],
+    jobs_folder=app.config['JOBS_FOLDER'],
+    resumable_folder=app.config['RESUMABLE_FOLDER'],
+    live_folder=app.config['LIVE_FOLDER'],
+    cache=transcript_cache
+)
+maintenance_lock = FileLock(os.path.join(app.config['UPLOAD_FOLDER'], '.maintenance.lock'))
+
+def start_maintenance():
+    """Arrancar el hilo de mantenimiento en un solo proceso.
+
+    Con varios workers de gunicorn lo arranca el primero que obtiene el
+    bloqueo y lo conserva mientras vive; si ese proceso muere, el sistema
+    libera el bloqueo y lo toma el worker que lo sustituye.
+    """
+    if app.config['MAINTENANCE_INTERVAL_MINUTES'] and maintenance_lock.acquire(blocking=False):
+        maintenance.start()
+
+# Rutas de API excluidas de la protección CSRF (al importar, también bajo gunicorn)
+for view_name in ('start_recording', 'stop_recording', 'save_audio', 'upload_to_cloud',
+                  'transcribe_audio', 'transcribe_direct', 'transcribe_batch'):
+    csrf.exempt(app.view_functions[view_name])
+
+def create_app():
+    """Aplicación para un servidor WSGI de producción: ``gunicorn -c gunicorn.conf.py``.
+
+    La configuración se lee del entorno al importar el módulo, así que se
+    devuelve siempre la misma instancia. Aquí solo se aplica lo propio del
+    despliegue: las migraciones del formato anterior, el mantenimiento, sin recarga de plantillas y, detrás de TRUSTED_PROXIES
+    proxies inversos, la IP y el esquema reales de las cabeceras X-Forwarded-*.
+    """
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    
+    run_migrations()
+    start_maintenance()
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    proxies = app.config['TRUSTED_PROXIES']
+    if proxies and not isinstance(app.wsgi_app, ProxyFix):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    return app
+
 if __name__ == '__main__':
-    # Excluir rutas de API de la protección CSRF
-    csrf.exempt(app.view_functions['start_recording'])
-    csrf.exempt(app.view_functions['stop_recording'])
-    csrf.exempt(app.view_functions['save_audio'])
-    csrf.exempt(app.view_functions['upload_to_cloud'])
-    csrf.exempt(app.view_functions['transcribe_audio'])
-    csrf.exempt(app.view_functions['transcribe_direct'])
-    
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    # Servidor de desarrollo; en producción, gunicorn -c gunicorn.conf.py
+    # El modo debug (recarga y depurador) solo si se pide explícitamente
+    run_migrations()
+    start_maintenance()
+    app.run(debug=os.environ.get('FLASK_DEBUG', 'false').lower() in ('1', 'true'), host='0.0.0.0', port=5000)
@@ -0,0 +1,169 @@
+"""
+Segmentación de audio WAV para transcripción en paralelo
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import io
+import re
+import wave
+
+import numpy as np
+
+# Tipos de muestra soportados según el ancho en bytes del WAV
+SAMPLE_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def plan_wav_chunks(path, chunk_seconds=120, overlap_seconds=2.0,
+                    search_seconds=10.0, window_ms=30):
+    """Planificar los cortes de un WAV en silencios.
+
+    Devuelve una lista de tuplas ``(frame_inicio, frame_fin)`` con solape
+    entre segmentos consecutivos, o ``None`` si el archivo no es un WAV
+    PCM legible o es demasiado corto para dividirlo.
+    """
+    try:
+        reader = wave.open(path, 'rb')
+    except (wave.Error, EOFError):
+        return None
+
+    with reader:
+        framerate = reader.getframerate()
+        total_frames = reader.getnframes()
+        sample_width = reader.getsampwidth()
+
+        if sample_width not in SAMPLE_DTYPES or framerate <= 0:
+            return None
+
+        # La ventana de búsqueda no debe alcanzar el corte anterior
+        search_seconds = min(search_seconds, chunk_seconds * 0.4)
+        chunk_frames = max(1, int(chunk_seconds * framerate))
+        if total_frames <= chunk_frames + int(search_seconds * framerate):
+            return None
+
+        energy, window_frames = _window_energy(reader, window_ms)
+
+    overlap_frames = int(overlap_seconds * framerate)
+    search_windows = max(1, int(search_seconds * framerate) // window_frames)
+
+    # Buscar el punto de menor energía alrededor de cada corte ideal
+    cuts = []
+    previous = 0
+    target = chunk_frames
+    while target < total_frames - chunk_frames // 2:
+        center = target // window_frames
+        lo = max(0, center - search_windows)
+        hi = min(len(energy), center + search_windows + 1)
+        cut = target
+        if lo < hi:
+            quietest = lo + int(np.argmin(energy[lo:hi]))
+            cut = quietest * window_frames + window_frames // 2
+        # Cada corte avanza respecto al anterior; si no, corte fijo en el punto ideal
+        if not previous < cut < total_frames:
+            cut = target
+        cuts.append(cut)
+        previous = cut
+        target = cut + chunk_frames
+
+    boundaries = [0] + cuts + [total_frames]
+    return [
+        (max(0, boundaries[i] - overlap_frames if i else 0), boundaries[i + 1])
+        for i in range(len(boundaries) - 1)
+    ]
+
+
+def read_wav_segment(path, start_frame, end_frame, name='chunk.wav'):
+    """Extraer un rango de frames como un WAV independiente en memoria"""
+    with wave.open(path, 'rb') as reader:
+        params = reader.getparams()
+        reader.setpos(start_frame)
+        frames = reader.readframes(end_frame - start_frame)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as writer:
+        writer.setparams(params)
+        writer.writeframes(frames)
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+def _window_energy(reader, window_ms):
+    """Calcular la energía RMS por ventana leyendo el archivo por bloques"""
+    framerate = reader.getframerate()
+    channels = reader.getnchannels()
+    dtype = SAMPLE_DTYPES[reader.getsampwidth()]
+    window_frames = max(1, int(framerate * window_ms / 1000))
+    block_frames = window_frames * 1000
+
+    energies = []
+    reader.rewind()
+    while True:
+        raw = reader.readframes(block_frames)
+        if not raw:
+            break
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+        if dtype is np.uint8:
+            samples -= 128.0
+        samples = samples[:len(samples) - len(samples) % channels]
+        mono = samples.reshape(-1, channels).mean(axis=1)
+        usable = len(mono) - len(mono) % window_frames
+        if usable:
+            windows = mono[:usable].reshape(-1, window_frames)
+            energies.append(np.sqrt(np.mean(windows ** 2, axis=1)))
+        if usable < len(mono):
+            tail = mono[usable:]
+            energies.append(np.array([np.sqrt(np.mean(tail ** 2))]))
+
+    if not energies:
+        return np.zeros(1, dtype=np.float32), window_frames
+    return np.concatenate(energies), window_frames
+
+
+def _normalize_word(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+def merge_transcripts(parts, max_overlap_words=40, min_match_words=2):
+    """Unir transcripciones parciales eliminando el texto repetido por el solape.
+
+    Busca la secuencia común más larga entre el final del texto acumulado y
+    el inicio del siguiente fragmento, y descarta la copia duplicada.
+    """
+    merged = []
+    for part in parts:
+        words = (part or '').split()
+        if not words:
+            continue
+        if not merged:
+            merged = words
+            continue
+
+        tail = [_normalize_word(w) for w in merged[-max_overlap_words:]]
+        head = [_normalize_word(w) for w in words[:max_overlap_words]]
+        length, tail_end, head_end = _longest_common_run(tail, head)
+
+        if length >= min_match_words:
+            cut = len(merged) - len(tail) + tail_end
+            merged = merged[:cut] + words[head_end:]
+        else:
+            merged.extend(words)
+
+    return ' '.join(merged)
+
+
+def _longest_common_run(a, b):
+    """Longitud y posiciones finales de la subsecuencia contigua común más larga"""
+    best = (0, 0, 0)
+    previous = [0] * (len(b) + 1)
+    for i in range(1, len(a) + 1):
+        current = [0] * (len(b) + 1)
+        for j in range(1, len(b) + 1):
+            if a[i - 1] and a[i - 1] == b[j - 1]:
+                current[j] = previous[j - 1] + 1
+                if current[j] > best[0]:
+                    best = (current[j], i, j)
+        previous = current
+    return best
@@ -0,0 +1,223 @@
+"""
+Normalización de audio antes de guardar o transcribir
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import math
+import os
+import time
+import wave
+
+import numpy as np
+
+# Frecuencia de muestreo que usa Whisper internamente
+TARGET_RATE = 16000
+
+
+def pcm_to_float(raw, width):
+    """Convertir bytes PCM little-endian de ``width`` bytes por muestra a ``float32`` en [-1, 1]"""
+    if width == 1:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if width == 2:
+        return np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    if width == 3:
+        # Expandir muestras de 24 bits a int32 conservando el signo
+        bytes24 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(bytes24), 4), dtype=np.uint8)
+        padded[:, 1:] = bytes24
+        return padded.view('<i4').ravel().astype(np.float32) / 2147483648.0
+    if width == 4:
+        return np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    raise wave.Error(f"Ancho de muestra no soportado: {width}")
+
+
+def downmix(samples):
+    """Mezclar todos los canales a mono"""
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def mono_reader(reader):
+    """Función ``read(frames)`` que devuelve los siguientes frames de un WAV como señal mono ``float32``"""
+    channels, width = reader.getnchannels(), reader.getsampwidth()
+
+    def read(frames):
+        samples = pcm_to_float(reader.readframes(frames), width)
+        usable = len(samples) - len(samples) % channels
+        return downmix(samples[:usable].reshape(-1, channels))
+
+    return read
+
+
+def lowpass_kernel(source_rate, target_rate, taps=63):
+    """Filtro FIR paso bajo (sinc con ventana de Hamming) para reducir la frecuencia sin aliasing"""
+    cutoff = 0.5 * target_rate / source_rate
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample_blocks(read, total, source_rate, target_rate=TARGET_RATE, taps=63, block_seconds=30):
+    """Cambiar la frecuencia de muestreo de una señal mono leyéndola por bloques.
+
+    ``read(n)`` devuelve las siguientes ``n`` muestras de las ``total`` que
+    tiene la señal. Al reducir la frecuencia se aplica antes ``lowpass_kernel``;
+    después se interpola linealmente en la nueva rejilla de tiempos. Cada
+    bloque se filtra con ``taps`` muestras de contexto a cada lado y su
+    longitud es múltiplo del periodo común de ambas frecuencias, así que el
+    resultado coincide con procesar la señal entera y la memoria no depende
+    de la duración.
+    """
+    step = source_rate // math.gcd(source_rate, target_rate)
+    block = max(1, int(block_seconds * source_rate) // step) * step
+    target_total = int(round(total / source_rate * target_rate))
+    kernel = lowpass_kernel(source_rate, target_rate, taps) if target_rate < source_rate else None
+
+    history = np.zeros(taps, dtype=np.float32)  # ceros antes del inicio, como np.convolve(mode='same')
+    ahead = read(min(block, total))
+    consumed, produced = 0, 0
+    while len(ahead):
+        current = ahead
+        remaining = total - consumed - len(current)
+        ahead = read(min(block, remaining)) if remaining > 0 else ahead[:0]
+        if source_rate == target_rate:
+            yield current
+        else:
+            window = np.concatenate([history, current, ahead[:taps]])
+            if kernel is not None:
+                window = np.convolve(window, kernel, mode='same')
+            # Muestras de salida cuyo instante cae dentro del bloque actual
+            last = target_total if not len(ahead) else (consumed + len(current)) * target_rate // source_rate
+            positions = np.arange(produced, last) * (source_rate / target_rate) - consumed + len(history)
+            yield np.interp(positions, np.arange(len(window)), window).astype(np.float32)
+            produced = last
+            history = np.concatenate([history, current])[-taps:]
+        consumed += len(current)
+
+
+def silence_bounds(read, total, rate, threshold_db=-45.0, window_ms=20, padding_ms=250, block_windows=4096):
+    """Primer y último frame (exclusivo) con sonido, con ``padding_ms`` de margen.
+
+    Lee la señal por bloques con ``read(n)`` y mide la energía en ventanas
+    de ``window_ms``. Si ninguna ventana supera ``threshold_db`` (una
+    grabación muy baja, no necesariamente vacía) devuelve el rango completo.
+    """
+    window = max(1, int(rate * window_ms / 1000))
+    first = last = None
+    position = 0
+    while position < total:
+        samples = read(min(window * block_windows, total - position))
+        if not len(samples):
+            break
+        usable = len(samples) - len(samples) % window
+        if usable:
+            rms = np.sqrt(np.mean(samples[:usable].reshape(-1, window) ** 2, axis=1))
+            active = np.flatnonzero(20 * np.log10(np.maximum(rms, 1e-10)) > threshold_db)
+            if len(active):
+                first = position + active[0] * window if first is None else first
+                last = position + (active[-1] + 1) * window
+        position += len(samples)
+
+    if first is None:
+        return 0, total
+    padding = int(rate * padding_ms / 1000)
+    return max(0, int(first) - padding), min(total, int(last) + padding)
+
+
+class AudioWriter:
+    """Escritura por bloques de una señal mono como WAV PCM de 16 bits o FLAC.
+
+    ``flac`` requiere el paquete opcional ``soundfile``; si no está
+    disponible se guarda como WAV. ``format`` indica el formato usado.
+    """
+
+    def __init__(self, path, rate, audio_format='wav'):
+        self.format = 'wav'
+        self.frames = 0
+        if audio_format == 'flac':
+            try:
+                import soundfile
+                self._file = soundfile.SoundFile(path, 'w', samplerate=rate, channels=1,
+                                                 format='FLAC', subtype='PCM_16')
+                self.format = 'flac'
+                return
+            except ImportError:
+                pass
+
+        self._file = wave.open(path, 'wb')
+        self._file.setnchannels(1)
+        self._file.setsampwidth(2)
+        self._file.setframerate(rate)
+
+    def write(self, samples):
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+        if self.format == 'flac':
+            self._file.write(pcm)
+        else:
+            self._file.writeframes(pcm.tobytes())
+        self.frames += len(pcm)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def needs_preprocessing(path, target_rate=TARGET_RATE):
+    """Indica si el archivo es un WAV que aún no está en mono a ``target_rate`` Hz"""
+    try:
+        with wave.open(path, 'rb') as reader:
+            return not (reader.getnchannels() == 1 and reader.getframerate() == target_rate
+                        and reader.getsampwidth() == 2)
+    except (wave.Error, EOFError):
+        return False
+
+
+def preprocess_file(source, destination, target_rate=TARGET_RATE, audio_format='wav', trim=True):
+    """Normalizar un WAV: mono, ``target_rate`` Hz y sin silencios en los extremos.
+
+    El audio se procesa por bloques, así que la memoria no depende de la
+    duración. Devuelve estadísticas con los bytes y la duración antes y
+    después y el tiempo empleado. Si el archivo no es un WAV PCM legible
+    devuelve ``skipped`` sin escribir ``destination``.
+    """
+    start = time.perf_counter()
+    bytes_before = os.path.getsize(source)
+
+    try:
+        reader = wave.open(source, 'rb')
+    except (wave.Error, EOFError) as e:
+        return {'skipped': True, 'reason': f"No es un WAV PCM: {e}", 'bytes_before': bytes_before}
+
+    with reader:
+        rate, total = reader.getframerate(), reader.getnframes()
+        if reader.getsampwidth() not in (1, 2, 3, 4) or rate <= 0:
+            return {'skipped': True, 'reason': 'Formato de muestra no soportado', 'bytes_before': bytes_before}
+
+        first, end = 0, total
+        if trim:
+            # El inicio recortado se guarda para llevar las marcas de tiempo al audio original
+            first, end = silence_bounds(mono_reader(reader), total, rate)
+        reader.setpos(first)
+
+        with AudioWriter(destination, target_rate, audio_format) as writer:
+            for block in resample_blocks(mono_reader(reader), end - first, rate, target_rate):
+                writer.write(block)
+
+    return {
+        'skipped': False,
+        'format': writer.format,
+        'sample_rate': target_rate,
+        'bytes_before': bytes_before,
+        'bytes_after': os.path.getsize(destination),
+        'duration_before': round(total / rate, 3),
+        'duration_after': round(writer.frames / target_rate, 3),
+        'trimmed_start': round(first / rate, 3),
+        'seconds': round(time.perf_counter() - start, 4)
+    }
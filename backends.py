@@ -0,0 +1,334 @@
+"""
+Backends de transcripción intercambiables (OpenAI, Whisper local y stub)
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import bisect
+import importlib.util
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from transcript_cache import hash_file
+
+# Frecuencia a la que faster-whisper decodifica el audio
+SAMPLE_RATE = 16000
+
+# Duración máxima de un audio para inferirlo en un lote junto con otras peticiones
+BATCH_MAX_SECONDS = 30
+
+
+class TranscriptionBackend:
+    """Interfaz común: ``transcribe(path, api_key)`` devuelve el texto del audio.
+
+    Con ``timestamps`` (``'segment'`` o ``'word'``) devuelve en cambio un dict
+    con ``text``, ``duration``, ``segments`` y ``words``, cada elemento con
+    ``start`` y ``end`` en segundos. ``model_id`` identifica el modelo en la
+    caché de transcripciones, de modo que el mismo audio transcrito con
+    backends distintos no se mezcle.
+    """
+
+    name = None
+    model_id = None
+    needs_api_key = False
+
+    def available(self):
+        return True
+
+    def transcribe(self, path, api_key=None, timestamps=None):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class OpenAIBackend(TranscriptionBackend):
+    """Whisper en la API de OpenAI; ``transcribe_fn(path, api_key, model, timestamps)`` hace la llamada"""
+
+    name = 'openai'
+    needs_api_key = True
+
+    def __init__(self, transcribe_fn, model='whisper-1'):
+        self.transcribe_fn = transcribe_fn
+        self.model = model
+        self.model_id = model
+
+    def transcribe(self, path, api_key=None, timestamps=None):
+        return self.transcribe_fn(path, api_key, self.model, timestamps)
+
+
+class StubBackend(TranscriptionBackend):
+    """Backend determinista para pruebas: el texto depende solo del contenido del audio"""
+
+    name = 'stub'
+    model_id = 'stub'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def transcribe(self, path, api_key=None, timestamps=None):
+        if self.latency:
+            time.sleep(self.latency)
+        text = f"Transcripción de prueba {hash_file(path)[:12]} ({os.path.getsize(path)} bytes)"
+        if not timestamps:
+            return text
+        # Una palabra cada medio segundo, todas en un mismo segmento
+        words = [{'start': index * 0.5, 'end': index * 0.5 + 0.4, 'word': word}
+                 for index, word in enumerate(text.split())]
+        return {
+            'text': text,
+            'duration': words[-1]['end'],
+            'segments': [{'start': 0.0, 'end': words[-1]['end'], 'text': text}],
+            'words': words if timestamps == 'word' else []
+        }
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Whisper local en CPU con faster-whisper (dependencia opcional).
+
+    El modelo se carga una sola vez por proceso, en la primera petición, y
+    lo comparten ``workers`` hilos de inferencia fijos, así que nunca hay
+    más de ``workers`` inferencias simultáneas. Cada hilo toma una petición
+    de la cola y espera hasta ``batch_wait_ms`` a que lleguen más, hasta
+    ``batch_size``: los audios cortos (hasta ``BATCH_MAX_SECONDS``) del
+    mismo idioma se concatenan y se infieren en un único lote con
+    ``BatchedInferencePipeline``, pasando las zonas con voz de cada uno
+    como ``clip_timestamps``. Los audios largos se procesan por separado,
+    con sus fragmentos en lotes de ``batch_size``.
+    """
+
+    name = 'local'
+
+    def __init__(self, model_size='small', device='cpu', compute_type='int8', workers=2,
+                 cpu_threads=0, batch_size=8, language=None, max_queue=100, batch_wait_ms=50):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.workers = max(1, workers)
+        self.cpu_threads = cpu_threads
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.language = language or None
+        self.model_id = f"faster-whisper:{model_size}"
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._model = None
+        self._pipeline = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._counters = {'completed': 0, 'failed': 0, 'inference_seconds': 0.0, 'batches': 0, 'batched': 0}
+
+    def available(self):
+        return importlib.util.find_spec('faster_whisper') is not None
+
+    def transcribe(self, path, api_key=None, timestamps=None):
+        if not self.available():
+            raise RuntimeError('El backend local requiere faster-whisper: pip install faster-whisper')
+
+        self._start_workers()
+        future = Future()
+        self._queue.put((path, timestamps, future))
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            completed = self._counters['completed']
+            return {
+                'model': self.model_id,
+                'loaded': self._model is not None,
+                'workers': self.workers,
+                'queued': self._queue.qsize(),
+                'completed': completed,
+                'failed': self._counters['failed'],
+                'batches': self._counters['batches'],
+                'batched_requests': self._counters['batched'],
+                'mean_inference_seconds': (
+                    round(self._counters['inference_seconds'] / completed, 3) if completed else 0
+                )
+            }
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"whisper-local-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            requests = [self._queue.get()]
+            try:
+                model, pipeline = self._load()
+            except Exception as e:
+                self._fail(requests, e)
+                continue
+            if pipeline is not None and self.batch_wait > 0:
+                requests.extend(self._collect(self.batch_size - 1))
+
+            pending = []
+            for path, timestamps, future in requests:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    audio = self._decode(path)
+                except Exception as e:
+                    self._fail([(path, timestamps, future)], e)
+                    continue
+                pending.append({'audio': audio, 'timestamps': timestamps, 'future': future})
+
+            for group in self._group(model, pipeline, pending):
+                start = time.perf_counter()
+                try:
+                    if len(group) > 1:
+                        results = self._run_batch(pipeline, group)
+                    else:
+                        item = group[0]
+                        results = [self._run(model, pipeline, item['audio'], item['timestamps'],
+                                             item.get('language', self.language))]
+                except Exception as e:
+                    self._fail([(None, None, item['future']) for item in group], e)
+                    continue
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._counters['completed'] += len(group)
+                    self._counters['inference_seconds'] += elapsed
+                    if len(group) > 1:
+                        self._counters['batches'] += 1
+                        self._counters['batched'] += len(group)
+                for item, result in zip(group, results):
+                    item['future'].set_result(result)
+
+    def _collect(self, limit):
+        """Peticiones que llegan a la cola durante ``batch_wait`` segundos, como máximo ``limit``"""
+        collected = []
+        deadline = time.monotonic() + self.batch_wait
+        while len(collected) < limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                collected.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return collected
+
+    def _fail(self, requests, error):
+        with self._lock:
+            self._counters['failed'] += len(requests)
+        for _, _, future in requests:
+            if future.running() or future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _decode(self, path):
+        from faster_whisper import decode_audio
+
+        return decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+    def _group(self, model, pipeline, pending):
+        """Separar los audios cortos por idioma y modo de marcas para inferirlos juntos"""
+        if len(pending) < 2:
+            return [[item] for item in pending]
+
+        groups, single = {}, []
+        for item in pending:
+            if pipeline is None or len(item['audio']) > BATCH_MAX_SECONDS * SAMPLE_RATE:
+                single.append([item])
+                continue
+            language = self.language
+            if language is None and hasattr(model, 'detect_language'):
+                language = model.detect_language(audio=item['audio'])[0]
+            if language is None:
+                single.append([item])
+                continue
+            item['language'] = language
+            groups.setdefault((language, item['timestamps']), []).append(item)
+        return list(groups.values()) + single
+
+    def _load(self):
+        # Cargar el modelo una sola vez, aunque varios hilos lleguen a la vez
+        with self._lock:
+            if self._model is None:
+                import faster_whisper
+
+                self._model = faster_whisper.WhisperModel(
+                    self.model_size,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.workers
+                )
+                pipeline_class = getattr(faster_whisper, 'BatchedInferencePipeline', None)
+                if pipeline_class and self.batch_size > 1:
+                    self._pipeline = pipeline_class(model=self._model)
+            return self._model, self._pipeline
+
+    def _run(self, model, pipeline, audio, timestamps=None, language=None):
+        word_timestamps = timestamps == 'word'
+        if pipeline is not None:
+            segments, _ = pipeline.transcribe(audio, batch_size=self.batch_size, language=language,
+                                              word_timestamps=word_timestamps)
+        else:
+            segments, _ = model.transcribe(audio, language=language, vad_filter=True,
+                                           word_timestamps=word_timestamps)
+        return _local_result(list(segments), len(audio) / SAMPLE_RATE, timestamps)
+
+    def _run_batch(self, pipeline, group):
+        """Inferir varios audios cortos en un solo lote.
+
+        Se concatenan con un silencio entre ellos y las zonas con voz de
+        cada uno (VAD de Silero, como en la ruta normal) se pasan como
+        ``clip_timestamps``, de modo que cada zona es un elemento del lote.
+        Los segmentos se devuelven a su audio según su instante de inicio.
+        """
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        vad = VadOptions(max_speech_duration_s=BATCH_MAX_SECONDS, min_silence_duration_ms=160)
+        gap = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        parts, clips, offsets = [], [], []
+        position = 0
+        for item in group:
+            audio = item['audio']
+            offsets.append(position / SAMPLE_RATE)
+            for region in get_speech_timestamps(audio, vad):
+                clips.append({'start': (position + region['start']) / SAMPLE_RATE,
+                              'end': (position + region['end']) / SAMPLE_RATE})
+            parts.extend([audio, gap])
+            position += len(audio) + len(gap)
+
+        segments_by_item = [[] for _ in group]
+        if clips:
+            timestamps = group[0]['timestamps']
+            segments, _ = pipeline.transcribe(np.concatenate(parts), batch_size=self.batch_size,
+                                              language=group[0]['language'], clip_timestamps=clips,
+                                              word_timestamps=timestamps == 'word')
+            for segment in segments:
+                index = max(0, bisect.bisect_right(offsets, segment.start) - 1)
+                segments_by_item[index].append(segment)
+
+        return [_local_result(segments, len(item['audio']) / SAMPLE_RATE, item['timestamps'], offset)
+                for item, segments, offset in zip(group, segments_by_item, offsets)]
+
+
+def _local_result(segments, duration, timestamps, offset=0.0):
+    """Texto (o dict con marcas de tiempo) de los segmentos de faster-whisper, desplazados ``offset`` segundos"""
+    text = ' '.join(segment.text.strip() for segment in segments).strip()
+    if not timestamps:
+        return text
+    return {
+        'text': text,
+        'duration': duration,
+        'segments': [{'start': round(segment.start - offset, 3), 'end': round(segment.end - offset, 3),
+                      'text': segment.text.strip()}
+                     for segment in segments],
+        'words': [{'start': round(word.start - offset, 3), 'end': round(word.end - offset, 3),
+                   'word': word.word.strip()}
+                  for segment in segments for word in (segment.words or [])]
+    }
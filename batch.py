@@ -0,0 +1,130 @@
+"""
+Transcripción por lotes de los archivos del directorio de uploads
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Extensiones que se consideran audio al seleccionar archivos
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.mp3', '.m4a', '.ogg', '.flac')
+
+# Archivos recientes incluidos en cada actualización de progreso
+RECENT_FILES = 20
+
+
+def transcript_name(filename):
+    """Nombre del archivo de transcripción asociado a un audio"""
+    return f"{os.path.splitext(filename)[0]}_transcript.txt"
+
+
+def has_transcript(folder, filename):
+    """Si el audio ya tiene transcripción en ``folder``, comprimida o no"""
+    path = os.path.join(folder, transcript_name(filename))
+    return os.path.exists(path) or os.path.exists(f"{path}.gz")
+
+
+def select_files(folder, store, names=None, pattern=None):
+    """Elegir los audios del almacén ``store`` a transcribir.
+
+    Acepta una lista de nombres o un patrón glob (solo nombres, sin rutas).
+    Las transcripciones se buscan en ``folder``. Devuelve los pendientes,
+    los que ya tienen transcripción y los inválidos.
+    """
+    if names is None:
+        pattern = pattern or '*'
+        if '/' in pattern or '\\' in pattern:
+            return {'pending': [], 'skipped': [], 'invalid': [pattern]}
+        names = [name for name in store.names(pattern) if name.lower().endswith(AUDIO_EXTENSIONS)]
+
+    selection = {'pending': [], 'skipped': [], 'invalid': []}
+    for name in dict.fromkeys(names):
+        if (os.path.basename(name) != name or name.startswith('.')
+                or not name.lower().endswith(AUDIO_EXTENSIONS)
+                or store.path(name) is None):
+            selection['invalid'].append(name)
+        elif has_transcript(folder, name):
+            selection['skipped'].append(name)
+        else:
+            selection['pending'].append(name)
+    return selection
+
+
+class RateLimiter:
+    """Espacia los inicios de tarea para no superar ``per_minute`` por minuto"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def run_batch(filenames, transcribe_fn, concurrency=4, per_minute=None, on_progress=None):
+    """Transcribir ``filenames`` en paralelo con ``transcribe_fn(filename)``.
+
+    ``transcribe_fn`` devuelve un diccionario con ``success`` (y ``bytes`` o
+    ``error``). Tras cada archivo se llama a ``on_progress(summary)`` con los
+    contadores y el rendimiento acumulado. Devuelve el resumen final con el
+    resultado de cada archivo.
+    """
+    limiter = RateLimiter(per_minute)
+    started = time.monotonic()
+    results = []
+    summary = {
+        'total': len(filenames),
+        'completed': 0,
+        'failed': 0,
+        'bytes': 0
+    }
+
+    def process(filename):
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            result = transcribe_fn(filename)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        return {
+            'filename': filename,
+            'status': 'completed' if result.get('success') else 'failed',
+            'seconds': round(time.monotonic() - start, 3),
+            'bytes': result.get('bytes', 0),
+            'error': result.get('error')
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch') as executor:
+        futures = [executor.submit(process, filename) for filename in filenames]
+        for future in as_completed(futures):
+            item = future.result()
+            results.append(item)
+            summary[item['status']] += 1
+            summary['bytes'] += item['bytes']
+            _add_throughput(summary, time.monotonic() - started)
+            if on_progress:
+                on_progress(dict(summary, recent=results[-RECENT_FILES:]))
+
+    _add_throughput(summary, time.monotonic() - started)
+    summary['files'] = results
+    return summary
+
+
+def _add_throughput(summary, elapsed):
+    done = summary['completed'] + summary['failed']
+    summary['elapsed_seconds'] = round(elapsed, 3)
+    summary['files_per_minute'] = round(done * 60 / elapsed, 2) if elapsed else 0
+    summary['mb_per_second'] = round(summary['bytes'] / (1024 * 1024) / elapsed, 3) if elapsed else 0
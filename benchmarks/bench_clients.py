@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: subida a S3 creando el cliente en cada llamada vs. registro de clientes
+
+Usa moto como sustituto local de S3, por lo que no necesita red ni credenciales
+reales. Con moto no hay handshake TLS, así que la mejora medida corresponde solo
+al coste de construir el cliente (carga de modelos de botocore, resolución de
+credenciales); contra S3 real la diferencia es mayor.
+
+Uso:
+    pip install "moto[s3]"
+    python benchmarks/bench_clients.py --uploads 200 --size-kb 64
+"""
+
+import argparse
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def run(uploads, size_kb, pooled):
+    """Ejecutar ``uploads`` subidas y devolver las latencias en milisegundos"""
+    import app as transcriber
+    from werkzeug.datastructures import FileStorage
+
+    credentials = {
+        'accessKey': 'testing',
+        'secretKey': 'testing',
+        'region': 'us-east-1',
+        'bucket': 'bench-bucket'
+    }
+    payload = os.urandom(size_kb * 1024)
+    latencies = []
+
+    for i in range(uploads):
+        if not pooled:
+            transcriber.clients.clear()
+        file = FileStorage(stream=io.BytesIO(payload), filename='bench.wav', content_type='audio/wav')
+
+        start = time.perf_counter()
+        result = transcriber.upload_to_aws_s3(file, f"bench_{i}.wav", credentials)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        if not result['success']:
+            raise RuntimeError(result['error'])
+
+    return latencies
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{label:<22} media {statistics.mean(latencies):8.2f} ms   "
+          f"p50 {statistics.median(latencies):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--uploads', type=int, default=100)
+    parser.add_argument('--size-kb', type=int, default=64)
+    args = parser.parse_args()
+
+    # La aplicación se importa contra un directorio temporal, nunca el uploads/ real
+    workdir = tempfile.mkdtemp(prefix='bench_clients_')
+    os.environ['UPLOAD_FOLDER'] = workdir
+    os.environ['MAINTENANCE_INTERVAL_MINUTES'] = '0'
+
+    import boto3
+    from moto import mock_aws
+
+    try:
+        with mock_aws():
+            boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='bench-bucket')
+
+            # Calentar imports y modelos de botocore antes de medir
+            run(2, args.size_kb, pooled=False)
+
+            fresh = run(args.uploads, args.size_kb, pooled=False)
+            pooled = run(args.uploads, args.size_kb, pooled=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.uploads} subidas de {args.size_kb} KB a S3 (moto)")
+    report('Cliente por llamada', fresh)
+    report('Registro de clientes', pooled)
+    print(f"Mejora media: {statistics.mean(fresh) / statistics.mean(pooled):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: subida multiparte a S3 con una sola conexión vs. partes en paralelo
+
+Simula un almacenamiento en el que cada conexión está limitada a un ancho de
+banda fijo (como ocurre con una sola conexión TCP en un enlace con latencia)
+y una fracción de las partes falla con un error transitorio. Compara enviar
+las partes de una en una con enviarlas con distintos niveles de paralelismo.
+
+Uso:
+    python benchmarks/bench_cloud_upload.py --size-mb 200 --stream-mbps 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from storage_upload import S3MultipartUpload
+
+
+class SlowDown(Exception):
+    """Error con la forma de ``botocore.exceptions.ClientError`` para un 503"""
+
+    def __init__(self):
+        super().__init__('503 Slow Down')
+        self.response = {'Error': {'Code': 'SlowDown'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}
+
+
+class FakeS3:
+    """Cliente S3 simulado: latencia fija por petición y ancho de banda limitado por conexión"""
+
+    def __init__(self, stream_mbps, rtt, failure_rate):
+        self.bytes_per_second = stream_mbps * 1024 * 1024
+        self.rtt = rtt
+        self.failure_rate = failure_rate
+
+    def create_multipart_upload(self, **kwargs):
+        time.sleep(self.rtt)
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, Body, PartNumber, **kwargs):
+        time.sleep(self.rtt + len(Body) / self.bytes_per_second)
+        if random.random() < self.failure_rate:
+            raise SlowDown()
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        time.sleep(self.rtt)
+        return {'ETag': '"bench"'}
+
+    def put_object(self, Body, **kwargs):
+        time.sleep(self.rtt + len(Body) / self.bytes_per_second)
+        return {'ETag': '"bench"'}
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+
+def run(label, client, payload, part_size, concurrency, read_size=1024 * 1024):
+    upload = S3MultipartUpload(client, 'bench', 'audio/bench.wav', 'audio/wav',
+                               part_size=part_size, concurrency=concurrency)
+    started = time.perf_counter()
+    for offset in range(0, len(payload), read_size):
+        upload.write(payload[offset:offset + read_size])
+    result = upload.finish()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {elapsed:6.2f} s  {len(payload) / 1024 / 1024 / elapsed:7.1f} MB/s  "
+          f"partes {result['parts']:3d}  reintentos {result['retries']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=200)
+    parser.add_argument('--part-mb', type=int, default=8)
+    parser.add_argument('--stream-mbps', type=float, default=8, help='MB/s que alcanza una sola conexión')
+    parser.add_argument('--rtt', type=float, default=0.05, help='Latencia por petición en segundos')
+    parser.add_argument('--failure-rate', type=float, default=0.02)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    client = FakeS3(args.stream_mbps, args.rtt, args.failure_rate)
+    print(f"{args.size_mb} MB en partes de {args.part_mb} MB, {args.stream_mbps} MB/s por conexión, "
+          f"RTT {args.rtt * 1000:.0f} ms, {args.failure_rate:.0%} de partes con error transitorio")
+
+    for concurrency in args.concurrency:
+        label = 'Una conexión' if concurrency == 1 else f"{concurrency} partes en paralelo"
+        run(label, client, payload, args.part_mb * 1024 * 1024, concurrency)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: rendimiento de la normalización de audio (MB/s por núcleo)
+
+Genera WAV sintéticos (voz simulada con silencio al principio y al final) y
+mide ``preprocess_file``: mezcla a mono, remuestreo a 16 kHz y recorte de
+silencios. La etapa es de un solo hilo, así que el resultado es por núcleo.
+
+Uso:
+    python benchmarks/bench_preprocess.py --seconds 60 --rate 44100 --channels 2
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_processing import preprocess_file
+
+
+def synth_wav(path, seconds, rate, channels, silence=2.0):
+    """Escribir un WAV de 16 bits con tonos modulados entre dos silencios"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    signal += 0.02 * rng.standard_normal(len(t))
+    quiet = np.zeros(int(silence * rate))
+    signal = np.concatenate([quiet, signal, quiet])
+
+    pcm = (np.repeat(signal[:, None], channels, axis=1) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(pcm.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--rate', type=int, default=44100)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--format', choices=['wav', 'flac'], default='wav')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = os.path.join(folder, 'source.wav')
+        destination = os.path.join(folder, f"normalized.{args.format}")
+        synth_wav(source, args.seconds, args.rate, args.channels)
+
+        # Calentar NumPy antes de medir
+        preprocess_file(source, destination, audio_format=args.format)
+
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            stats = preprocess_file(source, destination, audio_format=args.format)
+            timings.append(time.perf_counter() - start)
+
+    megabytes = stats['bytes_before'] / (1024 * 1024)
+    best = min(timings)
+    print(f"{args.seconds:.0f} s de audio, {args.rate} Hz, {args.channels} canal(es) "
+          f"-> {stats['sample_rate']} Hz mono ({stats['format']})")
+    print(f"Tamaño: {megabytes:.2f} MB -> {stats['bytes_after'] / (1024 * 1024):.2f} MB "
+          f"({stats['bytes_after'] / stats['bytes_before']:.1%})")
+    print(f"Duración: {stats['duration_before']:.2f} s -> {stats['duration_after']:.2f} s")
+    print(f"Tiempo: media {statistics.mean(timings) * 1000:.1f} ms, mejor {best * 1000:.1f} ms")
+    print(f"Rendimiento: {megabytes / best:.1f} MB/s por núcleo")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: ráfaga de transcripciones con y sin el planificador de llamadas
+
+Simula una API que responde 429 (con ``Retry-After``) al superar su límite
+de peticiones por segundo y que tiene una cola lenta de latencias. Compara
+un único intento por llamada, el planificador con reintentos y el
+planificador con peticiones duplicadas (hedging).
+
+Uso:
+    python benchmarks/bench_scheduler.py --calls 300 --concurrency 32
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scheduler import CallScheduler
+
+
+class RateLimited(Exception):
+    """Error con la forma de ``openai.RateLimitError``"""
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__('429 Too Many Requests')
+        self.response = type('Response', (), {'headers': {'retry-after': str(retry_after)}})()
+
+
+class FakeWhisper:
+    """API simulada con límite de peticiones por segundo y latencia de cola larga"""
+
+    def __init__(self, per_second, latency, slow_fraction, slow_latency):
+        self.per_second = per_second
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self._window = []
+        self._lock = threading.Lock()
+
+    def create(self):
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1]
+            if len(self._window) >= self.per_second:
+                raise RateLimited(retry_after=0.5)
+            self._window.append(now)
+        slow = random.random() < self.slow_fraction
+        time.sleep(self.slow_latency if slow else self.latency)
+        return 'texto'
+
+
+def run(label, api, calls, concurrency, scheduler=None):
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def one():
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            if scheduler:
+                scheduler.call('bench-key', api.create)
+            else:
+                api.create()
+        except Exception:
+            with lock:
+                failures += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(calls):
+            executor.submit(one)
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies) or [0]
+    p50 = ordered[len(ordered) // 2]
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{label:<26} ok {len(latencies):4d}  errores {failures:4d}  "
+          f"p50 {p50 * 1000:7.0f} ms  p99 {p99 * 1000:7.0f} ms  total {elapsed:6.1f} s")
+    if scheduler:
+        stats = scheduler.stats()
+        print(f"{'':<26} reintentos {stats['retries']}  duplicadas {stats['hedges']} "
+              f"(ganadas {stats['hedge_wins']})  espera p99 {stats['queue_wait_seconds']['p99']:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--api-rps', type=int, default=40, help='Peticiones por segundo que admite la API simulada')
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--slow-fraction', type=float, default=0.03)
+    parser.add_argument('--slow-latency', type=float, default=2.0)
+    args = parser.parse_args()
+
+    api = FakeWhisper(args.api_rps, args.latency, args.slow_fraction, args.slow_latency)
+    rate = args.api_rps * 60 * 0.9
+    print(f"{args.calls} llamadas, {args.concurrency} hilos, API limitada a {args.api_rps} peticiones/s")
+
+    run('Un solo intento', api, args.calls, args.concurrency)
+    time.sleep(1)
+    run('Planificador', api, args.calls, args.concurrency,
+        CallScheduler(rate_per_minute=rate, burst=args.api_rps // 2, base_delay=0.2))
+    time.sleep(1)
+    run('Planificador + hedging', api, args.calls, args.concurrency,
+        CallScheduler(rate_per_minute=rate, burst=args.api_rps // 2, base_delay=0.2,
+                      hedge_after=args.latency * 4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: búsqueda en transcripciones con el índice FTS5 vs. recorrer los archivos
+
+Genera transcripciones sintéticas con un vocabulario de palabras frecuentes y
+algunas raras, las indexa con ``TranscriptIndex`` y las escribe también como
+archivos sueltos. Compara la latencia de una consulta paginada en el índice
+con buscar el texto abriendo cada archivo (lo que se hacía antes con grep).
+
+Uso:
+    python benchmarks/bench_search.py --transcripts 20000 --words 800
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from transcript_index import TranscriptIndex
+
+COMMON = ('el la de que y en un una los las por con para del se no es lo al como más pero sus le ya o '
+          'reunión proyecto equipo cliente semana datos informe presupuesto revisión entrega').split()
+RARE = ('hipoteca cronograma auditoría licitación migración facturación contrato prototipo '
+        'inventario logística').split()
+
+
+def make_text(words):
+    return ' '.join(random.choice(RARE) if random.random() < 0.002 else random.choice(COMMON)
+                    for _ in range(words))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--transcripts', type=int, default=20000)
+    parser.add_argument('--words', type=int, default=800, help='Palabras por transcripción')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scan-queries', type=int, default=3, help='Consultas recorriendo los archivos')
+    args = parser.parse_args()
+
+    random.seed(1)
+    folder = tempfile.mkdtemp(prefix='bench_search_')
+    index = TranscriptIndex(os.path.join(folder, 'transcripts.db'))
+
+    started = time.perf_counter()
+    for i in range(args.transcripts):
+        name = f"grabacion_{i:06d}_transcript.txt"
+        text = make_text(args.words)
+        with open(os.path.join(folder, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+        index.add(name, text, recording_filename=f"grabacion_{i:06d}.wav", source='recording')
+    elapsed = time.perf_counter() - started
+    print(f"{args.transcripts} transcripciones de {args.words} palabras indexadas en {elapsed:.1f} s "
+          f"({os.path.getsize(index.db_path) / 1024 / 1024:.1f} MB)")
+
+    queries = [random.choice(RARE) if i % 2 else f"{random.choice(RARE)} {random.choice(COMMON[25:])}"
+               for i in range(args.queries)]
+    latencies, hits = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        results, total = index.search(query, limit=20)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += total
+    print(f"Índice FTS5              p50 {statistics.median(latencies):8.2f} ms  p95 {percentile(latencies, 0.95):8.2f} ms  "
+          f"({hits / len(queries):.0f} coincidencias de media)")
+
+    scans = []
+    for query in queries[:args.scan_queries]:
+        words = query.split()
+        start = time.perf_counter()
+        matches = []
+        for entry in os.scandir(folder):
+            if entry.name.endswith('.txt'):
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                if all(word in text for word in words):
+                    matches.append(entry.name)
+        scans.append((time.perf_counter() - start) * 1000)
+    print(f"Recorrer los archivos    p50 {statistics.median(scans):8.2f} ms  (sin orden por relevancia)")
+
+
+if __name__ == '__main__':
+    main()
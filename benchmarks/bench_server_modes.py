@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga: peticiones en vuelo por worker de gunicorn en modo sync (hilos) y async (gevent)
+
+Arranca un S3 simulado que responde a cada ``PUT`` tras una latencia fija
+(como un proveedor lento o lejano) y, para cada modo, un único worker de
+gunicorn con ``gunicorn.conf.py``. Lanza subidas concurrentes en streaming a
+``/api/upload-to-cloud`` y muestra peticiones por segundo, latencias y el
+máximo de peticiones simultáneas dentro del worker (de ``/metrics``).
+
+Con ``--threads 8`` el modo sync no pasa de 8 subidas en vuelo y el resto
+espera en la cola del socket; en modo async el límite es NETWORK_CONCURRENCY.
+
+Uso:
+    pip install gunicorn gevent
+    python benchmarks/bench_server_modes.py --concurrency 64 --requests 256 --s3-latency 0.5
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CREDENTIALS = {
+    'accessKey': 'testing',
+    'secretKey': 'testing',
+    'region': 'us-east-1',
+    'bucket': 'bench-bucket'
+}
+
+
+class SlowS3Handler(BaseHTTPRequestHandler):
+    """Acepta ``PUT`` de objetos (``put_object``) y responde tras ``latency`` segundos"""
+
+    latency = 0.5
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('ETag', f'"{hashlib.md5(body).hexdigest()}"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_slow_s3(latency):
+    SlowS3Handler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowS3Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(mode, port, s3_url, args):
+    upload_folder = tempfile.mkdtemp(prefix=f"bench_{mode}_")
+    env = {
+        **os.environ,
+        'SERVER_MODE': mode,
+        'BIND': f"127.0.0.1:{port}",
+        'WEB_CONCURRENCY': '1',
+        'WORKER_THREADS': str(args.threads),
+        'UPLOAD_FOLDER': upload_folder,
+        'AWS_ENDPOINT_URL': s3_url,
+        'MAINTENANCE_INTERVAL_MINUTES': '0',
+        'TRACE_LOG_FILE': os.path.join(upload_folder, 'trace.log')
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return process, upload_folder
+
+
+def wait_until_ready(session, base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if session.get(f"{base_url}/metrics", timeout=2).ok:
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"gunicorn no respondió en {base_url}")
+
+
+def in_flight_peak(session, base_url):
+    text = session.get(f"{base_url}/metrics", timeout=30).text
+    match = re.search(r'^grabador_http_requests_in_flight_max (\d+)', text, re.M)
+    return int(match.group(1)) if match else None
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_mode(mode, s3_url, payload, args):
+    import requests
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process, upload_folder = start_gunicorn(mode, port, s3_url, args)
+    session = requests.Session()
+    try:
+        wait_until_ready(session, base_url)
+
+        def upload(i):
+            start = time.perf_counter()
+            response = requests.post(
+                f"{base_url}/api/upload-to-cloud",
+                params={'provider': 'aws-s3', 'filename': f"carga_{i}.wav"},
+                headers={'Content-Type': 'audio/wav', 'X-Cloud-Credentials': json.dumps(CREDENTIALS)},
+                data=payload, timeout=300
+            )
+            return time.perf_counter() - start, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(upload, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [seconds * 1000 for seconds, status in results if status == 200]
+        return {
+            'mode': mode,
+            'requests': args.requests,
+            'errors': sum(1 for _, status in results if status != 200),
+            'requests_per_second': round(args.requests / elapsed, 2),
+            'p50_ms': round(statistics.median(latencies), 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99), 1) if latencies else None,
+            'in_flight_peak': in_flight_peak(session, base_url)
+        }
+    finally:
+        # Parada rápida: con SIGTERM gunicorn esperaría a las conexiones keep-alive
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=30)
+        shutil.rmtree(upload_folder, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--modes', nargs='+', choices=('sync', 'async'), default=['sync', 'async'])
+    parser.add_argument('--concurrency', type=int, default=64, help='Clientes simultáneos')
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--size-kb', type=int, default=256, help='Tamaño de cada audio subido')
+    parser.add_argument('--s3-latency', type=float, default=0.5, help='Segundos que tarda el S3 simulado')
+    parser.add_argument('--threads', type=int, default=8, help='Hilos del worker en modo sync')
+    parser.add_argument('--json', help='Guardar los resultados en este archivo')
+    args = parser.parse_args()
+
+    s3 = start_slow_s3(args.s3_latency)
+    s3_url = f"http://127.0.0.1:{s3.server_address[1]}"
+    payload = os.urandom(args.size_kb * 1024)
+
+    results = []
+    print(f"{'modo':<6} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'en vuelo':>9} {'errores':>8}")
+    for mode in args.modes:
+        result = run_mode(mode, s3_url, payload, args)
+        results.append(result)
+        print(f"{mode:<6} {result['requests_per_second']:>8} {result['p50_ms']:>9} {result['p99_ms']:>9} "
+              f"{result['in_flight_peak']:>9} {result['errors']:>8}")
+    s3.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: texto en el instante T y frase P con el sidecar de marcas de tiempo vs. recorrer la transcripción
+
+Genera la salida ``verbose_json`` sintética de una grabación larga (un
+segmento cada pocos segundos y marcas por palabra), la guarda con
+``TimingStore`` y compara la latencia de las dos consultas del reproductor
+con recorrer la lista de segmentos del JSON completo, que es lo que haría
+el cliente si descargara toda la transcripción.
+
+Uso:
+    python benchmarks/bench_timing.py --hours 1 --queries 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from transcript_timing import TimingStore, normalize_token
+
+VOCABULARY = ('el la de que y en un una los las por con para del se no es lo al como más pero '
+              'reunión proyecto equipo cliente semana datos informe presupuesto revisión entrega '
+              'hipoteca cronograma auditoría licitación migración facturación contrato').split()
+
+
+def make_timing(seconds):
+    segments, words, clock = [], [], 0.0
+    while clock < seconds:
+        segment_words = []
+        for _ in range(random.randint(6, 18)):
+            segment_words.append({'start': round(clock, 3), 'end': round(clock + 0.3, 3),
+                                  'word': random.choice(VOCABULARY)})
+            clock += 0.35
+        segments.append({'start': segment_words[0]['start'], 'end': segment_words[-1]['end'],
+                         'text': ' '.join(word['word'] for word in segment_words)})
+        words.extend(segment_words)
+        clock += random.uniform(0.2, 1.5)
+    return {'text': ' '.join(segment['text'] for segment in segments), 'duration': clock,
+            'segments': segments, 'words': words}
+
+
+def scan_around(segments, time_point, before, after):
+    return [segment for segment in segments
+            if segment['end'] >= time_point - before and segment['start'] <= time_point + after]
+
+
+def scan_find(words, phrase):
+    tokens = [normalize_token(word) for word in phrase.split()]
+    normalized = [normalize_token(word['word']) for word in words]
+    return [words[i]['start'] for i in range(len(words) - len(tokens) + 1)
+            if normalized[i:i + len(tokens)] == tokens]
+
+
+def measure(fn, items):
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hours', type=float, default=1)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--scan-queries', type=int, default=50, help='Consultas recorriendo el JSON')
+    args = parser.parse_args()
+
+    random.seed(1)
+    folder = tempfile.mkdtemp(prefix='bench_timing_')
+    timing = make_timing(args.hours * 3600)
+    json_path = os.path.join(folder, 'transcript.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(timing, f, ensure_ascii=False)
+
+    store = TimingStore(folder)
+    started = time.perf_counter()
+    counts = store.save('grabacion_transcript.txt', timing)
+    print(f"{counts['segments']} segmentos y {counts['words']} palabras guardados en "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms: sidecar de "
+          f"{os.path.getsize(store.path('grabacion_transcript.txt')) / 1024:.0f} KB, "
+          f"JSON de {os.path.getsize(json_path) / 1024:.0f} KB")
+
+    def open_json(_):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    cold = measure(lambda _: TimingStore(folder).load('grabacion_transcript.txt'), range(20))
+    print(f"Abrir        sidecar p50 {cold:8.3f} ms  JSON p50     {measure(open_json, range(20)):8.3f} ms")
+
+    sidecar = store.load('grabacion_transcript.txt')
+    times = [random.uniform(0, timing['duration']) for _ in range(args.queries)]
+    phrases = [' '.join(random.sample(VOCABULARY[-12:], 2)) for _ in range(args.queries)]
+
+    print(f"Texto en T   sidecar p50 {measure(lambda t: sidecar.around(t, 30, 60), times):8.3f} ms", end='  ')
+    loaded = open_json(None)
+    print(f"recorrer p50 {measure(lambda t: scan_around(loaded['segments'], t, 30, 60), times[:args.scan_queries]):8.3f} ms")
+
+    print(f"Frase P      sidecar p50 {measure(lambda p: sidecar.find(p, 20), phrases):8.3f} ms", end='  ')
+    print(f"recorrer p50 {measure(lambda p: scan_find(loaded['words'], p), phrases[:args.scan_queries]):8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
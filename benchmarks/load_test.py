@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de los endpoints de Flask con sustitutos locales de S3, GCS y OpenAI
+
+Arranca la aplicación en un servidor HTTP local con un directorio de uploads
+temporal, S3 simulado con moto (en proceso), un cliente de Google Cloud
+Storage falso en memoria y un servidor HTTP que imita la API de
+transcripción de OpenAI con latencia configurable. Después lanza peticiones
+concurrentes contra cada escenario y muestra peticiones por segundo,
+percentiles de latencia y el pico de memoria residente (RSS) del proceso.
+
+No necesita red ni credenciales reales.
+
+Uso:
+    pip install "moto[s3]"
+    python benchmarks/load_test.py --concurrency 8 --requests 64 --size-mb 2
+    python benchmarks/load_test.py --scenarios transcribe-direct --whisper-latency 0.5 --json resultados.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+SCENARIOS = ('save-audio', 'upload-to-cloud', 'transcribe', 'transcribe-direct')
+
+AWS_CREDENTIALS = {
+    'accessKey': 'testing',
+    'secretKey': 'testing',
+    'region': 'us-east-1',
+    'bucket': 'load-test-bucket'
+}
+
+GCS_CREDENTIALS = {
+    'bucket': 'load-test-bucket',
+    'credentials': '{"project_id": "load-test"}'
+}
+
+
+class StubWhisperHandler(BaseHTTPRequestHandler):
+    """Imita ``POST /v1/audio/transcriptions`` leyendo el audio y esperando ``latency`` segundos"""
+
+    latency = 0.2
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        remaining = int(self.headers.get('Content-Length', 0))
+        verbose = False
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            verbose = verbose or b'verbose_json' in chunk
+            remaining -= len(chunk)
+        time.sleep(self.latency)
+
+        text = 'transcripción simulada'
+        if verbose:
+            # ``response_format=verbose_json``: un segmento y una marca por palabra
+            words = [{'word': word, 'start': index * 0.5, 'end': index * 0.5 + 0.4}
+                     for index, word in enumerate(text.split())]
+            body = json.dumps({'text': text, 'duration': 1.0, 'words': words,
+                               'segments': [{'id': 0, 'start': 0.0, 'end': 0.9, 'text': text}]}).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            body = text.encode('utf-8')
+            content_type = 'text/plain; charset=utf-8'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBlob:
+    """Blob de Google Cloud Storage que solo guarda el tamaño de lo recibido"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.content_type = None
+
+    def upload_from_string(self, data, content_type=None, checksum=None):
+        self.store[self.name] = len(data)
+
+    def compose(self, sources):
+        self.store[self.name] = sum(self.store[source.name] for source in sources)
+
+    def delete(self):
+        del self.store[self.name]
+
+
+class FakeGCSClient:
+    def __init__(self):
+        self.store = {}
+
+    def bucket(self, name):
+        return self
+
+    def blob(self, name):
+        return FakeBlob(self.store, name)
+
+
+class RSSSampler:
+    """Muestrea la memoria residente del proceso para obtener su pico en un intervalo"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+def current_rss():
+    """RSS actual en bytes (o el máximo histórico si no hay /proc)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def make_wav(path, size_bytes, rate=44100, channels=2):
+    """WAV de 16 bits con ruido aleatorio (distinto en cada archivo para no acertar en la caché)"""
+    frames = max(1, size_bytes // (2 * channels))
+    with wave.open(path, 'wb') as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(os.urandom(frames * 2 * channels))
+
+
+def start_stub_whisper(latency):
+    StubWhisperHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWhisperHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_app(transcriber):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, transcriber.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_for_job(session, base_url, job_id, timeout=300):
+    """Esperar con long-poll a que termine un trabajo; devuelve su estado final"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = session.get(f"{base_url}/api/jobs/{job_id}", params={'wait': 25}).json()['job']
+        if job['status'] in ('completed', 'failed'):
+            return job['status']
+    return 'timeout'
+
+
+class Scenario:
+    """Un escenario de carga: ``prepare(i)`` fuera del cronómetro y ``run(session, i)`` medido"""
+
+    def __init__(self, name, base_url, audio_files, args):
+        self.name = name
+        self.base_url = base_url
+        self.audio_files = audio_files
+        self.args = args
+
+    def payload(self, i):
+        """Audio de la petición ``i``; los últimos bytes cambian para que no acierte en la caché"""
+        with open(self.audio_files[i % len(self.audio_files)], 'rb') as f:
+            data = bytearray(f.read())
+        data[-8:] = (SCENARIOS.index(self.name) << 32 | i).to_bytes(8, 'little')
+        return bytes(data)
+
+    def prepare(self, session, i):
+        if self.name == 'save-audio':
+            session.post(f"{self.base_url}/api/start-recording",
+                         json={'project_name': f"carga_{i}", 'duration': 60})
+        elif self.name == 'transcribe':
+            import app as transcriber
+
+            path = self.transcribe_path(i)
+            with open(path, 'wb') as f:
+                f.write(self.payload(i))
+            transcriber.blob_store.add_file(path, os.path.basename(path))
+
+    def transcribe_path(self, i):
+        return os.path.join(os.path.dirname(self.audio_files[0]), f"transcribir_{i:05d}.wav")
+
+    def run(self, session, i):
+        """Ejecutar una petición; devuelve ``None`` si fue bien o una descripción del error"""
+        url = self.base_url
+        data = self.payload(i)
+
+        if self.name == 'save-audio':
+            if self.args.raw:
+                response = session.post(f"{url}/api/save-audio", data=data,
+                                        headers={'Content-Type': 'audio/wav'})
+            else:
+                response = session.post(f"{url}/api/save-audio",
+                                        files={'audio': ('audio.wav', data, 'audio/wav')})
+            return None if response.ok else f"HTTP {response.status_code}"
+
+        if self.name == 'upload-to-cloud':
+            provider = 'aws-s3' if i % 2 == 0 else 'google-cloud'
+            credentials = AWS_CREDENTIALS if provider == 'aws-s3' else GCS_CREDENTIALS
+            if self.args.raw:
+                response = session.post(
+                    f"{url}/api/upload-to-cloud",
+                    params={'provider': provider, 'filename': f"carga_{i}.wav"},
+                    data=data,
+                    headers={'Content-Type': 'audio/wav', 'X-Cloud-Credentials': json.dumps(credentials)}
+                )
+            else:
+                response = session.post(
+                    f"{url}/api/upload-to-cloud",
+                    files={'file': (f"carga_{i}.wav", data, 'audio/wav')},
+                    data={'provider': provider, 'credentials': json.dumps(credentials)}
+                )
+            return None if response.ok else f"HTTP {response.status_code}"
+
+        if self.name == 'transcribe':
+            filename = os.path.basename(self.transcribe_path(i))
+            response = session.post(f"{url}/api/transcribe", json={
+                'filename': filename,
+                'aws_credentials': AWS_CREDENTIALS,
+                'openai_api_key': 'sk-load-test'
+            })
+        else:
+            response = session.post(f"{url}/api/transcribe-direct",
+                                    files={'audio': (f"carga_{i}.wav", data, 'audio/wav')})
+
+        if response.status_code != 202:
+            return f"HTTP {response.status_code}"
+        status = wait_for_job(session, url, response.json()['job_id'])
+        return None if status == 'completed' else f"trabajo {status}"
+
+
+def run_scenario(scenario, requests_count, concurrency):
+    import requests
+
+    local = threading.local()
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+
+    def one(i):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        scenario.prepare(local.session, i)
+        start = time.perf_counter()
+        try:
+            error = scenario.run(local.session, i)
+        except Exception as e:
+            error = type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+            else:
+                latencies.append(elapsed)
+
+    with RSSSampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, range(requests_count)))
+        wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        'scenario': scenario.name,
+        'requests': requests_count,
+        'concurrency': concurrency,
+        'ok': len(latencies),
+        'errors': errors,
+        'seconds': round(wall, 3),
+        'rps': round(len(latencies) / wall, 2) if wall else 0,
+        'latency_ms': {
+            'mean': round(statistics.mean(ordered) * 1000, 1) if ordered else 0,
+            'p50': percentile_ms(ordered, 0.50),
+            'p90': percentile_ms(ordered, 0.90),
+            'p99': percentile_ms(ordered, 0.99),
+            'max': round(ordered[-1] * 1000, 1) if ordered else 0
+        },
+        'peak_rss_mb': round(sampler.peak / (1024 * 1024), 1)
+    }
+
+
+def percentile_ms(ordered, fraction):
+    if not ordered:
+        return 0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+def report(result):
+    latency = result['latency_ms']
+    errors = sum(result['errors'].values())
+    print(f"{result['scenario']:<18} {result['rps']:8.2f} req/s  ok {result['ok']:4d}  errores {errors:3d}  "
+          f"p50 {latency['p50']:8.1f}  p90 {latency['p90']:8.1f}  p99 {latency['p99']:8.1f}  "
+          f"max {latency['max']:8.1f} ms  RSS pico {result['peak_rss_mb']:7.1f} MB")
+    for cause, count in result['errors'].items():
+        print(f"{'':<18} {count} x {cause}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=32, help='Peticiones por escenario')
+    parser.add_argument('--size-mb', type=float, default=1.0, help='Tamaño de cada archivo de audio')
+    parser.add_argument('--files', type=int, default=8, help='Archivos distintos generados')
+    parser.add_argument('--whisper-latency', type=float, default=0.2, help='Latencia del servidor de transcripción simulado')
+    parser.add_argument('--raw', action='store_true', help='Enviar el audio como cuerpo crudo en lugar de multipart')
+    parser.add_argument('--json', help='Guardar los resultados en este archivo JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='grabador_carga_')
+    whisper = start_stub_whisper(args.whisper_latency)
+
+    # Configurar la aplicación antes de importarla
+    os.environ['UPLOAD_FOLDER'] = workdir
+    os.environ['OPENAI_API_KEY'] = 'sk-load-test'
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{whisper.server_port}/v1"
+    os.environ.setdefault('WHISPER_RATE_LIMIT', '0')
+    os.environ.setdefault('TRACE_LOG_MIN_MS', '1e12')
+    os.environ.setdefault('JOB_QUEUE_SIZE', str(max(20, args.requests)))
+
+    import boto3
+    from moto import mock_aws
+
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=AWS_CREDENTIALS['bucket'])
+
+        import logging
+        import app as transcriber
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        transcriber.app.config['WTF_CSRF_ENABLED'] = False
+        fake_gcs = FakeGCSClient()
+        transcriber.get_gcs_client = lambda credentials: fake_gcs
+
+        audio_files = []
+        for i in range(args.files):
+            path = os.path.join(workdir, f"carga_{i:03d}.wav")
+            make_wav(path, int(args.size_mb * 1024 * 1024))
+            audio_files.append(path)
+
+        server = start_app(transcriber)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        print(f"{args.requests} peticiones por escenario, concurrencia {args.concurrency}, "
+              f"archivos de {args.size_mb} MB, Whisper simulado con {args.whisper_latency * 1000:.0f} ms "
+              f"({'cuerpo crudo' if args.raw else 'multipart'})")
+        print(f"Uploads temporales en {workdir}\n")
+
+        results = []
+        for name in args.scenarios:
+            scenario = Scenario(name, base_url, audio_files, args)
+            result = run_scenario(scenario, args.requests, args.concurrency)
+            report(result)
+            results.append(result)
+
+        server.shutdown()
+    whisper.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""
+Almacén de audio direccionado por contenido con nombres encima
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import fnmatch
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from transcript_cache import hash_file
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS names (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    expired_at TEXT,
+    remote_url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_names_sha256 ON names (sha256);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+class BlobStore:
+    """Archivos guardados por su SHA-256 en ``ab/cd/<hash>.<ext>`` y un índice nombre → hash.
+
+    Un mismo audio guardado con varios nombres ocupa disco una sola vez, y
+    los directorios por prefijo del hash mantienen rápidos los listados con
+    cientos de miles de archivos. La extensión del nombre se conserva en el
+    blob porque algunos consumidores (como la API de Whisper) detectan el
+    formato por ella. Los nombres son únicos: si uno ya está ocupado por
+    otro contenido se le añade un sufijo (``_2``, ``_3``...).
+
+    Un nombre caducado (borrado o archivado en la nube por la política de
+    retención) conserva su fila con ``expired_at`` y, si se archivó,
+    ``remote_url``, pero deja de tener contenido local.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.temp_folder = os.path.join(folder, 'tmp')
+        self.db_path = os.path.join(folder, 'index.db')
+        self._local = threading.local()
+        os.makedirs(self.temp_folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self):
+        # Índices creados antes de la retención: añadir las columnas de caducidad
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM migrations WHERE name = 'expiry_columns'").fetchone():
+            return
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(names)')}
+        with conn:
+            for column in ('expired_at', 'remote_url'):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE names ADD COLUMN {column} TEXT')
+            conn.execute("INSERT INTO migrations (name) VALUES ('expiry_columns')")
+
+    def temp_path(self, suffix=''):
+        """Ruta temporal en el mismo disco que los blobs, para moverla sin copiar"""
+        return os.path.join(self.temp_folder, f"{uuid.uuid4().hex}{suffix}")
+
+    def blob_path(self, sha256, name=''):
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(self.folder, sha256[:2], sha256[2:4], f"{sha256}{extension}")
+
+    def add_file(self, path, name, sha256=None):
+        """Mover ``path`` al almacén y registrarlo como ``name``.
+
+        Si el contenido ya estaba guardado, ``path`` se borra en lugar de
+        duplicarlo. Devuelve el nombre asignado (puede llevar sufijo), el
+        hash, el tamaño y si el contenido estaba ya en el almacén.
+        """
+        sha256 = sha256 or hash_file(path)
+        size = os.path.getsize(path)
+        blob_path = self.blob_path(sha256, name)
+
+        deduplicated = os.path.exists(blob_path)
+        if deduplicated:
+            os.unlink(path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(path, blob_path)
+
+        return {
+            'name': self._claim(name, sha256, size),
+            'sha256': sha256,
+            'size': size,
+            'deduplicated': deduplicated
+        }
+
+    def replace(self, name, path, sha256=None):
+        """Sustituir el contenido de ``name`` por ``path`` (por ejemplo, el audio ya normalizado).
+
+        Los demás nombres que compartían el blob anterior lo conservan; si
+        ninguno lo comparte, se borra. Devuelve el nuevo hash y tamaño.
+        """
+        entry = self.get(name)
+        if entry is None or entry['expired_at']:
+            raise KeyError(name)
+
+        shared = self.references(name)
+        sha256 = sha256 or hash_file(path)
+        size = os.path.getsize(path)
+        blob_path = self.blob_path(sha256, name)
+        if os.path.exists(blob_path):
+            os.unlink(path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(path, blob_path)
+
+        with self._connect() as conn:
+            conn.execute('UPDATE names SET sha256 = ?, size = ? WHERE name = ?', (sha256, size, name))
+
+        previous = self.blob_path(entry['sha256'], name)
+        if not shared and previous != blob_path:
+            try:
+                os.unlink(previous)
+            except FileNotFoundError:
+                pass
+        return {'name': name, 'sha256': sha256, 'size': size}
+
+    def get(self, name):
+        """Entrada del índice para ``name`` (hash, tamaño, fecha) o ``None``"""
+        row = self._connect().execute('SELECT * FROM names WHERE name = ?', (name,)).fetchone()
+        return dict(row) if row else None
+
+    def path(self, name):
+        """Ruta del contenido de ``name`` o ``None`` si no está en el almacén"""
+        entry = self.get(name)
+        if entry is None or entry['expired_at']:
+            return None
+        path = self.blob_path(entry['sha256'], name)
+        return path if os.path.exists(path) else None
+
+    def names(self, pattern=None):
+        """Nombres registrados, ordenados, opcionalmente filtrados por un patrón glob"""
+        rows = self._connect().execute('SELECT name FROM names WHERE expired_at IS NULL ORDER BY name').fetchall()
+        names = [row['name'] for row in rows]
+        return fnmatch.filter(names, pattern) if pattern else names
+
+    def entries(self, created_before=None):
+        """Entradas con contenido local, opcionalmente solo las creadas antes de una fecha ISO"""
+        query = 'SELECT * FROM names WHERE expired_at IS NULL'
+        params = ()
+        if created_before:
+            query += ' AND created_at < ?'
+            params = (created_before,)
+        rows = self._connect().execute(f'{query} ORDER BY created_at', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def references(self, name):
+        """Otros nombres con contenido local que comparten el blob de ``name``"""
+        entry = self.get(name)
+        if entry is None:
+            return []
+        blob_path = self.blob_path(entry['sha256'], name)
+        rows = self._connect().execute(
+            'SELECT name FROM names WHERE sha256 = ? AND name != ? AND expired_at IS NULL',
+            (entry['sha256'], name)
+        ).fetchall()
+        return [row['name'] for row in rows if self.blob_path(entry['sha256'], row['name']) == blob_path]
+
+    def expire(self, name, remote_url=None):
+        """Quitar el contenido local de ``name`` conservando su entrada en el índice.
+
+        El blob se borra solo si ningún otro nombre local lo comparte.
+        Devuelve los bytes liberados en disco.
+        """
+        entry = self.get(name)
+        if entry is None or entry['expired_at']:
+            return 0
+        shared = self.references(name)
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE names SET expired_at = ?, remote_url = ? WHERE name = ?',
+                (datetime.now().isoformat(), remote_url, name)
+            )
+        if shared:
+            return 0
+
+        try:
+            os.unlink(self.blob_path(entry['sha256'], name))
+        except FileNotFoundError:
+            return 0
+        return entry['size']
+
+    def import_folder(self, folder, extensions):
+        """Mover al almacén, una sola vez, los audios sueltos de ``folder`` (formato anterior)"""
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM migrations WHERE name = 'flat_uploads'").fetchone():
+            return 0
+
+        imported = 0
+        for entry in os.scandir(folder):
+            if entry.is_file() and entry.name.lower().endswith(extensions):
+                try:
+                    self.add_file(entry.path, entry.name)
+                    imported += 1
+                except OSError as e:
+                    print(f"Error al importar {entry.name} al almacén: {e}")
+
+        with conn:
+            conn.execute("INSERT INTO migrations (name) VALUES ('flat_uploads')")
+        return imported
+
+    def stats(self):
+        row = self._connect().execute(
+            'SELECT COUNT(*) AS names, COUNT(DISTINCT sha256) AS blobs, COALESCE(SUM(size), 0) AS logical_bytes '
+            'FROM names WHERE expired_at IS NULL'
+        ).fetchone()
+        stored = self._connect().execute(
+            'SELECT COALESCE(SUM(size), 0) FROM (SELECT size FROM names WHERE expired_at IS NULL GROUP BY sha256)'
+        ).fetchone()[0]
+        expired = self._connect().execute(
+            'SELECT COUNT(*) AS names, COUNT(remote_url) AS offloaded FROM names WHERE expired_at IS NOT NULL'
+        ).fetchone()
+        return {
+            'names': row['names'],
+            'blobs': row['blobs'],
+            'logical_bytes': row['logical_bytes'],
+            'stored_bytes': stored,
+            'saved_bytes': row['logical_bytes'] - stored,
+            'expired_names': expired['names'],
+            'offloaded_names': expired['offloaded']
+        }
+
+    def _claim(self, name, sha256, size):
+        # Reservar el nombre (o el primer sufijo libre); el mismo contenido con el mismo nombre no se duplica
+        stem, ext = os.path.splitext(name)
+        conn = self._connect()
+        attempt = 1
+        while True:
+            candidate = name if attempt == 1 else f"{stem}_{attempt}{ext}"
+            try:
+                with conn:
+                    conn.execute(
+                        'INSERT INTO names (name, sha256, size, created_at) VALUES (?, ?, ?, ?)',
+                        (candidate, sha256, size, datetime.now().isoformat())
+                    )
+                return candidate
+            except sqlite3.IntegrityError:
+                existing = self.get(candidate)
+                if existing and existing['sha256'] == sha256:
+                    if existing['expired_at']:
+                        # El mismo audio vuelve a guardarse: recupera su contenido local
+                        with conn:
+                            conn.execute(
+                                'UPDATE names SET expired_at = NULL, remote_url = NULL WHERE name = ?',
+                                (candidate,)
+                            )
+                    return candidate
+            attempt += 1
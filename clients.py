@@ -0,0 +1,93 @@
+"""
+Registro de clientes reutilizables para AWS S3, Google Cloud y OpenAI
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+
+def credential_fingerprint(credentials):
+    """Huella SHA-256 de unas credenciales, sin guardar los secretos en claro"""
+    data = json.dumps(credentials, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ClientRegistry:
+    """Caché de clientes por tipo y huella de credenciales.
+
+    Los clientes se reutilizan entre peticiones (y por tanto sus conexiones
+    HTTP abiertas) hasta que caduca su ``ttl``. La construcción se hace con
+    un lock por clave para que peticiones simultáneas no creen duplicados.
+    """
+
+    def __init__(self, ttl_seconds=900, max_clients=64):
+        self.ttl_seconds = ttl_seconds
+        self.max_clients = max_clients
+        self._clients = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def get(self, kind, credentials, factory):
+        """Devolver un cliente en caché o crearlo con ``factory(credentials)``"""
+        key = (kind, credential_fingerprint(credentials))
+
+        with self._lock:
+            client = self._fresh(key)
+            if client is not None:
+                self._counters['hits'] += 1
+                return client
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                client = self._fresh(key)
+                if client is not None:
+                    self._counters['hits'] += 1
+                    return client
+
+            client = factory(credentials)
+
+            with self._lock:
+                self._counters['misses'] += 1
+                self._clients[key] = (client, time.monotonic())
+                self._trim()
+            return client
+
+    def invalidate(self, kind, credentials):
+        """Descartar el cliente de unas credenciales (por ejemplo tras un error de autenticación)"""
+        with self._lock:
+            self._clients.pop((kind, credential_fingerprint(credentials)), None)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._key_locks.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, 'clients': len(self._clients)}
+
+    def _fresh(self, key):
+        # Debe llamarse con el lock adquirido
+        entry = self._clients.get(key)
+        if entry is None:
+            return None
+        client, created_at = entry
+        if time.monotonic() - created_at > self.ttl_seconds:
+            del self._clients[key]
+            return None
+        return client
+
+    def _trim(self):
+        # Debe llamarse con el lock adquirido: descarta los clientes más antiguos
+        while len(self._clients) > self.max_clients:
+            oldest = min(self._clients, key=lambda key: self._clients[key][1])
+            del self._clients[oldest]
+            self._key_locks.pop(oldest, None)
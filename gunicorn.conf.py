@@ -0,0 +1,61 @@
+"""
+Configuración de gunicorn para producción
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+
+Uso:
+    gunicorn -c gunicorn.conf.py
+    SERVER_MODE=async gunicorn -c gunicorn.conf.py
+
+SERVER_MODE=sync atiende cada petición en un hilo (worker ``gthread``);
+SERVER_MODE=async usa greenlets de gevent: boto3, requests y el cliente
+de OpenAI pasan a hacer E/S de red cooperativa, y una petición esperando
+a S3 o a la subida del navegador no ocupa un hilo. El trabajo de CPU
+(preprocesado de audio, faster-whisper local) sigue bloqueando el proceso,
+así que con el backend local conviene el modo sync.
+"""
+
+import os
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Por defecto un solo worker con hilos (o greenlets en modo async). Con
+# WEB_CONCURRENCY > 1 los workers comparten uploads/ y cada estado se
+# reparte así:
+#   - Cola de trabajos: el estado de cada trabajo se guarda en JOBS_FOLDER,
+#     así que cualquier worker puede consultarlo. Lo ejecuta el proceso que
+#     lo recibió; al reanudar tras un reinicio, un bloqueo de archivo y el
+#     latido del dueño evitan que otro worker repita uno que sigue en curso.
+#   - Subidas reanudables: el estado y los datos están en RESUMABLE_FOLDER,
+#     pero las partes de una misma subida se serializan con un bloqueo en
+#     memoria; el proxy debe enviar todas las partes al mismo proceso.
+#   - Sesiones en vivo y progreso de las subidas a la nube: solo en memoria
+#     del proceso; también necesitan afinidad de sesión en el proxy.
+#   - Mantenimiento: solo lo arranca el worker que obtiene
+#     uploads/.maintenance.lock (create_app()).
+#   - Migraciones del formato anterior: create_app() las ejecuta bajo
+#     uploads/.migrations.lock; el primer worker importa y los demás esperan.
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+server_mode = os.environ.get('SERVER_MODE', 'sync')
+if server_mode == 'async':
+    worker_class = 'gevent'
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+else:
+    worker_class = 'gthread'
+    threads = int(os.environ.get('WORKER_THREADS', 8))
+
+# Sin preload: los hilos de fondo (cola de trabajos, mantenimiento) deben
+# arrancar dentro de cada worker y no en el proceso maestro
+preload_app = False
+reload = False
+
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('WORKER_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+accesslog = os.environ.get('ACCESS_LOG')  # las trazas por petición ya van a TRACE_LOG_FILE
+errorlog = '-'
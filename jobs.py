@@ -0,0 +1,291 @@
+"""
+Cola de trabajos en segundo plano para las transcripciones
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from locks import FileLock
+
+# Estados finales de un trabajo
+FINISHED_STATES = ('completed', 'failed')
+
+# Segundos sin latido tras los que un trabajo se da por abandonado
+JOB_LEASE_SECONDS = 60
+
+# Intervalo con el que se relee del disco un trabajo que ejecuta otro proceso
+JOB_POLL_SECONDS = 0.5
+
+
+class QueueFullError(Exception):
+    """La cola alcanzó su límite de trabajos pendientes"""
+
+
+class JobQueue:
+    """Cola de trabajos con concurrencia limitada y estado persistido en disco.
+
+    Cada trabajo se guarda como ``<id>.json`` en ``state_dir`` en cada cambio
+    de estado. Los datos sensibles (``secrets``) solo se mantienen en memoria,
+    por lo que tras un reinicio únicamente se reanudan los trabajos cuyo
+    manejador no los necesita.
+
+    Varios procesos pueden compartir ``state_dir``: cada trabajo guarda su
+    dueño (host y pid) y un latido que se renueva cada tercio de
+    ``lease_seconds`` mientras está activo. Solo se recuperan los trabajos
+    cuyo dueño ha muerto o cuyo latido ha caducado, y se vuelven a buscar
+    con cada latido, así que los de un proceso que muere después también
+    se reanudan.
+    """
+
+    def __init__(self, state_dir, max_workers=2, max_pending=20, lease_seconds=JOB_LEASE_SECONDS,
+                 poll_seconds=JOB_POLL_SECONDS):
+        self.state_dir = state_dir
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.owner = {'host': socket.gethostname(), 'pid': os.getpid()}
+        self._handlers = {}
+        self._jobs = {}
+        self._secrets = {}
+        self._active = 0
+        self._started = False
+        self._heartbeat = None
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        os.makedirs(state_dir, exist_ok=True)
+
+    def register(self, kind, handler, resumable=False):
+        """Registrar el manejador ``handler(job_id, payload, secrets)`` de un tipo de trabajo"""
+        self._handlers[kind] = (handler, resumable)
+
+    def new_id(self):
+        return uuid.uuid4().hex
+
+    def is_full(self):
+        with self._cond:
+            return self._active >= self.max_workers + self.max_pending
+
+    def active_count(self):
+        """Trabajos en ejecución o esperando turno"""
+        with self._cond:
+            return self._active
+
+    def submit(self, kind, payload, secrets=None, job_id=None):
+        """Encolar un trabajo y devolver su estado inicial"""
+        if kind not in self._handlers:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+
+        job_id = job_id or self.new_id()
+        now = datetime.now().isoformat()
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'status': 'queued',
+            'payload': payload,
+            'progress': None,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            'version': 0,
+            'owner': self.owner,
+            'heartbeat': time.time()
+        }
+
+        with self._cond:
+            if self._active >= self.max_workers + self.max_pending:
+                raise QueueFullError('La cola de trabajos está llena')
+            self._start_heartbeat()
+            self._active += 1
+            self._jobs[job_id] = job
+            if secrets:
+                self._secrets[job_id] = secrets
+            self._persist(job)
+            snapshot = dict(job)
+
+        self._executor.submit(self._run, job_id)
+        return snapshot
+
+    def get(self, job_id):
+        """Obtener una copia del estado de un trabajo (de memoria o de disco)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self._load(job_id)
+
+    def update(self, job_id, **fields):
+        """Actualizar campos de un trabajo en curso (por ejemplo el progreso)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job['updated_at'] = datetime.now().isoformat()
+            job['version'] += 1
+            self._persist(job)
+            self._cond.notify_all()
+
+    def wait(self, job_id, timeout, since_version=None):
+        """Esperar hasta que el trabajo termine o cambie respecto a ``since_version``.
+
+        Los trabajos de este proceso se esperan con la condición; los que
+        ejecuta otro proceso que comparte ``state_dir`` se releen del disco
+        cada ``poll_seconds``.
+        """
+        def changed(job):
+            if job is None or job['status'] in FINISHED_STATES:
+                return True
+            return since_version is not None and job['version'] != since_version
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    if changed(job) or remaining <= 0:
+                        return dict(job)
+                    self._cond.wait(remaining)
+                    continue
+
+            job = self._load(job_id)
+            if changed(job) or remaining <= 0:
+                return job
+            time.sleep(min(remaining, self.poll_seconds))
+
+    def recover(self):
+        """Reanudar los trabajos que quedaron pendientes tras un reinicio.
+
+        La primera llamada de cada proceso arranca el latido, que después
+        repite la búsqueda periódicamente.
+        """
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            self._start_heartbeat()
+        self._reclaim()
+
+    def _reclaim(self):
+        """Reclamar los trabajos sin dueño vivo.
+
+        El bloqueo sobre el directorio evita que dos procesos reclamen a la
+        vez el mismo trabajo.
+        """
+        with FileLock(os.path.join(self.state_dir, '.recover.lock')):
+            for name in sorted(os.listdir(self.state_dir)):
+                if not name.endswith('.json'):
+                    continue
+                job = self._load(name[:-5])
+                if not job or job['status'] in FINISHED_STATES or job['id'] in self._jobs:
+                    continue
+                if self._owner_alive(job):
+                    continue
+
+                handler = self._handlers.get(job['kind'])
+                if handler and handler[1]:
+                    with self._cond:
+                        self._start_heartbeat()
+                        job.update(status='queued', owner=self.owner, heartbeat=time.time())
+                        self._active += 1
+                        self._jobs[job['id']] = job
+                        self._persist(job)
+                    self._executor.submit(self._run, job['id'])
+                else:
+                    job['status'] = 'failed'
+                    job['error'] = 'Trabajo interrumpido por un reinicio del servidor'
+                    job['updated_at'] = datetime.now().isoformat()
+                    self._persist(job)
+
+    def _owner_alive(self, job):
+        """Si otro proceso sigue ejecutando el trabajo (dueño vivo y latido reciente)"""
+        owner = job.get('owner')
+        if not owner or time.time() - job.get('heartbeat', 0) > self.lease_seconds:
+            return False
+        if owner.get('host') != self.owner['host'] or os.name != 'posix':
+            return True
+        try:
+            os.kill(owner['pid'], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _start_heartbeat(self):
+        # Llamado con self._cond retenido
+        if self._heartbeat is None:
+            self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        """Renovar el latido de los trabajos activos de este proceso y reclamar los abandonados"""
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            with self._cond:
+                for job in self._jobs.values():
+                    job['heartbeat'] = time.time()
+                    self._persist(job)
+                reclaim = self._started
+            if reclaim:
+                try:
+                    self._reclaim()
+                except OSError as e:
+                    print(f"Error al reclamar trabajos abandonados: {e}")
+
+    def _run(self, job_id):
+        with self._cond:
+            job = self._jobs[job_id]
+            payload = job['payload']
+            secrets = self._secrets.get(job_id, {})
+        handler, _ = self._handlers[job['kind']]
+
+        self.update(job_id, status='running')
+        try:
+            result = handler(job_id, payload, secrets)
+            if result.get('success'):
+                self.update(job_id, status='completed', result=result)
+            else:
+                self.update(job_id, status='failed', result=result,
+                            error=result.get('error', 'Error desconocido'))
+        except Exception as e:
+            print(f"Error en trabajo {job_id}: {str(e)}")
+            self.update(job_id, status='failed', error=str(e))
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._secrets.pop(job_id, None)
+                self._jobs.pop(job_id, None)
+                self._cond.notify_all()
+
+    def _path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        # Escritura atómica para no dejar archivos a medias
+        path = self._path(job['id'])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(temp_path, path)
+
+    def _load(self, job_id):
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,171 @@
+"""
+Transcripción incremental mientras la grabación está en curso
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_chunks import merge_transcripts
+
+
+class LiveTranscriber:
+    """Sesiones de transcripción en vivo.
+
+    El navegador envía segmentos de audio independientes durante la
+    grabación; cada segmento se transcribe en segundo plano con
+    ``transcribe_fn(path, backend)`` (que devuelve el texto) usando el
+    backend elegido al iniciar la sesión y las transcripciones
+    parciales quedan disponibles inmediatamente. Al terminar solo falta
+    procesar el último segmento.
+
+    Los segmentos consecutivos se solapan alrededor de un segundo para no
+    cortar palabras en los bordes; el texto repetido se quita al unirlos.
+    """
+
+    def __init__(self, folder, transcribe_fn, max_workers=2, session_ttl=6 * 3600):
+        self.folder = folder
+        self.transcribe_fn = transcribe_fn
+        self.session_ttl = session_ttl
+        self._sessions = {}
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='live')
+        os.makedirs(folder, exist_ok=True)
+
+    def start(self, recording_filename, backend=None):
+        """Crear una sesión asociada al archivo de la grabación y al backend con que se transcribe"""
+        self._expire()
+        session_id = uuid.uuid4().hex
+        os.makedirs(self._session_dir(session_id), exist_ok=True)
+        with self._cond:
+            self._sessions[session_id] = {
+                'id': session_id,
+                'filename': recording_filename,
+                'backend': backend,
+                'segments': {},
+                'version': 0,
+                'created_at': time.time()
+            }
+        return session_id
+
+    def rename(self, session_id, recording_filename):
+        """Asociar la sesión al nombre definitivo con que se guardó la grabación"""
+        with self._cond:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            session['filename'] = recording_filename
+            return True
+
+    def add_segment(self, session_id, index, stream, extension='webm'):
+        """Guardar un segmento y encolar su transcripción"""
+        with self._cond:
+            if session_id not in self._sessions:
+                raise KeyError(session_id)
+            backend = self._sessions[session_id]['backend']
+
+        path = os.path.join(self._session_dir(session_id), f"{index:05d}.{extension}")
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+
+        self._set_segment(session_id, index, status='pending', text=None)
+        self._executor.submit(self._transcribe, session_id, index, path, backend)
+
+    def snapshot(self, session_id):
+        """Estado de la sesión con el texto de los segmentos ya transcritos"""
+        with self._cond:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            segments = [
+                {'index': index, **segment}
+                for index, segment in sorted(session['segments'].items())
+            ]
+            return {
+                'id': session_id,
+                'filename': session['filename'],
+                'backend': session['backend'],
+                'version': session['version'],
+                'segments': segments,
+                'pending': sum(1 for segment in segments if segment['status'] == 'pending'),
+                'text': _join_segments(segments)
+            }
+
+    def wait(self, session_id, since_version, timeout):
+        """Esperar hasta que cambie la sesión respecto a ``since_version``"""
+        def changed():
+            session = self._sessions.get(session_id)
+            return session is None or session['version'] != since_version
+
+        with self._cond:
+            self._cond.wait_for(changed, timeout=timeout)
+        return self.snapshot(session_id)
+
+    def finish(self, session_id, timeout):
+        """Esperar los segmentos pendientes y cerrar la sesión"""
+        def done():
+            session = self._sessions.get(session_id)
+            return session is None or all(
+                segment['status'] != 'pending' for segment in session['segments'].values()
+            )
+
+        with self._cond:
+            self._cond.wait_for(done, timeout=timeout)
+        snapshot = self.snapshot(session_id)
+
+        if snapshot and snapshot['pending'] == 0:
+            with self._cond:
+                self._sessions.pop(session_id, None)
+            shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+        return snapshot
+
+    def _transcribe(self, session_id, index, path, backend):
+        try:
+            text = self.transcribe_fn(path, backend)
+            self._set_segment(session_id, index, status='done', text=text.strip())
+        except Exception as e:
+            print(f"Error en segmento {index} de la sesión {session_id}: {e}")
+            self._set_segment(session_id, index, status='failed', text=None, error=str(e))
+
+    def _set_segment(self, session_id, index, **fields):
+        with self._cond:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session['segments'][index] = fields
+            session['version'] += 1
+            self._cond.notify_all()
+
+    def _session_dir(self, session_id):
+        return os.path.join(self.folder, session_id)
+
+    def _expire(self):
+        # Descartar sesiones abandonadas (por ejemplo, si el navegador se cerró)
+        limit = time.time() - self.session_ttl
+        with self._cond:
+            expired = [sid for sid, session in self._sessions.items() if session['created_at'] < limit]
+            for session_id in expired:
+                del self._sessions[session_id]
+        for session_id in expired:
+            shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+
+def _join_segments(segments):
+    """Texto de la sesión: los segmentos consecutivos se unen quitando el solape"""
+    runs, previous = [], None
+    for segment in segments:
+        if not segment['text']:
+            continue
+        if previous is not None and segment['index'] == previous + 1:
+            runs[-1].append(segment['text'])
+        else:
+            runs.append([segment['text']])
+        previous = segment['index']
+    return ' '.join(merge_transcripts(run) for run in runs)
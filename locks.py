@@ -0,0 +1,54 @@
+"""
+Bloqueos entre procesos con archivos, para varios workers de gunicorn
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo el servidor de desarrollo, con un único proceso
+    fcntl = None
+
+
+class FileLock:
+    """Bloqueo exclusivo con ``flock`` sobre ``path``.
+
+    El sistema lo libera al cerrar el descriptor o si el proceso muere, así
+    que un bloqueo retenido nunca sobrevive a su dueño. Se puede usar como
+    gestor de contexto (espera a obtenerlo) o con ``acquire(blocking=False)``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        """Obtener el bloqueo; sin ``blocking`` devuelve ``False`` si lo tiene otro"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,337 @@
+"""
+Mantenimiento en segundo plano: retención de audio, compresión de transcripciones y limpieza de temporales
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import fnmatch
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta
+
+from batch import has_transcript
+from jobs import FINISHED_STATES
+
+# Transcripciones que se comprimen pasado un tiempo
+TRANSCRIPT_PATTERNS = ('*_transcript.txt', 'transcript_*.txt')
+
+# Archivos a medio escribir que quedan si un proceso muere antes del ``os.replace``
+PARTIAL_SUFFIXES = ('.tmp', '.normalized')
+
+# Fracción del tamaño que se estima ahorrar al comprimir una transcripción con gzip;
+# el ahorro real se mide al comprimir
+TRANSCRIPT_GZIP_SAVING = 0.6
+
+# Acciones que se listan como máximo en un informe (los totales cuentan todas)
+REPORT_MAX_ACTIONS = 100
+
+
+class MaintenanceWorker:
+    """Aplica las políticas de retención cada ``interval_seconds`` en un hilo propio.
+
+    Cada pasada construye primero un plan (``plan()``) con las acciones y
+    los bytes que recuperaría, y después lo ejecuta. El mismo plan sirve
+    como informe en modo simulación, sin tocar nada. Las políticas son:
+
+    - audio: los nombres del almacén creados hace más de
+      ``audio_retention_days`` días *y ya transcritos* se archivan con
+      ``offload(path, name, sha256)`` (que devuelve ``{'success', 'url'}``)
+      o se borran, según ``audio_action``. 0 desactiva la política.
+    - transcripciones: las que no se modifican desde hace
+      ``transcript_compress_days`` días se comprimen a ``.txt.gz``. El plan
+      estima el ahorro sin comprimir; la ejecución mide el real.
+    - temporales: los archivos de ``temp_folders``, los ``.tmp`` a medias,
+      las subidas reanudables abandonadas, las sesiones en vivo sin
+      actividad y las entradas de trabajos sin trabajo activo, pasado
+      ``temp_max_age_hours``; los estados de trabajos terminados pasado
+      ``job_retention_days``.
+    """
+
+    def __init__(self, upload_folder, store, interval_seconds=3600, audio_retention_days=0,
+                 audio_action='offload', offload=None, transcript_compress_days=30,
+                 temp_max_age_hours=24, job_retention_days=7, temp_folders=(),
+                 jobs_folder=None, resumable_folder=None, live_folder=None, cache=None):
+        self.upload_folder = upload_folder
+        self.store = store
+        self.interval_seconds = interval_seconds
+        self.audio_retention_days = audio_retention_days
+        self.audio_action = audio_action
+        self.offload = offload
+        self.transcript_compress_days = transcript_compress_days
+        self.temp_max_age_hours = temp_max_age_hours
+        self.job_retention_days = job_retention_days
+        self.temp_folders = [folder for folder in temp_folders if folder]
+        self.jobs_folder = jobs_folder
+        self.resumable_folder = resumable_folder
+        self.live_folder = live_folder
+        self.cache = cache
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._last_run = None
+
+    def start(self):
+        """Arrancar el hilo de mantenimiento (no hace nada si el intervalo es 0)"""
+        with self._lock:
+            if self._thread or not self.interval_seconds:
+                return
+            self._thread = threading.Thread(target=self._loop, name='maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def last_run(self):
+        with self._lock:
+            return self._last_run
+
+    def plan(self):
+        """Acciones pendientes según las políticas, sin ejecutar ninguna"""
+        now = time.time()
+        actions = []
+        actions.extend(self._plan_audio())
+        actions.extend(self._plan_transcripts(now))
+        actions.extend(self._plan_temp(now))
+        return actions
+
+    def report(self, actions=None, limit=REPORT_MAX_ACTIONS):
+        """Resumen del plan: acciones y bytes recuperables por categoría.
+
+        Solo se listan las primeras ``limit`` acciones, con las rutas
+        relativas a ``upload_folder``; ``actions_total`` las cuenta todas.
+        """
+        actions = self.plan() if actions is None else actions
+        categories = {}
+        for action in actions:
+            summary = categories.setdefault(action['category'], {'actions': 0, 'bytes': 0})
+            summary['actions'] += 1
+            summary['bytes'] += action['bytes']
+        return {
+            'generated_at': datetime.now().isoformat(),
+            'policies': {
+                'audio_retention_days': self.audio_retention_days,
+                'audio_action': self.audio_action if self.audio_retention_days else None,
+                'transcript_compress_days': self.transcript_compress_days,
+                'temp_max_age_hours': self.temp_max_age_hours,
+                'job_retention_days': self.job_retention_days
+            },
+            'categories': categories,
+            'reclaimable_bytes': sum(action['bytes'] for action in actions),
+            'actions_total': len(actions),
+            'actions': [self._public(action) for action in actions[:limit]]
+        }
+
+    def _public(self, action):
+        """Acción con su ruta relativa a ``upload_folder`` para mostrarla fuera del servidor"""
+        public = dict(action)
+        if action['category'] != 'audio':  # las de audio ya usan el nombre del almacén
+            relative = os.path.relpath(action['target'], self.upload_folder)
+            public['target'] = os.path.basename(action['target']) if relative.startswith(os.pardir) else relative
+        if 'error' in action:
+            public['error'] = action['error'].replace(os.path.join(self.upload_folder, ''), '')
+        return public
+
+    def run(self):
+        """Ejecutar una pasada completa y guardar su resultado como última ejecución"""
+        with self._run_lock:
+            started = time.monotonic()
+            actions = self.plan()
+            done, failed = [], []
+            for action in actions:
+                try:
+                    reclaimed = self._execute(action)
+                except Exception as e:
+                    print(f"Error de mantenimiento en {action['target']}: {e}")
+                    failed.append({**action, 'error': str(e)})
+                    continue
+                done.append({**action, 'bytes': reclaimed})
+
+            result = self.report(done)
+            result.update({
+                'failed_total': len(failed),
+                'failed': [self._public(action) for action in failed[:REPORT_MAX_ACTIONS]],
+                'cache_evictions': self.cache.evict() if self.cache else 0,
+                'duration_seconds': round(time.monotonic() - started, 3)
+            })
+            with self._lock:
+                self._last_run = result
+            return result
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"Error en la pasada de mantenimiento: {e}")
+
+    def _plan_audio(self):
+        if not self.audio_retention_days or (self.audio_action == 'offload' and not self.offload):
+            return []
+
+        cutoff = (datetime.now() - timedelta(days=self.audio_retention_days)).isoformat()
+        candidates = [entry for entry in self.store.entries(created_before=cutoff)
+                      if has_transcript(self.upload_folder, entry['name'])]
+        expiring = {entry['name'] for entry in candidates}
+        freed = set()
+
+        actions = []
+        for entry in candidates:
+            # Un blob compartido solo se libera si caducan todos sus nombres locales
+            blob_path = self.store.blob_path(entry['sha256'], entry['name'])
+            frees = (blob_path not in freed
+                     and all(name in expiring for name in self.store.references(entry['name'])))
+            if frees:
+                freed.add(blob_path)
+            actions.append({
+                'action': self.audio_action,
+                'category': 'audio',
+                'target': entry['name'],
+                'bytes': entry['size'] if frees else 0,
+                'reason': f"Transcrito y con más de {self.audio_retention_days} días"
+            })
+        return actions
+
+    def _plan_transcripts(self, now):
+        if not self.transcript_compress_days:
+            return []
+
+        cutoff = now - self.transcript_compress_days * 24 * 3600
+        actions = []
+        for entry in os.scandir(self.upload_folder):
+            if not entry.is_file() or not any(fnmatch.fnmatch(entry.name, p) for p in TRANSCRIPT_PATTERNS):
+                continue
+            stat = entry.stat()
+            if stat.st_mtime >= cutoff:
+                continue
+            actions.append({
+                'action': 'compress',
+                'category': 'transcripts',
+                'target': entry.path,
+                'bytes': int(stat.st_size * TRANSCRIPT_GZIP_SAVING),
+                'reason': f"Sin cambios desde hace más de {self.transcript_compress_days} días"
+            })
+        return actions
+
+    def _plan_temp(self, now):
+        cutoff = now - self.temp_max_age_hours * 3600
+        actions = []
+
+        def sweep(path, size, reason, category='temp'):
+            actions.append({'action': 'sweep', 'category': category, 'target': path,
+                            'bytes': size, 'reason': reason})
+
+        for folder in self.temp_folders:
+            for entry in _scan_files(folder):
+                if entry.stat().st_mtime < cutoff:
+                    sweep(entry.path, entry.stat().st_size, 'Temporal abandonado')
+
+        for folder in (self.upload_folder, self.jobs_folder, self.resumable_folder):
+            for entry in _scan_files(folder):
+                if entry.name.endswith(PARTIAL_SUFFIXES) and entry.stat().st_mtime < cutoff:
+                    sweep(entry.path, entry.stat().st_size, 'Escritura a medias')
+
+        if self.resumable_folder:
+            # El estado se reescribe con cada parte: si no cambia, el cliente abandonó la subida
+            for entry in _scan_files(self.resumable_folder):
+                if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                    data_path = f"{entry.path[:-5]}.data"
+                    for path in (entry.path, data_path):
+                        if os.path.exists(path):
+                            sweep(path, os.path.getsize(path), 'Subida reanudable abandonada')
+
+        if self.live_folder and os.path.isdir(self.live_folder):
+            for entry in os.scandir(self.live_folder):
+                if entry.is_dir() and _tree_mtime(entry.path) < cutoff:
+                    sweep(entry.path, _tree_size(entry.path), 'Sesión en vivo sin actividad')
+
+        if self.jobs_folder:
+            actions.extend(self._plan_jobs(now, cutoff))
+        return actions
+
+    def _plan_jobs(self, now, input_cutoff):
+        state_cutoff = now - self.job_retention_days * 24 * 3600
+        actions = []
+        for entry in _scan_files(self.jobs_folder):
+            if entry.name.endswith('.input'):
+                status = _job_status(os.path.join(self.jobs_folder, f"{entry.name[:-6]}.json"))
+                if (status is None or status in FINISHED_STATES) and entry.stat().st_mtime < input_cutoff:
+                    actions.append({'action': 'sweep', 'category': 'temp', 'target': entry.path,
+                                    'bytes': entry.stat().st_size, 'reason': 'Audio de un trabajo terminado'})
+            elif entry.name.endswith('.json') and self.job_retention_days and entry.stat().st_mtime < state_cutoff:
+                if _job_status(entry.path) in FINISHED_STATES:
+                    actions.append({'action': 'sweep', 'category': 'jobs', 'target': entry.path,
+                                    'bytes': entry.stat().st_size,
+                                    'reason': f"Trabajo terminado hace más de {self.job_retention_days} días"})
+        return actions
+
+    def _execute(self, action):
+        if action['action'] in ('delete', 'offload'):
+            return self._expire_audio(action)
+        if action['action'] == 'compress':
+            return _compress(action['target'])
+        if os.path.isdir(action['target']):
+            shutil.rmtree(action['target'])
+        elif os.path.exists(action['target']):
+            os.unlink(action['target'])
+        else:
+            return 0
+        return action['bytes']
+
+    def _expire_audio(self, action):
+        name = action['target']
+        path = self.store.path(name)
+        if path is None:
+            return 0
+        if action['action'] == 'delete':
+            return self.store.expire(name)
+
+        entry = self.store.get(name)
+        result = self.offload(path, name, entry['sha256'])
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'No se pudo archivar el audio'))
+        return self.store.expire(name, remote_url=result['url'])
+
+
+def _scan_files(folder):
+    if not folder or not os.path.isdir(folder):
+        return []
+    return [entry for entry in os.scandir(folder) if entry.is_file()]
+
+
+def _tree_mtime(path):
+    mtimes = [os.path.getmtime(path)]
+    for root, _, files in os.walk(path):
+        mtimes.extend(os.path.getmtime(os.path.join(root, name)) for name in files)
+    return max(mtimes)
+
+
+def _tree_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files)
+
+
+def _job_status(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('status')
+    except (OSError, ValueError):
+        return None
+
+
+def _compress(path):
+    """Sustituir ``path`` por ``path.gz`` conservando la fecha de modificación"""
+    size = os.path.getsize(path)
+    temp_path = f"{path}.gz.tmp"
+    with open(path, 'rb') as source, gzip.open(temp_path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    shutil.copystat(path, temp_path)
+    os.replace(temp_path, f"{path}.gz")
+    os.unlink(path)
+    return max(0, size - os.path.getsize(f"{path}.gz"))
@@ -0,0 +1,311 @@
+"""
+Métricas al estilo Prometheus y trazas por petición
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Límites de los histogramas de duración, en segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+trace_logger = logging.getLogger('grabador.trace')
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._values.items())
+
+        samples = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                samples.append((f"{self.name}_bucket", key + (('le', le),), cumulative))
+            samples.append((f"{self.name}_sum", key, round(total, 6)))
+            samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+
+class Gauge:
+    """Valor que sube y baja (por ejemplo, peticiones en curso) y el máximo que ha alcanzado"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.labelnames = ()
+        self._value = 0
+        self._peak = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+            self._peak = max(self._peak, self._value)
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def peak(self):
+        with self._lock:
+            return self._peak
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, (), self._value)]
+
+
+class Registry:
+    """Conjunto de métricas exportables en el formato de texto de Prometheus.
+
+    Además de contadores, indicadores e histogramas admite ``collectors``:
+    funciones que devuelven ``(nombre, tipo, ayuda, {etiquetas: valor})`` en
+    el momento de exportar, útiles para publicar estadísticas que ya
+    mantiene otro módulo.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text):
+        metric = Gauge(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"Error en colector de métricas: {e}")
+                continue
+            for name, kind, help_text, values in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in values.items():
+                    lines.append(f"{name}{_format_labels(tuple(labels))} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    'grabador_http_requests_total', 'Peticiones HTTP atendidas', ('endpoint', 'method', 'status'))
+request_seconds = registry.histogram(
+    'grabador_http_request_duration_seconds', 'Duración de las peticiones HTTP', ('endpoint',))
+stage_seconds = registry.histogram(
+    'grabador_stage_duration_seconds', 'Duración de cada etapa del pipeline', ('pipeline', 'stage'))
+errors_total = registry.counter(
+    'grabador_errors_total', 'Errores por etapa y causa', ('pipeline', 'stage', 'cause'))
+bytes_total = registry.counter(
+    'grabador_bytes_total', 'Bytes transferidos por destino y dirección', ('target', 'direction'))
+requests_in_flight = registry.gauge(
+    'grabador_http_requests_in_flight', 'Peticiones de API en curso en este proceso')
+
+
+class Trace:
+    """Etapas cronometradas de una petición o de un trabajo en segundo plano"""
+
+    def __init__(self, trace_id, name):
+        self.id = trace_id
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = []
+        self.fields = {}
+
+    def record(self, stage, seconds, error=None):
+        entry = {'stage': stage, 'ms': round(seconds * 1000, 2)}
+        if error:
+            entry['error'] = error
+        self.stages.append(entry)
+
+    def to_dict(self):
+        return {
+            'trace_id': self.id,
+            'name': self.name,
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            **self.fields,
+            'stages': list(self.stages)
+        }
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def start_trace(trace_id, name):
+    """Activar una traza en el contexto actual; devuelve el token para cerrarla"""
+    trace = Trace(trace_id or new_trace_id(), name)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token, min_ms=0, **fields):
+    """Cerrar la traza activa y escribirla como una línea JSON en el log de trazas"""
+    trace = _current_trace.get()
+    try:
+        _current_trace.reset(token)
+    except ValueError:
+        # El token se creó en otro contexto (por ejemplo, una respuesta en streaming)
+        _current_trace.set(None)
+    if trace is None:
+        return None
+    trace.fields.update(fields)
+    entry = trace.to_dict()
+    if entry['duration_ms'] >= min_ms:
+        trace_logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+    return entry
+
+
+@contextmanager
+def trace(trace_id, name, min_ms=0):
+    """Traza para trabajos fuera de una petición HTTP (por ejemplo, en la cola)"""
+    current, token = start_trace(trace_id, name)
+    try:
+        yield current
+    finally:
+        end_trace(token, min_ms)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.id if trace else None
+
+
+@contextmanager
+def stage(name):
+    """Cronometrar una etapa: histograma, errores por causa y entrada en la traza activa.
+
+    La etiqueta ``pipeline`` es el nombre de la traza activa (el endpoint o
+    el trabajo que ejecuta la etapa), de modo que una misma función, como
+    la subida a S3, se mide por separado en cada flujo que la usa.
+    """
+    trace = _current_trace.get()
+    pipeline = trace.name if trace else 'background'
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        errors_total.inc(pipeline=pipeline, stage=name, cause=error)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stage_seconds.observe(seconds, pipeline=pipeline, stage=name)
+        if trace is not None:
+            trace.record(name, seconds, error)
+
+
+def record_error(stage_name, cause):
+    """Contar un error que se maneja sin excepción (por ejemplo, ``success: False``)"""
+    trace = _current_trace.get()
+    errors_total.inc(pipeline=trace.name if trace else 'background', stage=stage_name, cause=cause)
+
+
+def record_bytes(target, direction, amount):
+    if amount:
+        bytes_total.inc(amount, target=target, direction=direction)
+
+
+def copy_context():
+    """Contexto actual para ejecutar tareas en otros hilos sin perder la traza"""
+    return contextvars.copy_context()
+
+
+def _label_key(labelnames, labels):
+    return tuple((name, str(labels.get(name, ''))) for name in labelnames)
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    parts = []
+    for name, value in key:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
@@ -0,0 +1,165 @@
+"""
+Almacén de metadatos de grabaciones sobre SQLite
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+
+# Columnas propias de la tabla; el resto de campos se guardan en ``extra``
+COLUMNS = ('filename', 'project_name', 'duration', 'start_time', 'created_at')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    project_name TEXT,
+    duration NUMERIC,
+    start_time TEXT,
+    created_at TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_created_at ON recordings (created_at);
+DROP INDEX IF EXISTS idx_recordings_project;
+CREATE INDEX IF NOT EXISTS idx_recordings_project_nocase ON recordings (project_name COLLATE NOCASE, created_at);
+CREATE INDEX IF NOT EXISTS idx_recordings_filename ON recordings (filename);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+class RecordingsStore:
+    """Metadatos de grabaciones en SQLite con WAL.
+
+    Cada hilo usa su propia conexión; el modo WAL permite lecturas
+    concurrentes con un escritor, y cada inserción es O(1).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, info):
+        """Insertar una grabación y devolver su id"""
+        with self._connect() as conn:
+            return self._insert(conn, info)
+
+    def query(self, project_name=None, date_from=None, date_to=None, limit=50, after=None, before=None):
+        """Consultar grabaciones (más recientes primero) con filtros y paginación por cursor.
+
+        ``project_name`` filtra por prefijo sin distinguir mayúsculas y
+        ``date_from`` y ``date_to`` son fechas ISO (``YYYY-MM-DD``) inclusivas.
+        ``after`` es el cursor ``(created_at, id)`` de la última grabación de
+        la página actual, para pedir la siguiente, y ``before`` el de la
+        primera, para pedir la anterior: cada página se lee desde el índice
+        sin recorrer las anteriores. Devuelve la página de resultados y el
+        total que cumple los filtros.
+        """
+        clauses, params = [], []
+        if project_name:
+            clauses.append("project_name LIKE ? ESCAPE '\\'")
+            params.append(re.sub(r'([%_\\])', r'\\\1', project_name) + '%')
+        if date_from:
+            clauses.append('created_at >= ?')
+            params.append(date_from)
+        if date_to:
+            # Incluir todo el día indicado
+            clauses.append("created_at < date(?, '+1 day')")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        conn = self._connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM recordings {where}", params).fetchone()[0]
+
+        order = 'DESC'
+        if after:
+            clauses.append('(created_at, id) < (?, ?)')
+            params.extend(after)
+        elif before:
+            # Página anterior: las más antiguas por encima del cursor, en orden inverso
+            clauses.append('(created_at, id) > (?, ?)')
+            params.extend(before)
+            order = 'ASC'
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = conn.execute(
+            f"SELECT * FROM recordings {where} ORDER BY created_at {order}, id {order} LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        if order == 'ASC':
+            rows.reverse()
+        return [self._to_dict(row) for row in rows], total
+
+    def get(self, recording_id):
+        row = self._connect().execute('SELECT * FROM recordings WHERE id = ?', (recording_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_by_filename(self, filename):
+        row = self._connect().execute(
+            'SELECT * FROM recordings WHERE filename = ? ORDER BY id DESC LIMIT 1', (filename,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def migrate_json(self, json_path):
+        """Importar una sola vez el antiguo ``recordings.json``.
+
+        Si el archivo está dañado no se importa nada y se deja en su sitio
+        para revisarlo, en lugar de perder el historial.
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM migrations WHERE name = 'recordings_json'").fetchone():
+            return 0
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                recordings = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error al migrar {json_path}: {e}")
+            return 0
+
+        with conn:
+            for info in recordings:
+                self._insert(conn, info)
+            conn.execute("INSERT INTO migrations (name) VALUES ('recordings_json')")
+
+        os.replace(json_path, f"{json_path}.migrated")
+        return len(recordings)
+
+    def _insert(self, conn, info):
+        extra = {key: value for key, value in info.items() if key not in COLUMNS}
+        cursor = conn.execute(
+            'INSERT INTO recordings (filename, project_name, duration, start_time, created_at, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (info.get('filename'), info.get('project_name'), info.get('duration'),
+             info.get('start_time'), info.get('created_at'), json.dumps(extra) if extra else None)
+        )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _to_dict(row):
+        recording = {key: row[key] for key in ('id',) + COLUMNS}
+        if row['extra']:
+            recording.update(json.loads(row['extra']))
+        return recording
@@ -0,0 +1,175 @@
+"""
+Subidas reanudables por partes numeradas
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from transcript_cache import hash_file
+
+
+class UploadError(Exception):
+    """Error de validación en una subida reanudable"""
+
+
+class UploadTooLarge(UploadError):
+    """La subida o una de sus partes supera el tamaño permitido"""
+
+
+class ResumableUploads:
+    """Subidas reanudables: iniciar, escribir partes por offset, consultar y finalizar.
+
+    Cada subida tiene un archivo de datos ``<id>.data`` (preasignado si se
+    conoce el tamaño esperado) y un estado ``<id>.json`` con los rangos ya
+    recibidos, de modo que un cliente puede reenviar solo lo que falte
+    incluso después de reiniciar el servidor.
+
+    Ninguna parte puede escribir más allá del tamaño esperado o, si no se
+    declaró, de ``max_upload_bytes``: cada parte es pequeña, así que el
+    límite de tamaño de las peticiones no basta para acotar el archivo.
+    """
+
+    def __init__(self, folder, max_chunk_bytes=16 * 1024 * 1024, max_upload_bytes=512 * 1024 * 1024):
+        self.folder = folder
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_upload_bytes = max_upload_bytes
+        self._locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def initiate(self, filename, expected_size=None, content_type=None, metadata=None):
+        if expected_size and expected_size > self.max_upload_bytes:
+            raise UploadTooLarge('El tamaño esperado supera el máximo permitido')
+
+        upload = {
+            'id': uuid.uuid4().hex,
+            'filename': filename,
+            'content_type': content_type,
+            'expected_size': expected_size,
+            'metadata': metadata or {},
+            'ranges': [],
+            'chunks': {},
+            'created_at': datetime.now().isoformat()
+        }
+
+        with open(self._data_path(upload['id']), 'wb') as f:
+            if expected_size:
+                _preallocate(f.fileno(), expected_size)
+
+        self._save(upload)
+        return upload
+
+    def write_chunk(self, upload_id, index, offset, stream):
+        """Escribir una parte en su offset y registrar el rango recibido"""
+        if offset < 0:
+            raise UploadError('Offset inválido')
+
+        with self._upload_lock(upload_id):
+            upload = self.get(upload_id)
+            if upload is None:
+                raise UploadError('Subida no encontrada')
+
+            limit = upload['expected_size'] or self.max_upload_bytes
+            if offset > limit:
+                raise UploadTooLarge('La parte queda fuera del tamaño de la subida')
+
+            written = 0
+            with open(self._data_path(upload_id), 'r+b') as f:
+                f.seek(offset)
+                while True:
+                    block = stream.read(1024 * 1024)
+                    if not block:
+                        break
+                    written += len(block)
+                    if written > self.max_chunk_bytes:
+                        raise UploadTooLarge('La parte supera el tamaño máximo permitido')
+                    if offset + written > limit:
+                        raise UploadTooLarge('La parte queda fuera del tamaño de la subida')
+                    f.write(block)
+
+            upload['chunks'][str(index)] = [offset, written]
+            upload['ranges'] = _merge_ranges(upload['ranges'] + [[offset, offset + written]])
+            self._save(upload)
+            return upload
+
+    def finalize(self, upload_id, size, sha256, destination):
+        """Verificar que la subida está completa y su checksum, y moverla a ``destination``"""
+        with self._upload_lock(upload_id):
+            upload = self.get(upload_id)
+            if upload is None:
+                raise UploadError('Subida no encontrada')
+
+            if upload['ranges'] != [[0, size]]:
+                raise UploadError(f"Faltan partes: recibido {upload['ranges']} de {size} bytes")
+
+            data_path = self._data_path(upload_id)
+            with open(data_path, 'r+b') as f:
+                f.truncate(size)
+
+            digest = hash_file(data_path)
+            if sha256 and digest != sha256.lower():
+                raise UploadError('El checksum SHA-256 no coincide')
+
+            os.replace(data_path, destination)
+            os.unlink(self._state_path(upload_id))
+
+        with self._lock:
+            self._locks.pop(upload_id, None)
+
+        return {'path': destination, 'bytes': size, 'sha256': digest}
+
+    def get(self, upload_id):
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            return None
+        try:
+            with open(self._state_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _data_path(self, upload_id):
+        return os.path.join(self.folder, f"{upload_id}.data")
+
+    def _state_path(self, upload_id):
+        return os.path.join(self.folder, f"{upload_id}.json")
+
+    def _save(self, upload):
+        path = self._state_path(upload['id'])
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(upload, f)
+        os.replace(f"{path}.tmp", path)
+
+
+def _preallocate(fd, size):
+    """Reservar espacio en disco para el archivo (o al menos fijar su tamaño)"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+def _merge_ranges(ranges):
+    """Unir rangos ``[inicio, fin)`` solapados o contiguos"""
+    merged = []
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
@@ -0,0 +1,256 @@
+"""
+Planificador compartido de llamadas a la API de transcripción
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+
+from clients import credential_fingerprint
+
+# Códigos HTTP que merecen reintento
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+# Muestras recientes de espera en cola usadas para los percentiles
+WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """Cubeta de tokens con tasa adaptativa.
+
+    La tasa baja a la mitad con cada 429 y se recupera poco a poco con las
+    llamadas correctas hasta volver a la configurada. Un ``Retry-After``
+    pausa la cubeta entera para que ninguna llamada con la misma key insista.
+    """
+
+    def __init__(self, rate_per_minute, burst):
+        self.max_rate = rate_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Esperar a que haya un token y consumirlo; devuelve los segundos esperados"""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                delay = self._take()
+            if delay == 0:
+                return time.monotonic() - start
+            time.sleep(delay)
+
+    def try_acquire(self):
+        """Consumir un token solo si hay uno disponible ahora"""
+        with self._lock:
+            return self._take() == 0
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def penalize(self):
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def reward(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def _take(self):
+        # Devuelve 0 si se consumió un token o los segundos a esperar
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if not self.max_rate:
+            return 0
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class CallScheduler:
+    """Limita, reintenta y (opcionalmente) duplica llamadas a un servicio externo.
+
+    Cada llamada pasa por la cubeta de tokens de su key. Los errores
+    transitorios (429, 5xx, timeouts, conexión) se reintentan con backoff
+    exponencial y jitter, respetando ``Retry-After`` si el servidor lo envía.
+    Con ``hedge_after`` se lanza una segunda petición idéntica si la primera
+    tarda más de esos segundos y se usa la que termine antes.
+    """
+
+    def __init__(self, rate_per_minute=50, burst=10, max_retries=5, base_delay=1.0,
+                 max_delay=60.0, hedge_after=None):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._counters = {
+            'calls': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retries': 0,
+            'hedges': 0,
+            'hedge_wins': 0
+        }
+        self._retry_reasons = {}
+        self._hedge_executor = (
+            ThreadPoolExecutor(max_workers=16, thread_name_prefix='hedge') if hedge_after else None
+        )
+
+    def call(self, key, fn):
+        """Ejecutar ``fn()`` respetando el límite de ``key`` y reintentando si falla.
+
+        ``fn`` debe poder llamarse varias veces (por ejemplo, abriendo de nuevo
+        el archivo), ya que se repite en los reintentos y en las peticiones
+        duplicadas.
+        """
+        bucket = self._bucket(key)
+        self._count('calls')
+
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            with self._lock:
+                self._waits.append(waited)
+
+            try:
+                result = self._attempt(bucket, fn)
+                bucket.reward()
+                self._count('succeeded')
+                return result
+            except Exception as e:
+                reason = retry_reason(e)
+                if reason is None or attempt >= self.max_retries:
+                    self._count('failed')
+                    raise
+
+                if reason == 'rate_limit':
+                    bucket.penalize()
+                delay = retry_after_seconds(e)
+                if delay is not None:
+                    bucket.pause(delay)
+                    delay += random.uniform(0, self.base_delay)
+                else:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+                with self._lock:
+                    self._counters['retries'] += 1
+                    self._retry_reasons[reason] = self._retry_reasons.get(reason, 0) + 1
+                attempt += 1
+                time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            buckets = {key[:12]: round(bucket.rate * 60, 2) for key, bucket in self._buckets.items()}
+            return {
+                **self._counters,
+                'retry_reasons': dict(self._retry_reasons),
+                'queue_wait_seconds': {
+                    'samples': len(waits),
+                    'mean': round(sum(waits) / len(waits), 4) if waits else 0,
+                    'p50': _percentile(waits, 0.50),
+                    'p95': _percentile(waits, 0.95),
+                    'p99': _percentile(waits, 0.99),
+                    'max': round(waits[-1], 4) if waits else 0
+                },
+                'rate_per_minute': buckets
+            }
+
+    def _attempt(self, bucket, fn):
+        if not self.hedge_after:
+            return fn()
+
+        primary = self._hedge_executor.submit(fn)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done or not bucket.try_acquire():
+            return primary.result()
+
+        # La primera petición va lenta: lanzar una copia y quedarse con la primera que acabe bien
+        self._count('hedges')
+        hedge = self._hedge_executor.submit(fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _bucket(self, key):
+        fingerprint = credential_fingerprint(key)
+        with self._lock:
+            bucket = self._buckets.get(fingerprint)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_per_minute, self.burst)
+                self._buckets[fingerprint] = bucket
+            return bucket
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+
+def retry_reason(error):
+    """Clasificar un error como transitorio (devuelve el motivo) o definitivo (``None``)"""
+    status = getattr(error, 'status_code', None)
+    if status == 429:
+        return 'rate_limit'
+    if status in RETRYABLE_STATUS:
+        return 'server_error'
+
+    name = type(error).__name__
+    if isinstance(error, TimeoutError) or 'Timeout' in name:
+        return 'timeout'
+    if isinstance(error, ConnectionError) or name == 'APIConnectionError':
+        return 'connection'
+    return None
+
+
+def retry_after_seconds(error):
+    """Leer ``Retry-After`` (o ``retry-after-ms``) de la respuesta HTTP del error"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 4)
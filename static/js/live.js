@@ -0,0 +1,165 @@
+/**
+ * Grabador de Audio con Temporizador y Transcripción
+ * Copyright (c) 2024
+ *
+ * This file is part of the Grabador de Audio project.
+ * Licensed under the MIT License. See LICENSE file for details.
+ */
+
+// Duración de cada segmento enviado durante la transcripción en vivo
+const LIVE_SEGMENT_MS = 15000;
+
+// Solape entre segmentos consecutivos para no cortar palabras en los bordes
+const LIVE_SEGMENT_OVERLAP_MS = 1000;
+
+// Clase para transcribir la grabación mientras está en curso
+class LiveTranscription {
+    constructor() {
+        this.liveId = null;
+        this.stream = null;
+        this.segmentRecorder = null;
+        this.recorders = new Set();
+        this.segmentIndex = 0;
+        this.segmentTimer = null;
+        this.uploads = Promise.resolve();
+        this.flushed = null;
+        this.events = null;
+        this.active = false;
+
+        this.toggle = document.getElementById('liveTranscription');
+        this.section = document.getElementById('liveTranscriptSection');
+        this.textElement = document.getElementById('liveTranscriptText');
+        this.statusElement = document.getElementById('liveTranscriptStatus');
+    }
+
+    isEnabled() {
+        return this.toggle ? this.toggle.checked : false;
+    }
+
+    async start(stream) {
+        try {
+            const response = await app.makeRequest('/api/live/start', { method: 'POST' });
+            this.liveId = response.live_id;
+            this.segmentUrl = response.segment_url;
+            this.stream = stream;
+            this.segmentIndex = 0;
+            this.uploads = Promise.resolve();
+            this.flushed = null;
+            this.active = true;
+
+            if (this.section) this.section.style.display = 'block';
+            this.render('', 'Escuchando...');
+
+            // Recibir las transcripciones parciales según se completan
+            this.events = new EventSource(response.events_url);
+            this.events.onmessage = (event) => {
+                const live = JSON.parse(event.data);
+                const pending = live.pending ? ` (${live.pending} segmento(s) en proceso)` : '';
+                this.render(live.text, 'Transcribiendo en vivo' + pending);
+            };
+
+            this.startSegment();
+            this.segmentTimer = setInterval(() => this.rotateSegment(), LIVE_SEGMENT_MS);
+        } catch (error) {
+            console.warn('No se pudo iniciar la transcripción en vivo:', error);
+            this.active = false;
+        }
+    }
+
+    startSegment() {
+        // Cada segmento usa su propio MediaRecorder para que sea un archivo autocontenido
+        const index = this.segmentIndex++;
+        const parts = [];
+        const recorder = new MediaRecorder(this.stream, { mimeType: 'audio/webm;codecs=opus' });
+
+        recorder.ondataavailable = (event) => {
+            if (event.data.size > 0) parts.push(event.data);
+        };
+        recorder.onstop = () => {
+            this.recorders.delete(recorder);
+            const blob = new Blob(parts, { type: 'audio/webm' });
+            if (blob.size > 0) {
+                this.uploads = this.uploads.then(() => this.sendSegment(index, blob));
+            }
+        };
+
+        recorder.start();
+        this.recorders.add(recorder);
+        this.segmentRecorder = recorder;
+    }
+
+    rotateSegment() {
+        // El siguiente segmento empieza antes de cerrar el actual; el servidor quita el texto repetido
+        const previous = this.segmentRecorder;
+        if (this.active) {
+            this.startSegment();
+        }
+        setTimeout(() => {
+            if (previous && previous.state !== 'inactive') previous.stop();
+        }, LIVE_SEGMENT_OVERLAP_MS);
+    }
+
+    async sendSegment(index, blob) {
+        const headers = { 'Content-Type': 'audio/webm' };
+        const csrfToken = document.querySelector('meta[name="csrf-token"]')?.getAttribute('content');
+        if (csrfToken) {
+            headers['X-CSRFToken'] = csrfToken;
+        }
+
+        try {
+            await fetch(this.segmentUrl + index, { method: 'PUT', headers, body: blob });
+        } catch (error) {
+            console.warn(`Error al enviar el segmento ${index}:`, error);
+        }
+    }
+
+    stop() {
+        // Enviar los últimos segmentos; la sesión se cierra con finish() una vez guardado el audio
+        if (!this.active) return;
+
+        this.active = false;
+        clearInterval(this.segmentTimer);
+
+        const stopped = [...this.recorders].map(recorder => new Promise(resolve => {
+            if (recorder.state === 'inactive') return resolve();
+            recorder.addEventListener('stop', resolve, { once: true });
+            recorder.stop();
+        }));
+        this.flushed = Promise.all(stopped).then(() => this.uploads);
+    }
+
+    async finish() {
+        if (!this.flushed) return null;
+
+        const flushed = this.flushed;
+        this.flushed = null;
+        await flushed;
+
+        this.render(this.textElement ? this.textElement.textContent : '', 'Procesando el último segmento...');
+
+        try {
+            const result = await app.makeRequest(`/api/live/${this.liveId}/finish`, { method: 'POST' });
+            this.render(result.transcript, 'Transcripción completada');
+            app.showNotification('Transcripción en vivo completada', 'success');
+            return result;
+        } catch (error) {
+            console.error('Error al finalizar la transcripción en vivo:', error);
+            this.render(this.textElement ? this.textElement.textContent : '', 'Error al finalizar la transcripción');
+            return null;
+        } finally {
+            if (this.events) {
+                this.events.close();
+                this.events = null;
+            }
+        }
+    }
+
+    render(text, status) {
+        if (this.textElement) this.textElement.textContent = text;
+        if (this.statusElement) this.statusElement.textContent = status;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    window.liveTranscription = new LiveTranscription();
+});
@@ -157,6 +157,35 @@ class AudioRecorderApp {
         }
     }
 
+    async waitForJob(jobId, onProgress = null) {
+        // Esperar con long-poll a que un trabajo en segundo plano termine o cambie
+        let version = null;
+        while (true) {
+            const since = version === null ? '' : `&since=${version}`;
+            const requested = Date.now();
+            const response = await this.makeRequest(`/api/jobs/${jobId}?wait=25${since}`, { method: 'GET' });
+            const job = response.job;
+
+            if (job.status === 'completed') {
+                return job.result;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Error desconocido en el trabajo');
+            }
+            if (job.version === version) {
+                // Sin cambios: no repetir la petición de inmediato si el servidor no esperó
+                if (Date.now() - requested < 1000) {
+                    await new Promise(resolve => setTimeout(resolve, 1000));
+                }
+                continue;
+            }
+            version = job.version;
+            if (onProgress) {
+                onProgress(job);
+            }
+        }
+    }
+
     validateProjectName(name) {
         // Validar nombre del proyecto
         if (!name || name.trim().length === 0) {
@@ -1,9 +1,192 @@
+// Transcripción sincronizada con un elemento <audio>: resalta el segmento que suena
+// y salta a una frase. Solo se pide al servidor una ventana de segmentos alrededor
+// del instante actual, nunca la transcripción completa.
+class TranscriptTimeline {
+    constructor(audioElement, container) {
+        this.audioElement = audioElement;
+        this.container = container;
+        this.segmentsElement = container.querySelector('.timeline-segments');
+        this.resultsElement = container.querySelector('.timeline-results');
+        this.searchInput = container.querySelector('.timeline-search');
+        this.filename = null;
+        this.segments = [];
+        this.window = null;
+        this.loading = false;
+        this.activeIndex = null;
+
+        // Segundos que se piden antes y después del instante actual
+        this.before = 30;
+        this.after = 90;
+
+        this.audioElement.addEventListener('timeupdate', () => this.onTimeUpdate());
+        this.audioElement.addEventListener('seeked', () => this.onTimeUpdate());
+        this.segmentsElement.addEventListener('click', (event) => {
+            const item = event.target.closest('[data-start]');
+            if (item) this.seek(parseFloat(item.dataset.start));
+        });
+        this.resultsElement.addEventListener('click', (event) => {
+            const item = event.target.closest('[data-time]');
+            if (item) this.seek(parseFloat(item.dataset.time));
+        });
+        container.querySelector('.timeline-search-form').addEventListener('submit', (event) => {
+            event.preventDefault();
+            this.search(this.searchInput.value);
+        });
+    }
+
+    load(filename) {
+        this.filename = filename;
+        this.segments = [];
+        this.window = null;
+        this.activeIndex = null;
+        this.segmentsElement.innerHTML = '';
+        this.resultsElement.innerHTML = '';
+        this.searchInput.value = '';
+        this.container.style.display = 'none';
+        this.fetchWindow(this.audioElement.currentTime || 0);
+    }
+
+    async fetchWindow(time) {
+        if (!this.filename || this.loading) return;
+        this.loading = true;
+        const filename = this.filename;
+        try {
+            const params = new URLSearchParams({ t: time.toFixed(2), before: this.before, after: this.after });
+            const response = await fetch(`/api/recordings/${encodeURIComponent(filename)}/segments?${params}`);
+            if (filename !== this.filename) return;
+            if (!response.ok) {
+                // Sin transcripción con marcas de tiempo: el panel queda oculto
+                this.container.style.display = 'none';
+                return;
+            }
+            const data = await response.json();
+            this.segments = data.segments;
+            this.window = { from: data.from, to: data.to };
+            this.container.style.display = 'block';
+            this.renderSegments();
+            this.highlight(this.audioElement.currentTime);
+        } catch (error) {
+            console.error('Error al cargar los segmentos de la transcripción:', error);
+        } finally {
+            this.loading = false;
+        }
+    }
+
+    renderSegments() {
+        const fragment = document.createDocumentFragment();
+        this.segments.forEach((segment) => {
+            const item = document.createElement('div');
+            item.className = 'timeline-segment';
+            item.dataset.start = segment.start;
+            item.dataset.index = segment.index;
+
+            const time = document.createElement('span');
+            time.className = 'timeline-time text-muted me-2';
+            time.textContent = app.formatTime(Math.floor(segment.start));
+            item.appendChild(time);
+            item.appendChild(document.createTextNode(segment.text));
+            fragment.appendChild(item);
+        });
+        this.segmentsElement.replaceChildren(fragment);
+        this.activeIndex = null;
+    }
+
+    onTimeUpdate() {
+        if (!this.filename || !this.window) return;
+        const time = this.audioElement.currentTime;
+
+        // Pedir la siguiente ventana antes de llegar a su final, o al saltar fuera de ella
+        const margin = this.after / 3;
+        if (time < this.window.from || time > this.window.to - margin) {
+            this.fetchWindow(time);
+        }
+        this.highlight(time);
+    }
+
+    highlight(time) {
+        // Búsqueda binaria del último segmento que empieza antes de ``time``
+        let lo = 0;
+        let hi = this.segments.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (this.segments[mid].start <= time) lo = mid + 1;
+            else hi = mid;
+        }
+        const segment = this.segments[lo - 1];
+        const index = segment && time <= segment.end ? segment.index : null;
+        if (index === this.activeIndex) return;
+
+        const previous = this.segmentsElement.querySelector('.timeline-segment.active');
+        if (previous) previous.classList.remove('active');
+        this.activeIndex = index;
+        if (index === null) return;
+
+        const current = this.segmentsElement.querySelector(`[data-index="${index}"]`);
+        if (current) {
+            current.classList.add('active');
+            current.scrollIntoView({ block: 'nearest' });
+        }
+    }
+
+    async search(query) {
+        query = query.trim();
+        if (!this.filename || !query) return;
+        try {
+            const params = new URLSearchParams({ q: query, limit: 20 });
+            const response = await fetch(`/api/recordings/${encodeURIComponent(this.filename)}/segments/search?${params}`);
+            const data = await response.json();
+            this.renderResults(data.success ? data.matches : [], data.total || 0);
+        } catch (error) {
+            console.error('Error al buscar en la transcripción:', error);
+        }
+    }
+
+    renderResults(matches, total) {
+        const fragment = document.createDocumentFragment();
+        if (!matches.length) {
+            const empty = document.createElement('div');
+            empty.className = 'list-group-item text-muted';
+            empty.textContent = 'La frase no aparece en la transcripción';
+            fragment.appendChild(empty);
+        }
+        matches.forEach((match) => {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action';
+            item.dataset.time = match.time;
+
+            const time = document.createElement('strong');
+            time.className = 'me-2';
+            time.textContent = app.formatTime(Math.floor(match.time));
+            item.appendChild(time);
+            item.appendChild(document.createTextNode(match.segment.text));
+            fragment.appendChild(item);
+        });
+        if (total > matches.length) {
+            const more = document.createElement('div');
+            more.className = 'list-group-item text-muted';
+            more.textContent = `Y ${total - matches.length} apariciones más`;
+            fragment.appendChild(more);
+        }
+        this.resultsElement.replaceChildren(fragment);
+    }
+
+    seek(time) {
+        this.audioElement.currentTime = time;
+        if (!this.window || time < this.window.from || time > this.window.to) {
+            this.fetchWindow(time);
+        }
+        this.highlight(time);
+    }
+}
+
 // Clase para manejar el reproductor de audio en la página principal
 class AudioPlayer {
     constructor() {
         this.audioElement = null;
         this.playerSection = null;
         this.currentRecording = null;
+        this.timeline = null;
         
         this.initializeElements();
         this.setupEventListeners();
@@ -19,6 +202,12 @@ class AudioPlayer {
         this.projectNameSpan = document.getElementById('recordingProjectName');
         this.durationSpan = document.getElementById('recordingDuration');
         this.dateSpan = document.getElementById('recordingDate');
+
+        // Transcripción sincronizada (si la página tiene el panel)
+        const timelineContainer = document.getElementById('transcriptTimeline');
+        if (this.audioElement && timelineContainer) {
+            this.timeline = new TranscriptTimeline(this.audioElement, timelineContainer);
+        }
     }
 
     setupEventListeners() {
@@ -51,6 +240,9 @@ class AudioPlayer {
         // Actualizar información de la grabación
         this.updateRecordingInfo(recordingInfo);
         
+        // Segmentos de la transcripción, si ya tiene marcas de tiempo
+        this.loadTranscript();
+        
         // Mostrar la sección del reproductor
         this.playerSection.style.display = 'block';
         
@@ -77,6 +269,10 @@ class AudioPlayer {
             this.audioElement.src = '';
         }
         
+        if (this.timeline) {
+            this.timeline.load(null);
+        }
+        
         this.currentRecording = null;
     }
 
@@ -197,6 +393,13 @@ class AudioPlayer {
         }
     }
 
+    loadTranscript() {
+        // Volver a pedir los segmentos (por ejemplo, al terminar una transcripción)
+        if (this.timeline && this.currentRecording) {
+            this.timeline.load(this.currentRecording.filename);
+        }
+    }
+
     // Método para obtener información del audio actual
     getCurrentRecording() {
         return this.currentRecording;
@@ -1,3 +1,6 @@
+// Tamaño aproximado de cada parte enviada durante la grabación
+const UPLOAD_CHUNK_BYTES = 256 * 1024;
+
 // Clase para manejar la grabación de audio
 class AudioRecorder {
     constructor() {
@@ -7,6 +10,7 @@ class AudioRecorder {
         this.audioStream = null;
         this.recordingStartTime = null;
         this.recordingDuration = 0;
+        this.upload = null;
         
         this.initializeElements();
         this.setupEventListeners();
@@ -107,6 +111,9 @@ class AudioRecorder {
                 throw new Error(response.error || 'Error al iniciar la grabación');
             }
 
+            // Iniciar la subida reanudable para enviar el audio mientras se graba
+            this.upload = await this.initiateUpload();
+
             // Iniciar grabación local
             this.audioChunks = [];
             this.recordingStartTime = Date.now();
@@ -121,6 +128,7 @@ class AudioRecorder {
                 console.log('Datos de audio recibidos:', event.data.size, 'bytes');
                 if (event.data.size > 0) {
                     this.audioChunks.push(event.data);
+                    this.queueUploadData(event.data);
                 }
             };
 
@@ -140,6 +148,11 @@ class AudioRecorder {
 
             console.log('Iniciando MediaRecorder...');
             this.mediaRecorder.start(1000); // Capturar datos cada segundo
+
+            // Transcribir por segmentos mientras se graba
+            if (window.liveTranscription && window.liveTranscription.isEnabled()) {
+                window.liveTranscription.start(this.audioStream);
+            }
             
             this.updateUI();
             this.updateButtons();
@@ -179,6 +192,11 @@ class AudioRecorder {
             this.recordingDuration = Date.now() - this.recordingStartTime;
             this.updateButtons();
 
+            // Enviar el último segmento de la transcripción en vivo
+            if (window.liveTranscription) {
+                window.liveTranscription.stop();
+            }
+
             // Detener visualización de audio
             if (window.audioVisualizer) {
                 window.audioVisualizer.stop();
@@ -201,17 +219,15 @@ class AudioRecorder {
             const audioBlob = new Blob(this.audioChunks, { type: 'audio/webm' });
             console.log('Tamaño del blob:', audioBlob.size, 'bytes');
             
-            // Enviar audio al servidor
-            const formData = new FormData();
-            formData.append('audio', audioBlob, 'recording.webm');
-
-            console.log('Enviando audio al servidor...');
-            const response = await fetch('/api/save-audio', {
-                method: 'POST',
-                body: formData
-            });
+            // La mayor parte del audio ya está en el servidor: solo falta la última parte
+            let result = null;
+            if (this.upload) {
+                result = await this.finalizeUpload(audioBlob);
+            }
 
-            const result = await response.json();
+            if (!result || !result.success) {
+                result = await this.saveAudioDirect(audioBlob);
+            }
             console.log('Respuesta del servidor:', result);
 
             if (result.success) {
@@ -255,9 +271,133 @@ class AudioRecorder {
         } catch (error) {
             console.error('Error al procesar grabación:', error);
             app.showNotification('Error al procesar la grabación: ' + error.message, 'error');
+        } finally {
+            // Cerrar la transcripción en vivo cuando el audio ya tiene su nombre definitivo
+            if (window.liveTranscription) {
+                window.liveTranscription.finish();
+            }
         }
     }
 
+    csrfHeaders(headers = {}) {
+        const csrfToken = document.querySelector('meta[name="csrf-token"]')?.getAttribute('content');
+        if (csrfToken) {
+            headers['X-CSRFToken'] = csrfToken;
+        }
+        return headers;
+    }
+
+    async initiateUpload() {
+        // Iniciar una subida reanudable; si falla se usará la subida completa al final
+        try {
+            const response = await app.makeRequest('/api/uploads', {
+                method: 'POST',
+                body: JSON.stringify({ content_type: 'audio/webm' })
+            });
+            return {
+                id: response.upload_id,
+                chunkUrl: response.chunk_url,
+                pending: [],
+                pendingBytes: 0,
+                offset: 0,
+                sent: [],
+                queue: Promise.resolve()
+            };
+        } catch (error) {
+            console.warn('No se pudo iniciar la subida reanudable:', error);
+            return null;
+        }
+    }
+
+    queueUploadData(data) {
+        if (!this.upload) return;
+
+        this.upload.pending.push(data);
+        this.upload.pendingBytes += data.size;
+        if (this.upload.pendingBytes >= UPLOAD_CHUNK_BYTES) {
+            this.flushUpload();
+        }
+    }
+
+    flushUpload() {
+        // Enviar lo acumulado como una parte numerada, en orden
+        const upload = this.upload;
+        if (!upload || upload.pendingBytes === 0) return;
+
+        const chunk = {
+            index: upload.sent.length,
+            offset: upload.offset,
+            blob: new Blob(upload.pending, { type: 'audio/webm' })
+        };
+        upload.sent.push(chunk);
+        upload.offset += chunk.blob.size;
+        upload.pending = [];
+        upload.pendingBytes = 0;
+
+        upload.queue = upload.queue.then(() => this.sendChunk(chunk));
+    }
+
+    async sendChunk(chunk, attempts = 3) {
+        for (let attempt = 1; attempt <= attempts; attempt++) {
+            try {
+                const response = await fetch(this.upload.chunkUrl + chunk.index, {
+                    method: 'PUT',
+                    headers: this.csrfHeaders({
+                        'Content-Type': 'application/octet-stream',
+                        'X-Chunk-Offset': String(chunk.offset)
+                    }),
+                    body: chunk.blob
+                });
+                if (response.ok) return true;
+            } catch (error) {
+                console.warn(`Error al enviar la parte ${chunk.index} (intento ${attempt}):`, error);
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * attempt));
+        }
+        return false;
+    }
+
+    async finalizeUpload(audioBlob) {
+        try {
+            this.flushUpload();
+            await this.upload.queue;
+
+            // Reenviar las partes que el servidor no tenga
+            const status = await app.makeRequest(`/api/uploads/${this.upload.id}`, { method: 'GET' });
+            for (const chunk of this.upload.sent) {
+                const end = chunk.offset + chunk.blob.size;
+                const covered = status.ranges.some(([start, stop]) => start <= chunk.offset && end <= stop);
+                if (!covered) {
+                    await this.sendChunk(chunk);
+                }
+            }
+
+            const digest = await crypto.subtle.digest('SHA-256', await audioBlob.arrayBuffer());
+            const sha256 = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+
+            return await app.makeRequest(`/api/uploads/${this.upload.id}/finalize`, {
+                method: 'POST',
+                body: JSON.stringify({ size: audioBlob.size, sha256 })
+            });
+        } catch (error) {
+            console.warn('No se pudo finalizar la subida reanudable:', error);
+            return null;
+        } finally {
+            this.upload = null;
+        }
+    }
+
+    async saveAudioDirect(audioBlob) {
+        // Enviar el audio completo como cuerpo crudo para que se guarde en streaming
+        console.log('Enviando audio al servidor...');
+        const response = await fetch('/api/save-audio', {
+            method: 'POST',
+            headers: this.csrfHeaders({ 'Content-Type': audioBlob.type }),
+            body: audioBlob
+        });
+        return await response.json();
+    }
+
     updateUI() {
         if (this.statusElement) {
             this.statusElement.style.display = 'block';
@@ -17,8 +17,12 @@ function playRecording(filename) {
     document.getElementById('modalDate').textContent = formatDate(recording.created_at);
     
     // Configurar el reproductor de audio
+    // (si es la misma grabación se conserva lo ya descargado en lugar de volver a pedirla)
     const audioPlayer = document.getElementById('audioPlayer');
-    audioPlayer.src = `/uploads/${filename}`;
+    const audioUrl = `/uploads/${encodeURIComponent(filename)}`;
+    if (audioPlayer.getAttribute('src') !== audioUrl) {
+        audioPlayer.src = audioUrl;
+    }
     
     // Mostrar el modal
     const modal = new bootstrap.Modal(document.getElementById('audioModal'));
@@ -97,6 +101,9 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // Dibujar las formas de onda precalculadas en el servidor
+    loadWaveforms();
+
     // Configurar tooltips para los botones de acción
     const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
     tooltipTriggerList.map(function (tooltipTriggerEl) {
@@ -104,6 +111,53 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 });
 
+// Pedir en una sola petición los picos de todas las grabaciones de la página
+async function loadWaveforms() {
+    const rows = document.querySelectorAll('tr[data-filename]');
+    if (!rows.length) return;
+    
+    const canvas = rows[0].querySelector('canvas.recording-waveform');
+    const params = new URLSearchParams({ points: canvas ? canvas.width : 160 });
+    rows.forEach(row => params.append('files', row.dataset.filename));
+    
+    try {
+        const response = await fetch(`/api/waveforms?${params}`);
+        const data = await response.json();
+        if (!data.success) return;
+        
+        rows.forEach(row => {
+            const waveform = data.waveforms[row.dataset.filename];
+            if (!waveform) return;
+            
+            const durationBadge = row.querySelector('.recording-duration');
+            if (durationBadge) {
+                durationBadge.textContent = `${waveform.duration.toFixed(1)}s`;
+            }
+            drawWaveform(row.querySelector('canvas.recording-waveform'), waveform.peaks);
+        });
+    } catch (error) {
+        console.error('Error al cargar las formas de onda:', error);
+    }
+}
+
+// Dibujar pares (mín, máx) en int8 como barras verticales centradas
+function drawWaveform(canvas, peaks) {
+    if (!canvas || !peaks.length) return;
+    
+    const context = canvas.getContext('2d');
+    const count = peaks.length / 2;
+    const barWidth = canvas.width / count;
+    const middle = canvas.height / 2;
+    
+    context.clearRect(0, 0, canvas.width, canvas.height);
+    context.fillStyle = '#0d6efd';
+    for (let i = 0; i < count; i++) {
+        const top = middle - (peaks[2 * i + 1] / 127) * middle;
+        const bottom = middle - (peaks[2 * i] / 127) * middle;
+        context.fillRect(i * barWidth, top, Math.max(1, barWidth), Math.max(1, bottom - top));
+    }
+}
+
 // Función para buscar grabaciones
 function searchRecordings(query) {
     const rows = document.querySelectorAll('tbody tr');
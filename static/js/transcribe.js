@@ -86,14 +86,20 @@ async function startTranscription() {
             openai_api_key: openaiApiKey
         };
         
-        updateTranscribeProgress(20, 'Subiendo archivo a S3...');
+        updateTranscribeProgress(20, 'Enviando solicitud de transcripción...');
         
-        // Llamar a la API de transcripción
-        const response = await app.makeRequest('/api/transcribe', {
+        // Encolar la transcripción y esperar a que termine
+        const job = await app.makeRequest('/api/transcribe', {
             method: 'POST',
             body: JSON.stringify(requestData)
         });
         
+        const response = await app.waitForJob(job.job_id, (status) => {
+            if (status.progress) {
+                updateTranscribeProgress(status.status === 'running' ? 60 : 30, status.progress + '...');
+            }
+        });
+        
         updateTranscribeProgress(100, 'Transcripción completada');
         
         if (response.success) {
@@ -218,25 +224,14 @@ async function transcribeDirect(filename, projectName) {
     app.showNotification('Iniciando transcripción directa...', 'info');
     
     try {
-        // Obtener el archivo desde el servidor
-        const response = await fetch(`/uploads/${filename}`);
-        if (!response.ok) {
-            throw new Error('No se pudo obtener el archivo de audio');
-        }
-        
-        const audioBlob = await response.blob();
-        
-        // Crear FormData para enviar el archivo
-        const formData = new FormData();
-        formData.append('audio', audioBlob, filename);
-        
-        // Llamar a la API de transcripción directa
-        const transcribeResponse = await fetch('/api/transcribe-direct', {
+        // La grabación ya está en el servidor: se transcribe por referencia, sin descargarla ni volver a subirla
+        const accepted = await app.makeRequest('/api/transcribe-direct', {
             method: 'POST',
-            body: formData
+            body: JSON.stringify({ filename: filename })
         });
         
-        const result = await transcribeResponse.json();
+        // Esperar a que el trabajo en segundo plano termine
+        const result = await app.waitForJob(accepted.job_id);
         
         if (result.success) {
             // Mostrar resultado en un modal
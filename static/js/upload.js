@@ -5,6 +5,8 @@ class CloudUploader {
         this.currentProvider = null;
         this.uploadProgress = 0;
         this.isUploading = false;
+        this.maxParallelFiles = 3;
+        this.pollInterval = 1000;
         
         this.initializeElements();
         this.setupEventListeners();
@@ -216,10 +218,25 @@ class CloudUploader {
         this.showProgress();
 
         try {
-            for (let i = 0; i < this.selectedFiles.length; i++) {
-                const file = this.selectedFiles[i];
-                await this.uploadFile(file, i + 1, this.selectedFiles.length);
-            }
+            // Varios archivos a la vez; el servidor además envía cada archivo por partes en paralelo
+            const files = [...this.selectedFiles];
+            const totalBytes = files.reduce((sum, file) => sum + file.size, 0) || 1;
+            const uploadedBytes = new Map();
+            const report = (file, bytes, text) => {
+                uploadedBytes.set(file, bytes);
+                const done = [...uploadedBytes.values()].reduce((sum, value) => sum + value, 0);
+                this.updateProgress((done / totalBytes) * 100, text);
+            };
+
+            let next = 0;
+            const worker = async () => {
+                while (next < files.length) {
+                    const file = files[next++];
+                    await this.uploadFile(file, (bytes, text) => report(file, bytes, text));
+                }
+            };
+            const workers = Array.from({ length: Math.min(this.maxParallelFiles, files.length) }, worker);
+            await Promise.all(workers);
 
             app.showNotification('Todos los archivos se subieron correctamente', 'success');
             this.resetUpload();
@@ -233,27 +250,47 @@ class CloudUploader {
         }
     }
 
-    async uploadFile(file, current, total) {
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('provider', this.currentProvider);
-        formData.append('credentials', JSON.stringify(this.getCredentials()));
+    async uploadFile(file, onProgress) {
+        // El archivo se envía como cuerpo crudo para que el servidor lo suba por partes
+        const uploadId = this.generateUploadId();
+        const params = new URLSearchParams({
+            provider: this.currentProvider,
+            filename: file.name,
+            upload_id: uploadId
+        });
 
         const xhr = new XMLHttpRequest();
+        let sentBytes = 0;
+        let cloudProgress = null;
+        const report = () => {
+            // La barra avanza con lo que ya confirmó el proveedor, no solo con lo enviado al servidor
+            const bytes = cloudProgress ? cloudProgress.uploaded_bytes : 0;
+            const sent = Math.round((sentBytes / (file.size || 1)) * 100);
+            const speed = cloudProgress ? `, ${cloudProgress.mb_per_second} MB/s a la nube` : '';
+            onProgress(Math.min(bytes, file.size), `Subiendo ${file.name} (${sent}% enviado${speed})...`);
+        };
+        const poller = setInterval(async () => {
+            const progress = await this.fetchCloudProgress(uploadId);
+            if (progress) {
+                cloudProgress = progress;
+                report();
+            }
+        }, this.pollInterval);
 
         return new Promise((resolve, reject) => {
             xhr.upload.addEventListener('progress', (e) => {
                 if (e.lengthComputable) {
-                    const percentComplete = (e.loaded / e.total) * 100;
-                    const overallProgress = ((current - 1) / total) * 100 + (percentComplete / total);
-                    this.updateProgress(overallProgress, `Subiendo ${file.name}...`);
+                    sentBytes = e.loaded;
+                    report();
                 }
             });
 
             xhr.addEventListener('load', () => {
+                clearInterval(poller);
                 if (xhr.status === 200) {
                     const response = JSON.parse(xhr.responseText);
                     if (response.success) {
+                        onProgress(file.size, `${file.name} subido`);
                         resolve(response);
                     } else {
                         reject(new Error(response.error));
@@ -264,14 +301,39 @@ class CloudUploader {
             });
 
             xhr.addEventListener('error', () => {
+                clearInterval(poller);
                 reject(new Error('Error de red'));
             });
 
-            xhr.open('POST', '/api/upload-to-cloud');
-            xhr.send(formData);
+            xhr.open('POST', `/api/upload-to-cloud?${params}`);
+            xhr.setRequestHeader('Content-Type', file.type || 'application/octet-stream');
+            xhr.setRequestHeader('X-Cloud-Credentials', JSON.stringify(this.getCredentials()));
+            const csrfToken = document.querySelector('meta[name="csrf-token"]')?.getAttribute('content');
+            if (csrfToken) {
+                xhr.setRequestHeader('X-CSRFToken', csrfToken);
+            }
+            xhr.send(file);
         });
     }
 
+    async fetchCloudProgress(uploadId) {
+        try {
+            const response = await fetch(`/api/cloud-uploads/${uploadId}`);
+            if (!response.ok) return null;
+            const data = await response.json();
+            return data.success ? data.upload : null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    generateUploadId() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID().replace(/-/g, '');
+        }
+        return `${Date.now().toString(36)}${Math.random().toString(36).slice(2, 12)}`;
+    }
+
     validateCredentials() {
         if (this.currentProvider === 'aws-s3') {
             const accessKey = document.getElementById('awsAccessKey')?.value;
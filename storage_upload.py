@@ -0,0 +1,415 @@
+"""
+Subidas a S3 y Google Cloud Storage por partes en paralelo
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import base64
+import hashlib
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from scheduler import RETRYABLE_STATUS
+
+# Tamaño mínimo de parte que admite S3 en una subida multiparte (salvo la última)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Máximo de objetos que Google Cloud Storage acepta en una composición
+GCS_MAX_COMPOSE = 32
+
+# Errores de S3 que indican datos dañados en tránsito: se reenvía la parte
+CORRUPTION_CODES = ('BadDigest', 'InvalidDigest', 'XAmzContentSHA256Mismatch')
+
+
+def is_retryable(error):
+    """Indica si un error al enviar una parte es transitorio y merece reintento"""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        code = response.get('Error', {}).get('Code')
+        if code in CORRUPTION_CODES:
+            return True
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    else:
+        status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+
+    if type(error).__name__ == 'DataCorruption':
+        return True
+    if isinstance(status, int) and status < 500 and status not in RETRYABLE_STATUS:
+        return False
+    return True
+
+
+def call_with_retries(fn, max_retries=3, base_delay=0.5, on_retry=None):
+    """Ejecutar ``fn()`` reintentando los errores transitorios con backoff exponencial y jitter"""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            if on_retry:
+                on_retry(e)
+            time.sleep(random.uniform(0, base_delay * 2 ** attempt))
+            attempt += 1
+
+
+def content_md5(data):
+    """MD5 en base64, como lo esperan la cabecera ``Content-MD5`` y ``Blob.md5_hash``"""
+    return base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+
+def s3_object_exists(s3_client, bucket, key):
+    """Comprobar con una petición HEAD si ya existe un objeto en S3"""
+    from botocore.exceptions import ClientError
+
+    try:
+        s3_client.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 404:
+            return False
+        raise
+
+
+class PartUploader:
+    """Envía partes numeradas en paralelo con un máximo de ``concurrency`` en vuelo.
+
+    ``submit`` bloquea cuando ya hay ``concurrency`` partes enviándose, de
+    modo que la memoria usada queda acotada aunque el origen sea más rápido
+    que la red. Cada parte se reintenta por separado; el primer error
+    definitivo se relanza en la siguiente llamada a ``submit`` o ``results``.
+    """
+
+    def __init__(self, send_part, concurrency=4, max_retries=3, base_delay=0.5, on_part=None):
+        self.send_part = send_part
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.on_part = on_part
+        self.retries = 0
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='upload-part')
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def submit(self, number, data):
+        self._raise_failed()
+        self._slots.acquire()
+        try:
+            self._futures.append(self._executor.submit(self._send, number, data))
+        except Exception:
+            self._slots.release()
+            raise
+
+    def results(self):
+        """Esperar todas las partes y devolver sus resultados en orden de envío"""
+        try:
+            return [future.result() for future in self._futures]
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _send(self, number, data):
+        try:
+            result = call_with_retries(
+                lambda: self.send_part(number, data),
+                max_retries=self.max_retries,
+                base_delay=self.base_delay,
+                on_retry=self._count_retry
+            )
+            if self.on_part:
+                self.on_part(len(data))
+            return result
+        finally:
+            self._slots.release()
+
+    def _count_retry(self, error):
+        with self._lock:
+            self.retries += 1
+
+    def _raise_failed(self):
+        for future in self._futures:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+
+class S3MultipartUpload:
+    """Destino de streaming que sube a S3 por partes enviadas en paralelo.
+
+    Cada parte lleva su ``Content-MD5`` para que S3 rechace los datos dañados
+    y la parte se reenvíe. En memoria hay como mucho ``concurrency + 1``
+    partes. Si el contenido completo cabe en una parte se usa ``put_object``.
+    """
+
+    def __init__(self, s3_client, bucket, key, content_type, part_size=8 * 1024 * 1024,
+                 concurrency=4, max_retries=3, on_progress=None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type
+        self.part_size = max(part_size, S3_MIN_PART_SIZE)
+        self.max_retries = max_retries
+        self.on_progress = on_progress
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = 0
+        self._uploader = PartUploader(self._send_part, concurrency, max_retries, on_part=on_progress)
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+
+    def finish(self):
+        if self._upload_id is None:
+            self._uploader.close()
+            body = bytes(self._buffer)
+            response = call_with_retries(lambda: self.s3_client.put_object(
+                Bucket=self.bucket, Key=self.key, Body=body,
+                ContentType=self.content_type, ContentMD5=content_md5(body)
+            ), self.max_retries)
+            if self.on_progress:
+                self.on_progress(len(body))
+        else:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+            parts = self._uploader.results()
+            response = call_with_retries(lambda: self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                MultipartUpload={'Parts': parts}
+            ), self.max_retries)
+        self._buffer = bytearray()
+        return {
+            's3_key': self.key,
+            'etag': response.get('ETag', '').strip('"'),
+            'parts': max(1, self._parts),
+            'retries': self._uploader.retries
+        }
+
+    def abort(self):
+        self._uploader.close()
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key,
+                                                  UploadId=self._upload_id)
+        self._buffer = bytearray()
+
+    def _submit(self, data):
+        if self._upload_id is None:
+            response = call_with_retries(lambda: self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            ), self.max_retries)
+            self._upload_id = response['UploadId']
+        self._parts += 1
+        self._uploader.submit(self._parts, data)
+
+    def _send_part(self, number, data):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+            PartNumber=number, Body=data, ContentMD5=content_md5(data)
+        )
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+
+class GCSComposeUpload:
+    """Destino de streaming que sube a Google Cloud Storage por partes en paralelo.
+
+    Cada parte se sube como un objeto temporal con verificación MD5 y al
+    terminar se componen en el objeto final (de ``GCS_MAX_COMPOSE`` en
+    ``GCS_MAX_COMPOSE``) y se borran. Si todo cabe en una parte se sube
+    directamente al objeto final.
+    """
+
+    def __init__(self, bucket, name, content_type, part_size=16 * 1024 * 1024,
+                 concurrency=4, max_retries=3, on_progress=None):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = content_type
+        self.part_size = part_size
+        self.max_retries = max_retries
+        self.on_progress = on_progress
+        self._prefix = f"{name}.parts/{uuid.uuid4().hex}"
+        self._buffer = bytearray()
+        self._blobs = []
+        self._uploader = PartUploader(self._send_part, concurrency, max_retries, on_part=on_progress)
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+
+    def finish(self):
+        if not self._blobs:
+            self._uploader.close()
+            body = bytes(self._buffer)
+            call_with_retries(lambda: self._upload(self.bucket.blob(self.name), body), self.max_retries)
+            if self.on_progress:
+                self.on_progress(len(body))
+        else:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+            self._uploader.results()
+            self._compose()
+            self._delete_parts()
+        self._buffer = bytearray()
+        return {
+            'gcs_path': self.name,
+            'parts': max(1, len(self._blobs)),
+            'retries': self._uploader.retries
+        }
+
+    def abort(self):
+        self._uploader.close()
+        self._delete_parts()
+        self._buffer = bytearray()
+
+    def _submit(self, data):
+        blob = self.bucket.blob(f"{self._prefix}/{len(self._blobs) + 1:05d}")
+        self._blobs.append(blob)
+        self._uploader.submit(len(self._blobs), data)
+
+    def _send_part(self, number, data):
+        self._upload(self._blobs[number - 1], data)
+
+    def _upload(self, blob, data):
+        # Con checksum='md5' la librería compara el MD5 que calcula el servidor
+        blob.upload_from_string(data, content_type=self.content_type, checksum='md5')
+
+    def _compose(self):
+        target = self.bucket.blob(self.name)
+        target.content_type = self.content_type
+        sources = list(self._blobs)
+        first, sources = sources[:GCS_MAX_COMPOSE], sources[GCS_MAX_COMPOSE:]
+        call_with_retries(lambda: target.compose(first), self.max_retries)
+        # El objeto ya compuesto cuenta como una de las fuentes de la siguiente composición
+        while sources:
+            group, sources = sources[:GCS_MAX_COMPOSE - 1], sources[GCS_MAX_COMPOSE - 1:]
+            call_with_retries(lambda: target.compose([target] + group), self.max_retries)
+
+    def _delete_parts(self):
+        if not self._blobs:
+            return
+        with ThreadPoolExecutor(max_workers=self._uploader.concurrency) as executor:
+            for blob, error in zip(self._blobs, executor.map(_delete_quietly, self._blobs)):
+                if error:
+                    print(f"Error al borrar parte temporal {blob.name}: {error}")
+
+
+def _delete_quietly(blob):
+    try:
+        blob.delete()
+    except Exception as e:
+        # Puede no existir si la subida falló antes de enviarla
+        if getattr(e, 'code', None) != 404:
+            return e
+    return None
+
+
+class ProgressSink:
+    """Destino de streaming que solo informa de los bytes recibidos"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, data):
+        self.callback(len(data))
+
+    def finish(self):
+        return {}
+
+    def abort(self):
+        pass
+
+
+class UploadProgress:
+    """Progreso de las subidas a la nube, consultable por ``upload_id``.
+
+    Distingue los bytes recibidos del navegador de los confirmados por el
+    proveedor. Las subidas terminadas se conservan ``ttl_seconds`` para que
+    el cliente pueda leer el estado final.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_entries=500):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def start(self, upload_id, filename, provider, total_bytes=None):
+        with self._lock:
+            self._trim()
+            self._uploads[upload_id] = {
+                'upload_id': upload_id,
+                'filename': filename,
+                'provider': provider,
+                'state': 'uploading',
+                'total_bytes': total_bytes,
+                'received_bytes': 0,
+                'uploaded_bytes': 0,
+                'error': None,
+                'started': time.monotonic(),
+                'finished': None
+            }
+
+    def received(self, upload_id, amount):
+        self._add(upload_id, 'received_bytes', amount)
+
+    def uploaded(self, upload_id, amount):
+        self._add(upload_id, 'uploaded_bytes', amount)
+
+    def finish(self, upload_id, error=None):
+        with self._lock:
+            entry = self._uploads.get(upload_id)
+            if entry is None:
+                return
+            entry['state'] = 'failed' if error else 'completed'
+            entry['error'] = str(error) if error else None
+            entry['finished'] = time.monotonic()
+            if not error:
+                entry['total_bytes'] = entry['uploaded_bytes']
+
+    def get(self, upload_id):
+        with self._lock:
+            entry = self._uploads.get(upload_id)
+            if entry is None:
+                return None
+            entry = dict(entry)
+
+        elapsed = (entry.pop('finished') or time.monotonic()) - entry.pop('started')
+        total = entry['total_bytes']
+        entry['percent'] = round(min(100.0, entry['uploaded_bytes'] * 100 / total), 1) if total else None
+        entry['elapsed_seconds'] = round(elapsed, 2)
+        entry['mb_per_second'] = round(entry['uploaded_bytes'] / 1024 / 1024 / elapsed, 2) if elapsed else 0
+        return entry
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for entry in self._uploads.values() if entry['state'] == 'uploading')
+
+    def _add(self, upload_id, field, amount):
+        with self._lock:
+            entry = self._uploads.get(upload_id)
+            if entry is not None:
+                entry[field] += amount
+
+    def _trim(self):
+        now = time.monotonic()
+        expired = [
+            upload_id for upload_id, entry in self._uploads.items()
+            if entry['finished'] is not None and now - entry['finished'] > self.ttl_seconds
+        ]
+        for upload_id in expired:
+            del self._uploads[upload_id]
+        while len(self._uploads) >= self.max_entries:
+            del self._uploads[next(iter(self._uploads))]
@@ -0,0 +1,81 @@
+"""
+Ingesta en streaming: copia el cuerpo de la petición a varios destinos en una pasada
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import hashlib
+import os
+
+# Tamaño de bloque leído del cuerpo de la petición
+CHUNK_SIZE = 1024 * 1024
+
+
+class FileSink:
+    """Escribe en un archivo temporal y lo mueve a su destino al terminar"""
+
+    def __init__(self, path):
+        self.path = path
+        self._temp_path = f"{path}.part"
+        self._file = open(self._temp_path, 'wb')
+
+    def write(self, data):
+        self._file.write(data)
+
+    def finish(self):
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+        return {'path': self.path}
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.unlink(self._temp_path)
+
+
+class HashSink:
+    """Calcula el SHA-256 del contenido"""
+
+    def __init__(self):
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self._digest.update(data)
+
+    def finish(self):
+        return {'sha256': self._digest.hexdigest()}
+
+    def abort(self):
+        pass
+
+
+def stream_to_sinks(stream, sinks, chunk_size=CHUNK_SIZE):
+    """Leer ``stream`` por bloques y escribir cada bloque en todos los destinos.
+
+    Devuelve el número de bytes copiados y los resultados de cada destino.
+    Si algo falla se cancelan todos los destinos y se relanza la excepción.
+    """
+    total = 0
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+            for sink in sinks:
+                sink.write(chunk)
+
+        results = {}
+        for sink in sinks:
+            results.update(sink.finish())
+        return total, results
+
+    except Exception:
+        for sink in sinks:
+            try:
+                sink.abort()
+            except Exception as e:
+                print(f"Error al cancelar destino de streaming: {e}")
+        raise
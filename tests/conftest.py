@@ -0,0 +1,15 @@
+"""
+Configuración común de las pruebas: la aplicación se importa contra un
+directorio temporal y sin mantenimiento en segundo plano.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+os.environ['UPLOAD_FOLDER'] = tempfile.mkdtemp(prefix='grabador_tests_')
+os.environ['MAINTENANCE_INTERVAL_MINUTES'] = '0'
+os.environ['TRANSCRIPTION_BACKEND'] = 'stub'
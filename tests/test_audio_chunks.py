@@ -0,0 +1,88 @@
+"""
+Segmentación de WAV largos y unión de transcripciones con un cliente simulado
+"""
+
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_chunks import plan_wav_chunks, merge_transcripts
+
+RATE = 1000
+
+
+def write_wav(path, seconds):
+    """WAV mono en el que cada segundo tiene una amplitud distinta (el segundo ``n`` vale ``n + 1``)"""
+    samples = np.repeat(np.arange(1, seconds + 1, dtype=np.int16) * 100, RATE)
+    with wave.open(str(path), 'wb') as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(RATE)
+        writer.writeframes(samples.tobytes())
+    return str(path)
+
+
+class StubTranscriptions:
+    """Devuelve una palabra ``sN`` por cada segundo presente en el audio recibido"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, model, file, response_format='text', **options):
+        self.calls += 1
+        with wave.open(io.BytesIO(file.read()), 'rb') as reader:
+            samples = np.frombuffer(reader.readframes(reader.getnframes()), dtype=np.int16)
+        seconds = [int(value) // 100 - 1 for value in samples[np.r_[True, np.diff(samples) != 0]]]
+        return ' '.join(f"s{second}" for second in seconds)
+
+
+class StubClient:
+    api_key = 'stub'
+
+    def __init__(self):
+        self.audio = type('Audio', (), {})()
+        self.audio.transcriptions = StubTranscriptions()
+
+
+@pytest.mark.parametrize('chunk_seconds', [5, 8, 10, 20, 30])
+def test_plan_cuts_advance_and_cover_the_file(tmp_path, chunk_seconds):
+    path = write_wav(tmp_path / 'largo.wav', 60)
+
+    chunks = plan_wav_chunks(path, chunk_seconds=chunk_seconds, overlap_seconds=1)
+
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == 60 * RATE
+    ends = [end for _, end in chunks]
+    assert ends == sorted(set(ends))
+    for (_, previous_end), (start, _) in zip(chunks, chunks[1:]):
+        assert start == previous_end - RATE
+
+
+def test_short_file_is_not_split(tmp_path):
+    path = write_wav(tmp_path / 'corto.wav', 12)
+    assert plan_wav_chunks(path, chunk_seconds=10, overlap_seconds=1) is None
+
+
+def test_transcribe_path_joins_chunks_without_overlap(tmp_path, monkeypatch):
+    import app
+
+    monkeypatch.setitem(app.app.config, 'TRANSCRIBE_CHUNK_SECONDS', 10)
+    monkeypatch.setitem(app.app.config, 'TRANSCRIBE_CHUNK_OVERLAP', 2)
+    path = write_wav(tmp_path / 'reunion.wav', 60)
+    client = StubClient()
+
+    transcript = app.transcribe_path(client, path, workers=3)
+
+    assert client.audio.transcriptions.calls > 1
+    assert transcript == ' '.join(f"s{second}" for second in range(60))
+
+
+def test_merge_transcripts_removes_repeated_words():
+    parts = ['uno dos tres cuatro', 'Tres, cuatro cinco seis', '', 'cinco seis siete']
+    assert merge_transcripts(parts) == 'uno dos tres cuatro cinco seis siete'
+
+
+def test_merge_transcripts_keeps_short_coincidences():
+    assert merge_transcripts(['hola a', 'a todos']) == 'hola a a todos'
@@ -0,0 +1,73 @@
+"""
+Almacén por contenido: deduplicación, nombres con sufijo y liberación de blobs compartidos
+"""
+
+import os
+
+import pytest
+
+from blob_store import BlobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / 'blobs'))
+
+
+def add(store, name, content):
+    path = store.temp_path('.wav')
+    with open(path, 'wb') as f:
+        f.write(content)
+    return store.add_file(path, name)
+
+
+def test_same_content_is_stored_once(store):
+    first = add(store, 'a.wav', b'audio')
+    second = add(store, 'b.wav', b'audio')
+
+    assert not first['deduplicated'] and second['deduplicated']
+    assert first['sha256'] == second['sha256']
+    assert store.path('a.wav') == store.path('b.wav')
+    assert store.stats()['saved_bytes'] == len(b'audio')
+    assert os.listdir(store.temp_folder) == []
+
+
+def test_name_collision_gets_a_suffix(store):
+    assert add(store, 'a.wav', b'uno')['name'] == 'a.wav'
+    assert add(store, 'a.wav', b'dos')['name'] == 'a_2.wav'
+    assert add(store, 'a.wav', b'tres')['name'] == 'a_3.wav'
+    # El mismo contenido con el mismo nombre reutiliza la entrada
+    assert add(store, 'a.wav', b'dos')['name'] == 'a_2.wav'
+    assert store.names('a*.wav') == ['a.wav', 'a_2.wav', 'a_3.wav']
+
+
+def test_shared_blob_is_freed_with_its_last_name(store):
+    add(store, 'a.wav', b'audio')
+    add(store, 'b.wav', b'audio')
+    blob = store.path('a.wav')
+
+    assert store.references('a.wav') == ['b.wav']
+    assert store.expire('a.wav', remote_url='s3://bucket/a') == 0
+    assert store.path('a.wav') is None
+    assert store.get('a.wav')['remote_url'] == 's3://bucket/a'
+    assert os.path.exists(blob)
+
+    assert store.expire('b.wav') == len(b'audio')
+    assert not os.path.exists(blob)
+    assert store.expire('b.wav') == 0
+
+
+def test_replace_keeps_shared_blob(store):
+    add(store, 'a.wav', b'original')
+    add(store, 'b.wav', b'original')
+    old_blob = store.path('a.wav')
+    path = store.temp_path('.wav')
+    with open(path, 'wb') as f:
+        f.write(b'normalizado')
+
+    replaced = store.replace('a.wav', path)
+    assert store.get('a.wav')['sha256'] == replaced['sha256']
+    assert os.path.exists(old_blob) and store.path('b.wav') == old_blob
+
+    with pytest.raises(KeyError):
+        store.replace('missing.wav', path)
@@ -0,0 +1,71 @@
+"""
+Recuperación de trabajos compartiendo el directorio de estado entre procesos
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+from jobs import JobQueue
+
+
+def write_job(folder, job_id, owner, heartbeat):
+    job = {'id': job_id, 'kind': 'demo', 'status': 'running', 'payload': {}, 'progress': None,
+           'result': None, 'error': None, 'created_at': '', 'updated_at': '', 'version': 0,
+           'owner': owner, 'heartbeat': heartbeat}
+    with open(os.path.join(folder, f"{job_id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+
+
+def test_recover_only_claims_abandoned_jobs(tmp_path):
+    host = socket.gethostname()
+    write_job(tmp_path, 'aa', {'host': host, 'pid': os.getpid()}, time.time())  # dueño vivo
+    write_job(tmp_path, 'bb', {'host': host, 'pid': 2 ** 22 + 1}, time.time())  # dueño muerto
+    write_job(tmp_path, 'cc', {'host': 'otro', 'pid': 1}, time.time() - 600)  # latido caducado
+    write_job(tmp_path, 'dd', {'host': 'otro', 'pid': 1}, time.time())  # otro host, latido reciente
+
+    ran = []
+    queue = JobQueue(str(tmp_path), lease_seconds=60)
+    queue.register('demo', lambda job_id, payload, secrets: ran.append(job_id) or {'success': True},
+                   resumable=True)
+    queue.recover()
+    for job_id in ('bb', 'cc'):
+        queue.wait(job_id, timeout=5)
+
+    assert sorted(ran) == ['bb', 'cc']
+    assert queue.get('aa')['status'] == 'running'
+    assert queue.get('dd')['status'] == 'running'
+    assert queue.get('bb')['owner']['pid'] == os.getpid()
+
+
+def test_wait_for_job_owned_by_another_queue(tmp_path):
+    release = threading.Event()
+    owner = JobQueue(str(tmp_path))
+    owner.register('demo', lambda job_id, payload, secrets: release.wait(5) and {'success': True})
+    other = JobQueue(str(tmp_path), poll_seconds=0.05)
+    job = owner.submit('demo', {})
+    running = owner.wait(job['id'], timeout=5, since_version=job['version'])
+
+    start = time.monotonic()
+    unchanged = other.wait(job['id'], timeout=0.3, since_version=running['version'])
+    assert time.monotonic() - start >= 0.3
+    assert unchanged['status'] == 'running'
+
+    release.set()
+    start = time.monotonic()
+    finished = other.wait(job['id'], timeout=5)
+    assert time.monotonic() - start < 1
+    assert finished['status'] == 'completed'
+
+
+def test_reclaims_jobs_abandoned_after_first_recover(tmp_path):
+    ran = threading.Event()
+    queue = JobQueue(str(tmp_path), lease_seconds=0.3, poll_seconds=0.05)
+    queue.register('demo', lambda job_id, payload, secrets: ran.set() or {'success': True}, resumable=True)
+    queue.recover()
+
+    write_job(tmp_path, 'ee', {'host': socket.gethostname(), 'pid': 2 ** 22 + 1}, time.time())
+    assert ran.wait(5)
+    assert queue.wait('ee', timeout=5)['status'] == 'completed'
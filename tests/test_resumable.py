@@ -0,0 +1,75 @@
+"""
+Subidas reanudables: límites de las partes y verificación al finalizar
+"""
+
+import hashlib
+import io
+
+import pytest
+
+from resumable import ResumableUploads, UploadError, UploadTooLarge
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    return ResumableUploads(str(tmp_path / 'resumable'), max_chunk_bytes=4096, max_upload_bytes=16384)
+
+
+def test_chunks_in_any_order_finalize(uploads, tmp_path):
+    upload = uploads.initiate('a.wav', expected_size=len(DATA))
+    uploads.write_chunk(upload['id'], 1, 4096, io.BytesIO(DATA[4096:8192]))
+    uploads.write_chunk(upload['id'], 2, 8192, io.BytesIO(DATA[8192:]))
+    state = uploads.write_chunk(upload['id'], 0, 0, io.BytesIO(DATA[:4096]))
+    assert state['ranges'] == [[0, len(DATA)]]
+
+    destination = str(tmp_path / 'a.wav')
+    result = uploads.finalize(upload['id'], len(DATA), hashlib.sha256(DATA).hexdigest().upper(), destination)
+    assert result['sha256'] == hashlib.sha256(DATA).hexdigest()
+    with open(destination, 'rb') as f:
+        assert f.read() == DATA
+    assert uploads.get(upload['id']) is None
+
+
+def test_rejects_sizes_beyond_the_limits(uploads):
+    with pytest.raises(UploadTooLarge):
+        uploads.initiate('a.wav', expected_size=16385)
+
+    declared = uploads.initiate('a.wav', expected_size=1000)
+    with pytest.raises(UploadTooLarge):
+        uploads.write_chunk(declared['id'], 0, 1001, io.BytesIO(b'x'))
+    with pytest.raises(UploadTooLarge):
+        uploads.write_chunk(declared['id'], 0, 900, io.BytesIO(b'x' * 101))
+    with pytest.raises(UploadTooLarge):
+        uploads.write_chunk(declared['id'], 0, 0, io.BytesIO(b'x' * 4097))
+    with pytest.raises(UploadError):
+        uploads.write_chunk(declared['id'], 0, -1, io.BytesIO(b'x'))
+
+    # Sin tamaño declarado el límite es max_upload_bytes
+    undeclared = uploads.initiate('b.wav')
+    uploads.write_chunk(undeclared['id'], 0, 16384 - 10, io.BytesIO(b'x' * 10))
+    with pytest.raises(UploadTooLarge):
+        uploads.write_chunk(undeclared['id'], 1, 16384 - 10, io.BytesIO(b'x' * 11))
+
+    assert uploads.get(declared['id'])['ranges'] == []
+    assert uploads.get(undeclared['id'])['ranges'] == [[16374, 16384]]
+
+
+def test_finalize_checks_ranges_and_checksum(uploads, tmp_path):
+    upload = uploads.initiate('a.wav', expected_size=len(DATA))
+    uploads.write_chunk(upload['id'], 0, 0, io.BytesIO(DATA[:4096]))
+    uploads.write_chunk(upload['id'], 2, 8192, io.BytesIO(DATA[8192:]))
+    destination = str(tmp_path / 'a.wav')
+
+    with pytest.raises(UploadError, match='Faltan partes'):
+        uploads.finalize(upload['id'], len(DATA), None, destination)
+
+    uploads.write_chunk(upload['id'], 1, 4096, io.BytesIO(DATA[4096:8192]))
+    with pytest.raises(UploadError, match='checksum'):
+        uploads.finalize(upload['id'], len(DATA), '0' * 64, destination)
+    assert uploads.get(upload['id']) is not None
+
+    with pytest.raises(UploadError, match='no encontrada'):
+        uploads.write_chunk('ffff', 0, 0, io.BytesIO(b'x'))
+    assert uploads.get('../etc') is None
@@ -0,0 +1,109 @@
+"""
+Planificador de llamadas: Retry-After, reintentos y peticiones duplicadas
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from scheduler import CallScheduler, retry_after_seconds, retry_reason
+
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = Response(headers or {})
+
+
+def test_retry_after_seconds_formats():
+    assert retry_after_seconds(APIError(429, {'retry-after': '2'})) == 2.0
+    assert retry_after_seconds(APIError(429, {'retry-after-ms': '250', 'retry-after': '9'})) == 0.25
+    assert retry_after_seconds(APIError(429, {'retry-after': '-5'})) == 0.0
+    http_date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < retry_after_seconds(APIError(503, {'retry-after': http_date})) <= 30
+    assert retry_after_seconds(APIError(429, {'retry-after': 'pronto'})) is None
+    assert retry_after_seconds(APIError(429)) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_retry_reason_classification():
+    assert retry_reason(APIError(429)) == 'rate_limit'
+    assert retry_reason(APIError(503)) == 'server_error'
+    assert retry_reason(TimeoutError()) == 'timeout'
+    assert retry_reason(ConnectionError()) == 'connection'
+    assert retry_reason(APIError(400)) is None
+    assert retry_reason(ValueError()) is None
+
+
+def test_transient_errors_are_retried():
+    scheduler = CallScheduler(rate_per_minute=0, max_retries=3, base_delay=0.001)
+    errors = [APIError(503), APIError(429, {'retry-after-ms': '10'})]
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return 'ok'
+
+    assert scheduler.call('key', call) == 'ok'
+    stats = scheduler.stats()
+    assert stats['retries'] == 2 and stats['succeeded'] == 1
+    assert stats['retry_reasons'] == {'server_error': 1, 'rate_limit': 1}
+
+
+def test_permanent_errors_and_exhausted_retries_fail():
+    scheduler = CallScheduler(rate_per_minute=0, max_retries=2, base_delay=0.001)
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise APIError(400)
+
+    with pytest.raises(APIError):
+        scheduler.call('key', bad_request)
+    assert len(calls) == 1
+
+    def unavailable():
+        calls.append(1)
+        raise APIError(503)
+
+    with pytest.raises(APIError):
+        scheduler.call('key', unavailable)
+    assert len(calls) == 1 + 3
+    assert scheduler.stats()['failed'] == 2
+
+
+def test_slow_call_is_hedged():
+    scheduler = CallScheduler(rate_per_minute=0, hedge_after=0.05)
+    first = threading.Event()
+    release = threading.Event()
+
+    def call():
+        if not first.is_set():
+            first.set()
+            release.wait(5)  # la primera petición se queda colgada
+            return 'lenta'
+        return 'copia'
+
+    try:
+        start = time.monotonic()
+        assert scheduler.call('key', call) == 'copia'
+        assert time.monotonic() - start < 2
+    finally:
+        release.set()
+    stats = scheduler.stats()
+    assert stats['hedges'] == 1 and stats['hedge_wins'] == 1
+
+
+def test_fast_call_is_not_hedged():
+    scheduler = CallScheduler(rate_per_minute=0, hedge_after=1)
+    assert scheduler.call('key', lambda: 'ok') == 'ok'
+    assert scheduler.stats()['hedges'] == 0
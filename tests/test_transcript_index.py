@@ -0,0 +1,68 @@
+"""
+Índice FTS5: consultas seguras y fragmentos con el HTML escapado
+"""
+
+import gzip
+
+import pytest
+
+from transcript_index import TranscriptIndex, match_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    return TranscriptIndex(str(tmp_path / 'transcripts.db'))
+
+
+def test_match_query_quotes_every_term():
+    assert match_query('hola mundo') == '"hola" "mundo"'
+    assert match_query('graba*') == '"graba"*'
+    assert match_query('di "hola" OR NOT x') == '"di" """hola""" "OR" "NOT" "x"'
+    assert match_query('  * ** ') is None
+
+
+def test_operators_are_searched_literally(index):
+    index.add('a_transcript.txt', 'reunión con el equipo NOT cancelada')
+    index.add('b_transcript.txt', 'reunión cancelada')
+
+    results, total = index.search('reunión NOT')
+    assert total == 1
+    assert results[0]['transcript_file'] == 'a_transcript.txt'
+    assert index.search('"') == ([], 0)
+    assert index.search('equipo) OR (') == ([], 0)
+
+
+def test_snippet_escapes_html_around_marks(index):
+    index.add('a_transcript.txt', '<script>alert(1)</script> dijo hola & adiós', recording_filename='a.wav')
+
+    results, total = index.search('hola')
+    assert total == 1
+    snippet = results[0]['snippet']
+    assert '<script>' not in snippet
+    assert '&lt;script&gt;' in snippet and '&amp;' in snippet
+    assert '<mark>hola</mark>' in snippet
+    assert results[0]['recording_filename'] == 'a.wav'
+
+
+def test_reindex_replaces_text_and_prefix_search(index):
+    index.add('a_transcript.txt', 'grabación antigua')
+    index.add('a_transcript.txt', 'grabadora nueva')
+
+    assert index.search('antigua') == ([], 0)
+    assert index.search('graba*')[1] == 1
+    # Sin distinguir acentos
+    assert index.search('grabadóra NUEVA')[1] == 1
+
+
+def test_import_folder_runs_once(index, tmp_path):
+    folder = tmp_path / 'uploads'
+    folder.mkdir()
+    (folder / 'a_transcript.txt').write_text('primera', encoding='utf-8')
+    with gzip.open(folder / 'b_transcript.txt.gz', 'wt', encoding='utf-8') as f:
+        f.write('segunda')
+    (folder / 'notas.txt').write_text('primera', encoding='utf-8')
+
+    assert index.import_folder(str(folder)) == 2
+    assert index.search('primera')[1] == 1 and index.search('segunda')[1] == 1
+    (folder / 'c_transcript.txt').write_text('tercera', encoding='utf-8')
+    assert index.import_folder(str(folder)) == 0
@@ -0,0 +1,41 @@
+"""
+Búsqueda en las marcas de tiempo de una transcripción
+"""
+
+from transcript_timing import TranscriptTiming, build_arrays
+
+WORDS = [
+    {'start': 0.0, 'end': 0.4, 'word': 'hola'},
+    {'start': 0.5, 'end': 0.9, 'word': 'mundo'},
+    {'start': 1.2, 'end': 1.6, 'word': 'hola'}
+]
+
+
+def test_find_words_without_segments():
+    timing = TranscriptTiming(build_arrays({'segments': [], 'words': WORDS}), 'word')
+
+    assert len(timing) == 1
+    matches, total = timing.find('hola')
+    assert total == 2
+    assert [match['time'] for match in matches] == [0.0, 1.2]
+    assert matches[0]['segment'] == {'index': 0, 'start': 0.0, 'end': 1.6, 'text': 'hola mundo hola'}
+
+
+def test_find_in_sidecar_without_segments():
+    # Sidecar guardado antes de crear un segmento cuando solo hay palabras
+    arrays = build_arrays({'segments': [], 'words': WORDS})
+    empty = build_arrays({'segments': [], 'words': []})
+    arrays.update({key: empty[key] for key in ('seg_start', 'seg_end', 'seg_offsets', 'seg_text')})
+    timing = TranscriptTiming(arrays, 'word')
+
+    assert len(timing) == 0
+    matches, total = timing.find('hola mundo')
+    assert total == 1
+    assert matches == [{'time': 0.0, 'segment': None}]
+
+
+def test_find_empty_timing():
+    timing = TranscriptTiming(build_arrays({'segments': [], 'words': []}), 'segment')
+
+    assert len(timing) == 0
+    assert timing.find('hola') == ([], 0)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Script para transcribir por lotes los audios del directorio de uploads
+"""
+
+import argparse
+import sys
+
+def transcribe_batch():
+    """Transcribir los archivos indicados (o los que coincidan con el patrón)"""
+    parser = argparse.ArgumentParser(description='Transcribir por lotes los audios de uploads')
+    parser.add_argument('files', nargs='*', help='Nombres de archivo dentro de uploads')
+    parser.add_argument('--pattern', default='*', help='Patrón glob si no se indican archivos (por defecto todos los audios)')
+    parser.add_argument('--backend', help='Backend de transcripción (por defecto TRANSCRIPTION_BACKEND)')
+    parser.add_argument('--concurrency', type=int, help='Transcripciones simultáneas')
+    parser.add_argument('--rate-limit', type=float, help='Máximo de archivos por minuto (0 = sin límite)')
+    parser.add_argument('--dry-run', action='store_true', help='Solo mostrar qué archivos se transcribirían')
+    args = parser.parse_args()
+
+    import app as transcriber
+    from batch import select_files, run_batch
+
+    transcriber.run_migrations()
+    config = transcriber.app.config
+    backend_name = args.backend or config['TRANSCRIPTION_BACKEND']
+    backend = transcriber.transcription_backends.get(backend_name)
+    if backend is None or not backend.available():
+        print(f"❌ Backend de transcripción no disponible: {backend_name}")
+        return 1
+    concurrency = args.concurrency or config['BATCH_CONCURRENCY']
+    rate_limit = config['BATCH_RATE_LIMIT'] if args.rate_limit is None else args.rate_limit
+
+    selection = select_files(config['UPLOAD_FOLDER'], transcriber.blob_store,
+                             names=args.files or None, pattern=args.pattern)
+
+    print("📝 Transcripción por lotes")
+    print("=" * 40)
+    print(f"Pendientes: {len(selection['pending'])}  Omitidos (ya transcritos): {len(selection['skipped'])}")
+    for name in selection['invalid']:
+        print(f"⚠️  Archivo no válido o inexistente: {name}")
+
+    if args.dry_run:
+        for name in selection['pending']:
+            print(f"  - {name}")
+        return 0
+
+    if not selection['pending']:
+        print("✅ No hay nada que transcribir.")
+        return 0
+
+    openai_api_key = transcriber.get_server_openai_key()
+    if backend.needs_api_key and not openai_api_key:
+        print("❌ OPENAI_API_KEY no configurada. Ejecuta setup_openai.py primero.")
+        return 1
+
+    print(f"🚀 Backend: {backend.name}  Concurrencia: {concurrency}  Límite: {rate_limit or 'sin límite'} archivos/min\n")
+
+    def on_progress(summary):
+        item = summary['recent'][-1]
+        done = summary['completed'] + summary['failed']
+        icon = '✅' if item['status'] == 'completed' else '❌'
+        detail = f" - {item['error']}" if item['error'] else ''
+        print(f"{icon} [{done}/{summary['total']}] {item['filename']} ({item['seconds']:.1f} s){detail}  "
+              f"{summary['files_per_minute']:.1f} archivos/min")
+
+    summary = run_batch(
+        selection['pending'],
+        lambda filename: transcriber.transcribe_upload(filename, openai_api_key, backend),
+        concurrency=concurrency,
+        per_minute=rate_limit,
+        on_progress=on_progress
+    )
+
+    print("\n" + "=" * 40)
+    print(f"Transcritos: {summary['completed']}  Con error: {summary['failed']}")
+    print(f"Tiempo total: {summary['elapsed_seconds']:.1f} s")
+    print(f"Rendimiento: {summary['files_per_minute']:.1f} archivos/min, {summary['mb_per_second']:.2f} MB/s")
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(transcribe_batch())
@@ -0,0 +1,155 @@
+"""
+Caché de transcripciones direccionada por contenido
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Calcular el SHA-256 de un archivo leyéndolo por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """Caché de dos niveles: LRU en memoria y archivos JSON en disco.
+
+    Las entradas se identifican por el hash del audio junto con el modelo y
+    el formato de respuesta. El nivel en disco se limita por tamaño total y
+    por antigüedad; al superar el límite se eliminan las entradas más viejas.
+    """
+
+    def __init__(self, cache_dir, max_memory_entries=256, max_disk_bytes=200 * 1024 * 1024,
+                 max_age_seconds=30 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.max_age_seconds = max_age_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    @staticmethod
+    def make_key(audio_hash, model, response_format):
+        return hashlib.sha256(f"{audio_hash}:{model}:{response_format}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Devolver la transcripción guardada o ``None``"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry['created_at'] <= self.max_age_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return entry['transcript']
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is not None and now - entry['created_at'] <= self.max_age_seconds:
+                self._remember(key, entry)
+                self._counters['disk_hits'] += 1
+                return entry['transcript']
+            self._counters['misses'] += 1
+        return None
+
+    def put(self, key, transcript):
+        """Guardar una transcripción en ambos niveles"""
+        entry = {'created_at': time.time(), 'transcript': transcript}
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        data = json.dumps(entry).encode('utf-8')
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+            self._disk_bytes += len(data) - previous
+            self._remember(key, entry)
+            over_limit = self._disk_bytes > self.max_disk_bytes
+
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        """Eliminar entradas caducadas y, si hace falta, las más antiguas del disco"""
+        now = time.time()
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+
+        for path, size, mtime in entries:
+            if now - mtime <= self.max_age_seconds and total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            with self._lock:
+                self._memory.pop(os.path.basename(path)[:-5], None)
+
+        with self._lock:
+            self._disk_bytes = total
+            self._counters['evictions'] += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            hits = self._counters['memory_hits'] + self._counters['disk_hits']
+            lookups = hits + self._counters['misses']
+            return {
+                **self._counters,
+                'hits': hits,
+                'hit_ratio': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes
+            }
+
+    def _remember(self, key, entry):
+        # Debe llamarse con el lock adquirido
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
@@ -0,0 +1,176 @@
+"""
+Índice de búsqueda de texto completo sobre las transcripciones (SQLite FTS5)
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import gzip
+import html
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transcript_file TEXT NOT NULL UNIQUE,
+    recording_filename TEXT,
+    recording_id INTEGER,
+    source TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_recording ON transcripts (recording_filename);
+CREATE VIRTUAL TABLE IF NOT EXISTS transcript_text USING fts5(
+    text,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Marcas internas del fragmento; se sustituyen por <mark> después de escapar el HTML
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+
+# Transcripciones sueltas que se indexan al migrar un directorio existente
+TRANSCRIPT_FILE = re.compile(r'^(?:(?P<recording>.+)_transcript|transcript_\d{8}_\d{6})\.txt(?:\.gz)?$')
+
+
+def match_query(query):
+    """Convertir el texto del usuario en una consulta FTS5 segura.
+
+    Cada palabra se busca literalmente (todas deben aparecer) y un ``*`` al
+    final de una palabra la convierte en prefijo. Devuelve ``None`` si no
+    queda ninguna palabra.
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(terms) or None
+
+
+class TranscriptIndex:
+    """Transcripciones indexadas con FTS5 y enlazadas a la grabación de la que salen.
+
+    ``transcripts`` guarda el archivo, la grabación (nombre e id en la base
+    de grabaciones) y el origen; ``transcript_text`` es la tabla FTS5 con el
+    texto, con el mismo ``rowid``. Volver a indexar un archivo sustituye su
+    texto, así que el índice se actualiza de forma incremental.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, transcript_file, text, recording_filename=None, recording_id=None, source=None):
+        """Indexar (o reindexar) el texto de ``transcript_file`` y devolver su id"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT id FROM transcripts WHERE transcript_file = ?', (transcript_file,)).fetchone()
+            if row:
+                transcript_id = row['id']
+                conn.execute(
+                    'UPDATE transcripts SET recording_filename = ?, recording_id = ?, source = ?, created_at = ? '
+                    'WHERE id = ?',
+                    (recording_filename, recording_id, source, datetime.now().isoformat(), transcript_id)
+                )
+                conn.execute('DELETE FROM transcript_text WHERE rowid = ?', (transcript_id,))
+            else:
+                transcript_id = conn.execute(
+                    'INSERT INTO transcripts (transcript_file, recording_filename, recording_id, source, created_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (transcript_file, recording_filename, recording_id, source, datetime.now().isoformat())
+                ).lastrowid
+            conn.execute('INSERT INTO transcript_text (rowid, text) VALUES (?, ?)', (transcript_id, text))
+        return transcript_id
+
+    def search(self, query, limit=20, offset=0, snippet_tokens=16):
+        """Transcripciones que contienen ``query``, ordenadas por relevancia (BM25).
+
+        Devuelve la página de resultados, cada uno con un fragmento en HTML
+        con las coincidencias entre ``<mark>``, y el total de coincidencias.
+        """
+        match = match_query(query)
+        if match is None:
+            return [], 0
+
+        conn = self._connect()
+        total = conn.execute(
+            'SELECT COUNT(*) FROM transcript_text WHERE transcript_text MATCH ?', (match,)
+        ).fetchone()[0]
+        rows = conn.execute(
+            'SELECT t.*, bm25(transcript_text) AS rank, '
+            "snippet(transcript_text, 0, ?, ?, '…', ?) AS snippet "
+            'FROM transcript_text JOIN transcripts t ON t.id = transcript_text.rowid '
+            'WHERE transcript_text MATCH ? ORDER BY rank LIMIT ? OFFSET ?',
+            (SNIPPET_START, SNIPPET_END, snippet_tokens, match, limit, offset)
+        ).fetchall()
+
+        results = []
+        for row in rows:
+            result = dict(row)
+            result['rank'] = round(-result['rank'], 4)
+            result['snippet'] = (html.escape(result['snippet'])
+                                 .replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
+            results.append(result)
+        return results, total
+
+    def import_folder(self, folder, resolve_recording=None):
+        """Indexar, una sola vez, las transcripciones que ya había en ``folder``.
+
+        ``resolve_recording(nombre_de_audio)`` devuelve ``(nombre, id)`` de la
+        grabación de la que sale una transcripción ``<audio>_transcript.txt``.
+        """
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM migrations WHERE name = 'transcript_files'").fetchone():
+            return 0
+
+        imported = 0
+        for entry in os.scandir(folder):
+            match = TRANSCRIPT_FILE.match(entry.name)
+            if not entry.is_file() or not match:
+                continue
+            try:
+                opener = gzip.open if entry.name.endswith('.gz') else open
+                with opener(entry.path, 'rt', encoding='utf-8') as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error al indexar {entry.name}: {e}")
+                continue
+
+            recording_filename, recording_id = None, None
+            if match.group('recording') and resolve_recording:
+                recording_filename, recording_id = resolve_recording(match.group('recording'))
+            transcript_file = entry.name[:-3] if entry.name.endswith('.gz') else entry.name
+            self.add(transcript_file, text, recording_filename, recording_id,
+                     source='recording' if match.group('recording') else 'direct')
+            imported += 1
+
+        with conn:
+            conn.execute("INSERT INTO migrations (name) VALUES ('transcript_files')")
+        return imported
+
+    def stats(self):
+        row = self._connect().execute(
+            'SELECT COUNT(*) AS transcripts, COUNT(recording_filename) AS linked FROM transcripts'
+        ).fetchone()
+        return {'transcripts': row['transcripts'], 'linked': row['linked']}
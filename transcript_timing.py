@@ -0,0 +1,251 @@
+"""
+Marcas de tiempo de las transcripciones: segmentos y palabras en arrays ordenados
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import os
+import threading
+import unicodedata
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+# Granularidades que se pueden pedir a Whisper con ``verbose_json``
+GRANULARITIES = ('segment', 'word')
+
+# Sidecars abiertos que se mantienen en memoria
+MAX_OPEN_TIMINGS = 32
+
+
+def normalize_token(word):
+    """Palabra en minúsculas, sin tildes ni puntuación (como el tokenizador de la búsqueda)"""
+    decomposed = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(char for char in decomposed if char.isalnum())
+
+
+def timing_from_response(response):
+    """Segmentos y palabras de una respuesta ``verbose_json`` de Whisper (objeto del SDK o dict)"""
+    if hasattr(response, 'model_dump'):
+        response = response.model_dump()
+
+    return {
+        'text': (response.get('text') or '').strip(),
+        'duration': response.get('duration'),
+        'segments': [{'start': float(segment['start']), 'end': float(segment['end']),
+                      'text': segment['text'].strip()}
+                     for segment in response.get('segments') or []],
+        'words': [{'start': float(word['start']), 'end': float(word['end']), 'word': word['word'].strip()}
+                  for word in response.get('words') or []]
+    }
+
+
+def shift_timing(timing, offset):
+    """Desplazar todas las marcas ``offset`` segundos (por ejemplo, el silencio recortado al inicio)"""
+    if not offset:
+        return timing
+    return {
+        **timing,
+        'duration': timing['duration'] + offset if timing.get('duration') is not None else None,
+        'segments': [{**segment, 'start': segment['start'] + offset, 'end': segment['end'] + offset}
+                     for segment in timing['segments']],
+        'words': [{**word, 'start': word['start'] + offset, 'end': word['end'] + offset}
+                  for word in timing['words']]
+    }
+
+
+def merge_timings(parts, regions, text):
+    """Unir las marcas de los segmentos de audio transcritos por separado.
+
+    ``regions[i]`` es ``(inicio, desde, hasta)`` en segundos: dónde empieza el
+    segmento de audio ``i`` y la parte que le corresponde sin el solape. Cada
+    frase o palabra se queda en el segmento que contiene su punto medio, así
+    que lo repetido en el solape aparece una sola vez.
+    """
+    segments, words = [], []
+    for part, (offset, lo, hi) in zip(parts, regions):
+        shifted = shift_timing(part, offset)
+        segments.extend(item for item in shifted['segments'] if lo <= (item['start'] + item['end']) / 2 < hi)
+        words.extend(item for item in shifted['words'] if lo <= (item['start'] + item['end']) / 2 < hi)
+    return {'text': text, 'duration': regions[-1][2] if regions else None, 'segments': segments, 'words': words}
+
+
+def build_arrays(timing):
+    """Arrays compactos del sidecar a partir de ``{'segments': [...], 'words': [...]}``.
+
+    Los segmentos quedan ordenados por inicio y su texto en un único bloque
+    UTF-8 con desplazamientos. Las palabras (de Whisper, o repartidas dentro
+    de cada segmento si solo hay segmentos) forman un índice invertido:
+    vocabulario ordenado, ids por posición y posiciones de cada id. Si solo
+    hay palabras se crea un segmento que las abarca todas.
+    """
+    segments = sorted(timing['segments'], key=lambda segment: segment['start'])
+    if not segments and timing['words']:
+        words = sorted(timing['words'], key=lambda word: word['start'])
+        segments = [{'start': words[0]['start'], 'end': max(word['end'] for word in words),
+                     'text': ' '.join(word['word'] for word in words)}]
+    seg_start = np.array([segment['start'] for segment in segments], dtype=np.float32)
+    seg_end = np.array([segment['end'] for segment in segments], dtype=np.float32)
+    encoded = [segment['text'].encode('utf-8') for segment in segments]
+    seg_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    seg_offsets[1:] = np.cumsum([len(text) for text in encoded])
+    seg_text = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    tokens, token_start = [], []
+    if timing['words']:
+        for word in sorted(timing['words'], key=lambda word: word['start']):
+            token = normalize_token(word['word'])
+            if token:
+                tokens.append(token)
+                token_start.append(word['start'])
+    else:
+        # Sin marcas por palabra: cada palabra se sitúa en proporción a su posición en el segmento
+        for segment in segments:
+            text, position = segment['text'], 0
+            for word in text.split():
+                position = text.index(word, position)
+                token = normalize_token(word)
+                if token:
+                    tokens.append(token)
+                    token_start.append(segment['start']
+                                       + (segment['end'] - segment['start']) * position / max(1, len(text)))
+                position += len(word)
+
+    token_start = np.array(token_start, dtype=np.float32)
+    token_segment = np.clip(np.searchsorted(seg_start, token_start, side='right') - 1, 0, None).astype(np.int32)
+    vocab = np.unique(np.array(tokens, dtype=str)) if tokens else np.array([], dtype='<U1')
+    token_ids = np.searchsorted(vocab, np.array(tokens, dtype=str)).astype(np.int32)
+    postings = np.argsort(token_ids, kind='stable').astype(np.int32)
+    posting_offsets = np.searchsorted(token_ids[postings], np.arange(len(vocab) + 1)).astype(np.int32)
+
+    return {
+        'seg_start': seg_start, 'seg_end': seg_end, 'seg_offsets': seg_offsets, 'seg_text': seg_text,
+        'token_start': token_start, 'token_segment': token_segment, 'token_ids': token_ids,
+        'vocab': vocab, 'postings': postings, 'posting_offsets': posting_offsets
+    }
+
+
+class TranscriptTiming:
+    """Consultas sobre los arrays de un sidecar, todas con búsqueda binaria"""
+
+    def __init__(self, arrays, granularity):
+        self.arrays = arrays
+        self.granularity = granularity
+        self.seg_start = arrays['seg_start']
+        self.seg_end = arrays['seg_end']
+
+    def __len__(self):
+        return len(self.seg_start)
+
+    def segment(self, index):
+        offsets = self.arrays['seg_offsets']
+        text = self.arrays['seg_text'][offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+        return {'index': int(index), 'start': round(float(self.seg_start[index]), 3),
+                'end': round(float(self.seg_end[index]), 3), 'text': text}
+
+    def segment_at(self, time):
+        """Índice del segmento que suena en ``time``, o ``None`` si cae en un silencio"""
+        index = int(np.searchsorted(self.seg_start, time, side='right')) - 1
+        if index < 0 or time > self.seg_end[index]:
+            return None
+        return index
+
+    def around(self, time, before=30.0, after=60.0):
+        """Segmentos que se solapan con ``[time - before, time + after]``"""
+        lo = max(0, int(np.searchsorted(self.seg_start, time - before, side='right')) - 1)
+        hi = int(np.searchsorted(self.seg_start, time + after, side='right'))
+        return [self.segment(index) for index in range(lo, hi) if self.seg_end[index] >= time - before]
+
+    def find(self, phrase, limit=50):
+        """Instantes en que empieza ``phrase`` (palabras consecutivas) y el total de apariciones"""
+        tokens = [normalize_token(word) for word in phrase.split()]
+        tokens = [token for token in tokens if token]
+        vocab = self.arrays['vocab']
+        if not tokens or not len(vocab):
+            return [], 0
+
+        ids = np.searchsorted(vocab, tokens)
+        if np.any(ids >= len(vocab)) or np.any(vocab[np.minimum(ids, len(vocab) - 1)] != tokens):
+            return [], 0
+
+        offsets, token_ids = self.arrays['posting_offsets'], self.arrays['token_ids']
+        positions = self.arrays['postings'][offsets[ids[0]]:offsets[ids[0] + 1]]
+        for step, token_id in enumerate(ids[1:], start=1):
+            positions = positions[positions + step < len(token_ids)]
+            positions = positions[token_ids[positions + step] == token_id]
+
+        matches = []
+        for position in positions[:limit]:
+            # Los sidecars antiguos pueden tener palabras sin ningún segmento
+            segment = self.segment(self.arrays['token_segment'][position]) if len(self) else None
+            matches.append({'time': round(float(self.arrays['token_start'][position]), 3), 'segment': segment})
+        return matches, len(positions)
+
+
+class TimingStore:
+    """Sidecar ``<transcripción>.npz`` con las marcas de tiempo de cada transcripción.
+
+    Guarda los arrays de ``build_arrays`` sin comprimir: unos 16 bytes por
+    palabra más el texto de los segmentos. Los sidecars consultados
+    recientemente se mantienen abiertos en memoria y se recargan si el
+    archivo cambia.
+    """
+
+    def __init__(self, folder, max_open=MAX_OPEN_TIMINGS):
+        self.folder = folder
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, transcript_file):
+        return os.path.join(self.folder, f"{os.path.splitext(transcript_file)[0]}.npz")
+
+    def save(self, transcript_file, timing):
+        """Guardar las marcas de una transcripción; devuelve el número de segmentos y palabras"""
+        arrays = build_arrays(timing)
+        granularity = 'word' if timing['words'] else 'segment'
+        path = self.path(transcript_file)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, granularity=np.array(granularity), **arrays)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._open.pop(transcript_file, None)
+        return {'segments': len(arrays['seg_start']), 'words': len(arrays['token_ids'])}
+
+    def delete(self, transcript_file):
+        with self._lock:
+            self._open.pop(transcript_file, None)
+        try:
+            os.unlink(self.path(transcript_file))
+        except FileNotFoundError:
+            pass
+
+    def load(self, transcript_file):
+        """Marcas de una transcripción como ``TranscriptTiming``, o ``None`` si no tiene"""
+        path = self.path(transcript_file)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._open.get(transcript_file)
+            if cached and cached[0] == mtime:
+                self._open.move_to_end(transcript_file)
+                return cached[1]
+
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        timing = TranscriptTiming(arrays, str(arrays.pop('granularity')))
+
+        with self._lock:
+            self._open[transcript_file] = (mtime, timing)
+            self._open.move_to_end(transcript_file)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return timing
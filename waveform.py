@@ -0,0 +1,209 @@
+"""
+Resúmenes de forma de onda (picos multirresolución) y duración de las grabaciones
+Copyright (c) 2024
+
+This file is part of the Grabador de Audio project.
+Licensed under the MIT License. See LICENSE file for details.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import uuid
+import wave
+
+import numpy as np
+
+from audio_processing import pcm_to_float
+
+# Duración de cada pico en el nivel más fino
+BASE_WINDOW_SECONDS = 0.05
+
+# Cada nivel agrupa los picos del anterior de dos en dos hasta quedar con este número o menos
+MIN_LEVEL_PEAKS = 64
+
+# Frecuencia a la que ffmpeg decodifica los formatos que no son WAV PCM
+DECODE_RATE = 8000
+
+# Ventanas leídas por bloque, para no cargar el audio completo en memoria
+BLOCK_WINDOWS = 4096
+
+
+def window_peaks(samples, window):
+    """Mínimo y máximo de una señal mono en ventanas fijas de ``window`` muestras.
+
+    La última ventana puede ser más corta si la señal no es múltiplo exacto.
+    """
+    full = len(samples) - len(samples) % window
+    frames = samples[:full].reshape(-1, window)
+    mins, maxs = frames.min(axis=1), frames.max(axis=1)
+    if full < len(samples):
+        mins = np.append(mins, samples[full:].min())
+        maxs = np.append(maxs, samples[full:].max())
+    return mins, maxs
+
+
+def build_levels(mins, maxs):
+    """Pirámide de niveles: cada uno con la mitad de picos que el anterior"""
+    levels = [(mins, maxs)]
+    while len(mins) > MIN_LEVEL_PEAKS:
+        if len(mins) % 2:
+            mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+        mins = mins.reshape(-1, 2).min(axis=1)
+        maxs = maxs.reshape(-1, 2).max(axis=1)
+        levels.append((mins, maxs))
+    return levels
+
+
+def quantize(mins, maxs):
+    """Picos como pares ``(mín, máx)`` en ``int8`` (-127..127)"""
+    pairs = np.stack([mins, maxs], axis=1)
+    return np.round(np.clip(pairs, -1.0, 1.0) * 127).astype(np.int8)
+
+
+def resample_peaks(pairs, points):
+    """Reducir un nivel a ``points`` picos como mucho, conservando mínimos y máximos"""
+    if len(pairs) <= points:
+        return pairs
+    bounds = np.linspace(0, len(pairs), points + 1).astype(np.int64)[:-1]
+    return np.stack([np.minimum.reduceat(pairs[:, 0], bounds),
+                     np.maximum.reduceat(pairs[:, 1], bounds)], axis=1)
+
+
+def compute_summary(path):
+    """Picos del nivel más fino y metadatos de un audio, o ``None`` si no se puede decodificar.
+
+    Los WAV PCM se leen directamente; el resto de formatos (como el WebM de
+    las grabaciones del navegador) se decodifican con ffmpeg si está instalado.
+    """
+    try:
+        with wave.open(path, 'rb') as reader:
+            rate, channels, width = reader.getframerate(), reader.getnchannels(), reader.getsampwidth()
+            window = max(1, round(rate * BASE_WINDOW_SECONDS))
+
+            def read_block():
+                samples = pcm_to_float(reader.readframes(window * BLOCK_WINDOWS), width)
+                return samples.reshape(-1, channels).mean(axis=1) if channels > 1 else samples
+
+            mins, maxs, frames = _scan(read_block, window)
+        return mins, maxs, {'sample_rate': rate, 'channels': channels, 'frames': frames,
+                            'duration': round(frames / rate, 3), 'decoder': 'wav'}
+    except (wave.Error, EOFError):
+        pass
+
+    if not shutil.which('ffmpeg'):
+        return None
+    return _ffmpeg_summary(path)
+
+
+def _scan(read_block, window):
+    mins, maxs, frames = [], [], 0
+    while True:
+        samples = read_block()
+        if not len(samples):
+            break
+        frames += len(samples)
+        block_mins, block_maxs = window_peaks(samples, window)
+        mins.append(block_mins)
+        maxs.append(block_maxs)
+    if not mins:
+        return np.zeros(0, np.float32), np.zeros(0, np.float32), 0
+    return np.concatenate(mins), np.concatenate(maxs), frames
+
+
+def _ffmpeg_summary(path):
+    window = round(DECODE_RATE * BASE_WINDOW_SECONDS)
+    process = subprocess.Popen(
+        ['ffmpeg', '-v', 'error', '-i', path, '-f', 's16le', '-ac', '1', '-ar', str(DECODE_RATE), '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    try:
+        mins, maxs, frames = _scan(lambda: pcm_to_float(process.stdout.read(window * BLOCK_WINDOWS * 2), 2), window)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0 or not frames:
+        return None
+    return mins, maxs, {**_probe(path), 'frames': frames, 'duration': round(frames / DECODE_RATE, 3),
+                        'decoder': 'ffmpeg'}
+
+
+def _probe(path):
+    # Frecuencia y canales originales (la decodificación para los picos es mono a DECODE_RATE)
+    if not shutil.which('ffprobe'):
+        return {'sample_rate': None, 'channels': None}
+    try:
+        output = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'a:0', '-show_entries', 'stream=sample_rate,channels',
+             '-of', 'json', path],
+            capture_output=True, timeout=30, check=True
+        ).stdout
+        stream = json.loads(output)['streams'][0]
+        return {'sample_rate': int(stream['sample_rate']), 'channels': int(stream['channels'])}
+    except (subprocess.SubprocessError, ValueError, KeyError, IndexError):
+        return {'sample_rate': None, 'channels': None}
+
+
+class WaveformStore:
+    """Resumen de forma de onda de cada audio en ``<hash[:2]>/<hash>.npz``.
+
+    El archivo guarda un array ``int8`` de pares (mín, máx) por nivel, del
+    más fino (``BASE_WINDOW_SECONDS`` por pico) al más grueso, y los
+    metadatos (duración, frecuencia de muestreo, canales) en JSON. Va
+    indexado por el hash del contenido, así que se comparte entre nombres
+    deduplicados y se conserva aunque el audio se archive en la nube.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, sha256):
+        return os.path.join(self.folder, sha256[:2], f"{sha256}.npz")
+
+    def compute(self, audio_path, sha256):
+        """Calcular y guardar el resumen de un audio; devuelve sus metadatos o ``None``"""
+        summary = compute_summary(audio_path)
+        if summary is None:
+            return None
+        mins, maxs, meta = summary
+        levels = build_levels(mins, maxs)
+        meta['levels'] = len(levels)
+
+        path = self.path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)),
+                     **{f"level_{index}": quantize(*level) for index, level in enumerate(levels)})
+        os.replace(temp_path, path)
+        return meta
+
+    def get(self, sha256, points=None, audio_path=None):
+        """Metadatos y picos reducidos a ``points`` (como lista plana ``[mín, máx, ...]``).
+
+        Si el resumen aún no existe y se indica ``audio_path`` se calcula en
+        ese momento. Devuelve ``None`` si no hay resumen ni forma de calcularlo.
+        """
+        path = self.path(sha256)
+        if not os.path.exists(path) and (audio_path is None or self.compute(audio_path, sha256) is None):
+            return None
+
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if points is None:
+                return meta
+            # El nivel más grueso que aún tiene al menos ``points`` picos (sin leer los más finos)
+            level = meta['levels'] - 1
+            pairs = data[f"level_{level}"]
+            while level > 0 and len(pairs) < points:
+                level -= 1
+                pairs = data[f"level_{level}"]
+            pairs = resample_peaks(pairs, points)
+
+        return {
+            **meta,
+            'seconds_per_peak': round(meta['duration'] / len(pairs), 4) if len(pairs) else 0,
+            'peaks': pairs.ravel().tolist()
+        }